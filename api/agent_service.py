@@ -5,18 +5,113 @@ FastAPI service that handles LLM calls for the financial simulation AI agent.
 Keeps OpenAI API key secure on the backend.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, Awaitable, Callable
+import orjson
 import os
+import hmac
 import uuid
+import asyncio
+import logging
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Financial AI Agent API", version="1.0.0")
+# After load_dotenv: logging, rate limits and the service mode are read from the environment at import time
+from .logs import bind as bind_log_context, configure_logging
+from .rate_limit import RateLimitMiddleware
+from .service_mode import MODE_DETERMINISTIC, MODE_FULL, MODE_OFF, MODE_WATCH_INTERVAL_SECONDS, MODES, OFF_MESSAGE, ServiceMode, template_reply
+from .service_mode import watch as watch_service_mode
+
+# Records go through a queue to a writer thread; per-turn detail is DEBUG and off by default (see api/logs.py)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson (several times faster than the stdlib encoder).
+    
+    /api/chat returns one directly, so its body skips response_model
+    validation; chat_payload is kept in step with ChatResponse by
+    test_chat_payload.py instead.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+# Opt-in: open the upstream connection at startup so the first chat turn doesn't pay for TLS setup
+WARMUP_UPSTREAM = os.getenv("AI_WARMUP_UPSTREAM", "false").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("AI_WARMUP_TIMEOUT_SECONDS", "5"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build and warm everything before the first request is accepted.
+    
+    The agent (OpenAI client, sessions.json, knowledge snapshot with its matcher,
+    prompts and retrieval index) is built off the event loop, then the per-scenario
+    param models are compiled and, with AI_WARMUP_UPSTREAM=true, the upstream
+    connection pool is opened. /ready reports 200 only once this has finished.
+    """
+    app.state.ready = False
+    app.state.warmup = {}
+    started = time.perf_counter()
+    try:
+        agent = await asyncio.to_thread(get_ai_agent)
+    except Exception as e:
+        # No credentials: keep serving (/health, /ready) but never report ready
+        agent = None
+        app.state.warmup["error"] = str(e)
+        logger.error("Agent not created: %s", e)
+    
+    if agent is not None:
+        knowledge = agent.knowledge.current
+        await asyncio.to_thread(lambda: [knowledge.params.model(sid) for sid in knowledge.scenario_ids])
+        if WARMUP_UPSTREAM:
+            app.state.warmup["upstream"] = await _warm_upstream(agent)
+        app.state.warmup["seconds"] = round(time.perf_counter() - started, 3)
+        app.state.ready = True
+        logger.info("Ready in %ss (knowledge version %s)", app.state.warmup['seconds'], knowledge.version)
+    
+    # Reload scenario_patterns.json / financial_knowledge.json in the background when they change
+    watchers = []
+    if WATCH_INTERVAL_SECONDS > 0:
+        watchers.append(asyncio.create_task(watch_knowledge(
+            lambda: app.state.ai_agent.knowledge if hasattr(app.state, 'ai_agent') else None
+        )))
+    # Remote kill switch: pick up edits to SERVICE_MODE_FILE
+    if MODE_WATCH_INTERVAL_SECONDS > 0 and service_mode.path:
+        watchers.append(asyncio.create_task(watch_service_mode(service_mode)))
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        for watcher in watchers:
+            watcher.cancel()
+        if agent is not None:
+            await agent.client.close()
+
+async def _warm_upstream(agent) -> str:
+    """One cheap authenticated request (list models) to open the connection; failures aren't fatal."""
+    try:
+        await asyncio.wait_for(agent.client.models.list(), WARMUP_TIMEOUT_SECONDS)
+        return "ok"
+    except Exception as e:
+        logger.warning("Upstream warmup failed: %s: %s", type(e).__name__, e)
+        return f"failed: {type(e).__name__}"
+
+app = FastAPI(title="Financial AI Agent API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Token buckets per session/IP/API key and a cap on in-flight chat requests (429 + Retry-After).
+# Added before CORS so rejections still carry the CORS headers.
+app.add_middleware(RateLimitMiddleware)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -25,52 +120,82 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable from the frontend's JS as well as the dev tools
+    expose_headers=["Server-Timing", "X-Request-ID", "Retry-After"],
 )
 
 # In-memory session storage (for demo - use Redis/DB in production)
 sessions: Dict[str, List[Dict[str, Any]]] = {}
 
+# Full LLM, deterministic-only or off; switched by admin endpoint, SERVICE_MODE_FILE or upstream overload
+service_mode = ServiceMode()
+
 #############################################
 # AI Agent Implementation (inline)
 #############################################
 
-from openai import OpenAI, AzureOpenAI
+from openai import AsyncOpenAI, AsyncAzureOpenAI, APITimeoutError
 
 from .prompts import get_system_prompt
+from .knowledge import KnowledgeSnapshot, KnowledgeStore, WATCH_INTERVAL_SECONDS, watch as watch_knowledge
+from .intent_schema import parse_intent_tool_call
+from .extraction import extract
+from .session_state import advance as advance_match_state, build_state as build_match_state, is_current, window_hits
+from .slots import missing_fields, update_slots
+from .speculation import SpeculativeIntent, classify_with_llm, reconcile, record_early_action, speculation_mode
+from .model_router import TIER_FAST, classify_turn, last_assistant_message, record_tier_outcome, tier_for_turn
+from .cancellation import DeadlineExceeded, ClientDisconnected, cancel_on_disconnect, remaining, request_deadline
+from .chat_batch import BATCH_CONCURRENCY, BATCH_MAX_ITEMS, run_batch
+from .prompt_profiler import profile_session, profile_store
+from . import request_trace
+from . import metrics
 
+@dataclass(slots=True)
 class AgentResponse:
-    def __init__(self, message: str, profile_extracted: Optional[Dict] = None, 
-                 profile_complete: bool = False, confidence: float = 0.0,
-                 missing_fields: List[str] = [], intent: Optional[str] = None,
-                 params: Optional[Dict] = None, customScenario: Optional[Dict] = None,
-                 action: Optional['ScenarioAction'] = None):
-        self.message = message
-        self.profileExtracted = profile_extracted
-        self.profileComplete = profile_complete
-        self.confidence = confidence
-        self.missingProfileFields = missing_fields
-        self.intent = intent
-        self.params = params
-        self.customScenario = customScenario
-        self.action = action
+    """One agent turn. Field names match ChatResponse so they are copied across as-is."""
+    message: str
+    profileExtracted: Optional[Dict] = None
+    profileComplete: bool = False
+    confidence: float = 0.0
+    missingFields: List[str] = field(default_factory=list)
+    intent: Optional[str] = None
+    params: Optional[Dict] = None
+    customScenario: Optional[Dict] = None
+    action: Optional['ScenarioAction'] = None
+    knowledgeVersion: Optional[str] = None
+    serviceMode: Optional[str] = None
 
 class AIAgent:
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini", azure_endpoint: str = None, api_version: str = "2024-02-15-preview"):
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", azure_endpoint: str = None, api_version: str = "2024-02-15-preview",
+                 structured_intents: bool = False, speculative_intents: str = "off", classifier_model: str = None,
+                 fast_model: str = None, prompt_retrieval: bool = False):
         if azure_endpoint:
-            print(f"[AIAgent] Using Azure OpenAI: {azure_endpoint}")
-            self.client = AzureOpenAI(
+            logger.info("Using Azure OpenAI: %s", azure_endpoint)
+            self.client = AsyncAzureOpenAI(
                 api_key=api_key,
                 api_version=api_version,
                 azure_endpoint=azure_endpoint
             )
         else:
-            print("[AIAgent] Using Standard OpenAI")
-            self.client = OpenAI(api_key=api_key)
+            logger.info("Using Standard OpenAI")
+            self.client = AsyncOpenAI(api_key=api_key)
             
         self.model = model
-        self.model = model
+        # Optional fast tier for short slot-filling answers (see api/model_router.py)
+        self.fast_model = fast_model
+        self.structured_intents = structured_intents
+        # Speculative intent classification: 'off', 'local' (pattern matcher) or 'llm' (cheap classifier call)
+        self.speculative_intents = speculation_mode(speculative_intents)
+        self.classifier_model = classifier_model or model
         self.sessions: Dict[str, List[Dict]] = {}
         self.session_file = "sessions.json"
+        # Per-session matcher cache (see api/session_state.py); rebuilt from history when missing
+        self.session_state: Dict[str, Dict[str, Any]] = {}
+        self.session_state_file = "session_state.json"
+        # Turns of one session run one at a time so their history writes can't interleave.
+        # A session's lock is dropped once no turn holds or waits for it (users counts both).
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._session_lock_users: Dict[str, int] = {}
         
         # Load persisted sessions if available
         try:
@@ -78,39 +203,21 @@ class AIAgent:
             if os.path.exists(self.session_file):
                 with open(self.session_file, 'r') as f:
                     self.sessions = json.load(f)
-                    print(f"[AIAgent] Loaded {len(self.sessions)} sessions from disk")
+                    logger.info("Loaded %s sessions from disk", len(self.sessions))
+            if os.path.exists(self.session_state_file):
+                with open(self.session_state_file, 'r') as f:
+                    self.session_state = json.load(f)
         except Exception as e:
-            print(f"[AIAgent] Error loading sessions: {e}")
+            logger.error("Error loading sessions: %s", e)
         
-        # Load knowledge base once at startup
-        self.knowledge_base_prompt = ""
-        try:
-            import json
-            with open('api/scenario_patterns.json', 'r') as f:
-                data = json.load(f)
-                kb_lines = []
-                for theme, scenarios in data.items():
-                    for sid, sdata in scenarios.items():
-                        params = sdata.get('params', [])
-                        kb_lines.append(f"- {sid}: {params}")
-                self.knowledge_base_prompt = "\\n".join(kb_lines)
-        except Exception as e:
-            print(f"Error loading knowledge base: {e}")
-
-        # Load financial knowledge base
-        self.financial_kb_prompt = ""
-        try:
-             with open('api/financial_knowledge.json', 'r') as f:
-                 kb_data = json.load(f)
-                 kb_str = []
-                 for topic, info in kb_data.items():
-                     source = f" (Source: {info.get('source', 'Unknown')})" if info.get('source') else ""
-                     kb_str.append(f"{topic}: {info.get('coach_tip', '')} (Fact: {info.get('limit', '')} {info.get('tax_relief', '')}){source}")
-                 self.financial_kb_prompt = "\\n".join(kb_str)
-        except Exception as e:
-            print(f"Error loading financial KB: {e}")
+        # Scenario library, KB prompts and indices; hot-reloaded when the JSON files change
+        self.knowledge = KnowledgeStore(structured_intents=structured_intents, prompt_retrieval=prompt_retrieval)
+        # Deterministic mode answers without the LLM (see api/service_mode.py)
+        self.service_mode = service_mode
 
-    async def processUserInput(self, user_input: str, session_id: str = "default", context: Dict = None, mode: str = "goals"):
+    async def processUserInput(self, user_input: str, session_id: str = "default", context: Dict = None, mode: str = "goals",
+                               deadline: Optional[float] = None,
+                               on_action: Optional[Callable[["ScenarioAction"], Awaitable[None]]] = None):
         """
         Process user input with simulation context awareness
         
@@ -119,95 +226,113 @@ class AIAgent:
             session_id: Session identifier
             context: Simulation state (profile, scenarios, projections)
             mode: Conversation mode (goals, health, events)
+            deadline: Absolute time.monotonic() deadline for the upstream call
+            on_action: Called with the speculative action as soon as the fast
+                path has one, before the main reply arrives (speculative modes only)
+        
+        The turn is committed to the session only once the completion returns;
+        cancelled, timed-out or failed turns leave the history untouched.
+        Concurrent turns for the same session wait for each other, and the
+        wait counts against the deadline.
+        
+        Raises:
+            DeadlineExceeded: the deadline passed before the completion returned
         """
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        self._session_lock_users[session_id] = self._session_lock_users.get(session_id, 0) + 1
         try:
+            try:
+                await asyncio.wait_for(lock.acquire(), remaining(deadline))
+            except asyncio.TimeoutError:
+                metrics.inc('requests_cancelled_total', reason='deadline')
+                logger.warning("Deadline exceeded waiting for the session's previous turn")
+                raise DeadlineExceeded()
+            try:
+                return await self._process_turn(user_input, session_id, context, mode, deadline, on_action)
+            finally:
+                lock.release()
+        finally:
+            self._session_lock_users[session_id] -= 1
+            if not self._session_lock_users[session_id]:
+                del self._session_lock_users[session_id]
+                del self._session_locks[session_id]
+
+    async def _process_turn(self, user_input: str, session_id: str, context: Optional[Dict], mode: str,
+                            deadline: Optional[float], on_action: Optional[Callable[["ScenarioAction"], Awaitable[None]]] = None):
+        """One turn of processUserInput, run while holding the session's lock."""
+        # Per-stage latency, observed in chat_stage_seconds when the turn ends (see /metrics)
+        # and kept in the request trace for the Server-Timing header
+        stages = metrics.StageTimer('chat_stage_seconds', request_trace.stages())
+        prompt_started = time.perf_counter()
+        try:
+            # One snapshot for the whole turn, even if a reload swaps in a new one meanwhile
+            knowledge = self.knowledge.current
+            
             # Get or create session history
-            if session_id not in self.sessions:
-                from datetime import datetime
-                system_prompt = get_system_prompt(
-                    mode=mode,
-                    financial_kb=self.financial_kb_prompt,
-                    scenario_kb=self.knowledge_base_prompt,
-                    profile=context.get('profile', {}),
-                    current_date=datetime.now().strftime("%Y-%m-%d")
-                )
-                
-                self.sessions[session_id] = [{
-                    "role": "system",
-                    "content": system_prompt
-                }]
+            history = self.sessions.get(session_id)
+            request_trace.note('cache', systemPrompt="reused" if history is not None else "built")
+            if history is None:
+                metrics.inc('chat_sessions_created_total')
+            history, turn_messages, messages = self.build_turn_messages(knowledge, history, user_input, context, mode)
+            stages.add('prompt_build', time.perf_counter() - prompt_started)
             
-            # Build context-aware prompt if context provided
-            context_prompt = ""
-            if context:
-                profile = context.get('profile', {})
-                scenarios = context.get('activeScenarios', [])
-                
-                if profile:
-                    context_prompt = f"\n\nCURRENT USER CONTEXT:\n"
-                    if profile.get('name'):
-                        context_prompt += f"Name: {profile['name']}\n"
-                    if profile.get('age'):
-                        context_prompt += f"Age: {profile['age']}\n"
-                    if profile.get('income'):
-                        context_prompt += f"Annual Income: £{profile['income']:,}\n"
-                    if profile.get('savings'):
-                        context_prompt += f"Current Savings: £{profile['savings']:,}\n"
-                
-                # NEW: Add Solvency Metrics
-                solvency = context.get('solvency')
-                if solvency:
-                    is_solvent = solvency.get('isSolvent', True)
-                    context_prompt += "\nFINANCIAL HEALTH CHECK:\n"
-                    if not is_solvent:
-                        max_deficit = solvency.get('maxDeficit', 0)
-                        first_deficit = solvency.get('firstDeficitDate')
-                        context_prompt += f"⚠️ INSOLVENCY ALERT: User runs out of money (Deficit: £{max_deficit:,.0f}).\n"
-                        if first_deficit:
-                             context_prompt += f"   - Bankruptcy projected around: {first_deficit}\n"
-                    else:
-                         context_prompt += "✅ Solvency Check: PASS (Plan is sustainable)\n"
-                    
-                    monthly_surplus = solvency.get('monthlySurplus', 0)
-                    context_prompt += f"   - Avg Monthly Surplus: £{monthly_surplus:,.0f}\n"
-
-                if scenarios:
-                    context_prompt += f"\nActive Goals ({len(scenarios)}):\n"
-                    for s in scenarios[:5]:  # Limit to 5 to avoid token bloat
-                        context_prompt += f"- {s.get('type', 'Unknown')}: {s.get('params', {})}\n"
+            # Only the new message is scanned; earlier messages' keyword hits come from the session state
+            with stages.stage('matching'):
+                match_state = self._match_state(session_id, history, knowledge)
+                turn_hits = knowledge.matcher.message_hits(user_input)
+            with stages.stage('extraction'):
+                cache_hits = extract.cache_info().hits
+                turn_extraction = extract(user_input)
+                request_trace.note('cache', extraction="hit" if extract.cache_info().hits > cache_hits else "miss")
+            turn_amount = turn_extraction.amount
             
-            # Add context as system message if present
-            if context_prompt:
-                self.sessions[session_id].append({
-                    "role": "system",
-                    "content": context_prompt
-                })
+            # Degraded or switched to deterministic: no upstream call at all
+            if self.service_mode.mode != MODE_FULL:
+                return self._reply_deterministically(session_id, history, turn_messages, knowledge, match_state,
+                                                     turn_hits, turn_extraction, stages)
             
-            # Add user message
-            self.sessions[session_id].append({
-                "role": "user",
-                "content": user_input
-            })
+            # Model tiering: short answers to the question we just asked go to the fast model
+            with stages.stage('matching'):
+                model, tier, turn_type = self._route_model(user_input, history, knowledge, turn_hits, turn_amount)
             
             # Call OpenAI (temperature=0 for strict schema compliance)
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.sessions[session_id],
-                temperature=0.0
-            )
+            # Structured mode offers the open_config tool so actions come back as typed JSON
+            completion_kwargs = {}
+            if knowledge.intent_tool:
+                completion_kwargs = {"tools": [knowledge.intent_tool], "tool_choice": "auto"}
+            if deadline is not None:
+                completion_kwargs["timeout"] = remaining(deadline)
+            completion = self._timed(self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.0,
+                **completion_kwargs
+            ))
             
-            assistant_message = response.choices[0].message.content
+            # Speculative mode classifies the turn while the main completion is in flight
+            speculation, early_action, lead = None, None, None
+            with stages.stage('upstream'):
+                async with self.service_mode.upstream():
+                    if self.speculative_intents in ("local", "llm"):
+                        turn = self._race_speculation(
+                            completion, self._speculate(user_input, messages, knowledge, match_state, turn_hits, turn_amount),
+                            knowledge, on_action)
+                        (response, main_latency), speculation, early_action, lead = await asyncio.wait_for(turn, remaining(deadline))
+                    else:
+                        response, main_latency = await asyncio.wait_for(completion, remaining(deadline))
             
-            # DELETED: self.sessions[session_id].append({"role": "assistant", "content": assistant_message})
-            # We append the CLEANED message (or fallback) at the end of the function to avoid duplication.
-
-            # Save sessions to disk
-            try:
-                import json
-                with open(self.session_file, 'w') as f:
-                    json.dump(self.sessions, f, indent=2)
-            except Exception as e:
-                print(f"[AIAgent] Error saving sessions: {e}")
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                metrics.inc('llm_tokens_total', usage.prompt_tokens or 0, model=model, kind='prompt')
+                metrics.inc('llm_tokens_total', usage.completion_tokens or 0, model=model, kind='completion')
+                request_trace.note('tokens', prompt=usage.prompt_tokens, completion=usage.completion_tokens)
+            response_message = response.choices[0].message
+            assistant_message = response_message.content or ""
+            
+            # Completion returned: commit the turn (the assistant reply is appended below, once cleaned)
+            history.extend(turn_messages)
+            self.sessions[session_id] = history
+            self.session_state[session_id] = advance_match_state(match_state, turn_hits, turn_amount)
             
             # ============================================================
             # PATTERN-BASED INTENT DETECTION (All 55 Scenarios)
@@ -215,168 +340,41 @@ class AIAgent:
             # ============================================================
             
             import re
-            from .pattern_matcher import get_matcher
             
             intent_scenario = None
             intent_params = {}
+            invalid_params = []
             custom_scenario = None
             clean_message = assistant_message
             
-            # Get recent conversation history for this session
-            recent_messages = self.sessions.get(session_id, [])
-            print(f"[DEBUG] Session {session_id} has {len(recent_messages)} messages")
-            
-            user_messages = [m["content"].lower() for m in recent_messages if m["role"] == "user"]
-            
-            print(f"[DEBUG] User messages: {user_messages}")
-            
-            # NEW: Use pattern matcher for scenario detection
-            matcher = get_matcher()
-            match_result = matcher.match_scenario(
-                text=user_input,
-                conversation_history=user_messages
-            )
-            
-            if match_result:
-                goal_type, confidence = match_result
-                print(f"[PATTERN MATCH] Detected scenario: {goal_type} (confidence: {confidence:.2f})")
+            if speculation:
+                goal_type, amount = speculation.scenario_id, speculation.amount
             else:
-                goal_type = None
-                print("[NO MATCH] No scenario pattern matched")
-
-            
-            
-            # RULE 2: Extract amount from ALL user messages (most recent first)
-            amount = None
-            if user_messages:
-                # Check all user messages, most recent first
-                for user_msg in reversed(user_messages):
-                    # Pattern 1: Millions (1m, 1.5M, £1m, £1.5 million)
-                    if match := re.search(r'£?\s*(\d+(?:\.\d+)?)\s*m(?:illion)?', user_msg, re.I):
-                        amount = int(float(match.group(1)) * 1000000)
-                        break
-                    
-                    # Pattern 2: Thousands (300k, £300k, 300K)
-                    elif match := re.search(r'£?\s*(\d+(?:\.\d+)?)\s*k', user_msg, re.I):
-                        amount = int(float(match.group(1)) * 1000)
-                        break
-                    
-                    # Pattern 3: Explicit pounds with commas (£300,000 or £1,500,000)
-                    elif match := re.search(r'£\s*(\d{1,3}(?:,\d{3})+)', user_msg):
-                        amount = int(match.group(1).replace(',', ''))
-                        break
-                    
-                    # Pattern 4: Plain numbers with context (if preceded by amount/target/save)
-                    elif match := re.search(r'(?:amount|target|save|need)\s+(?:of\s+)?£?\s*(\d+(?:,\d{3})*)', user_msg):
-                        amount = int(match.group(1).replace(',', ''))
-                        break
-            
-            if amount:
-                print(f"[AMOUNT FOUND] £{amount:,} detected in conversation")
+                with stages.stage('matching'):
+                    goal_type, _, amount = self._classify_locally(knowledge, match_state, turn_hits, turn_amount)
             
+            parsing_started = time.perf_counter()
             action = None
             
-            # RULE 3: Check for AI-generated tags (PRIORITY)
-            intent_match = re.search(r'\[INTENT:([^\]]+)\]', assistant_message)
-            if intent_match:
+            # RULE 3: Check for AI-generated actions (PRIORITY)
+            # Structured mode returns a typed open_config tool call; otherwise scrape the [INTENT:...] tag
+            parsed_intent = parse_intent_tool_call(response_message) if knowledge.intent_tool else None
+            if parsed_intent:
+                intent_scenario, intent_params = parsed_intent
+                request_trace.note('intent', source="tool", scenario=intent_scenario)
+                logger.debug("Intent tool call: %s params=%s", intent_scenario, intent_params)
+            elif intent_match := re.search(r'\[INTENT:([^\]]+)\]', assistant_message):
                 # Parse AI tag (highest priority)
-                intent_data = intent_match.group(1)
-                parts = intent_data.split('|')
-                intent_scenario = parts[0]
-                
-                for part in parts[1:]:
-                    if ':' in part:
-                        key, value = part.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        try:
-                            # Handle date strings vs numbers with suffixes
-                            val_str = value.lower().strip()
-                            if '-' in value and len(value) == 10:
-                                intent_params[key] = value
-                            elif val_str.endswith('k'):
-                                intent_params[key] = int(float(val_str[:-1]) * 1000)
-                            elif val_str.endswith('m'):
-                                intent_params[key] = int(float(val_str[:-1]) * 1000000)
-                            elif '.' in value:
-                                intent_params[key] = float(value)
-                            else:
-                                intent_params[key] = int(value)
-                        except ValueError:
-                            intent_params[key] = value
-                
+                intent_scenario, intent_params = self._parse_intent_tag(intent_match.group(1))
+                request_trace.note('intent', source="tag", scenario=intent_scenario)
                 clean_message = re.sub(r'\s*\[INTENT:[^\]]+\]', '', assistant_message).strip()
-                print(f"[INTENT TAG] Parsed: {intent_scenario} params={intent_params}")
-                
-                # DEFINITIONS: Parameter Mappings (Generic -> Specific)
-                # Supports String (for single targetAmount mapping) or Dict (for direct key mapping)
-                PARAM_MAPPINGS = {
-                    'childbirth': 'oneOffCosts',
-                    'buy_vehicle': 'totalCost',
-                    'custom_goal': {'name': 'scenarioName', 'target_amount': 'targetAmount', 'monthly_amount': 'monthlyAmount', 'type': 'direction', 'frequency': 'frequency', 'date': 'targetDate'},
-                    'buy_home': {
-                        'property_price': 'propertyPrice', 
-                        'deposit_amount': 'depositAmount', 
-                        'purchase_date': 'purchaseDate', 
-                        'targetAmount': 'propertyPrice',
-                        'amount': 'propertyPrice',
-                        'price': 'propertyPrice',
-                        'cost': 'propertyPrice',
-                        'date': 'purchaseDate'
-                    },
-                    'marriage': {
-                        'totalBudget': 'totalBudget', 
-                        'targetAmount': 'totalBudget',
-                        'amount': 'totalBudget',
-                        'cost': 'totalBudget',
-                        'budget': 'totalBudget',
-                        'value': 'totalBudget',
-                        'date': 'weddingDate',
-                        'weddingDate': 'weddingDate'
-                    },
-                    'medical_emergency': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost', 'cost': 'totalCost'},
-                    'tax_bill': {'billAmount': 'billAmount', 'targetAmount': 'billAmount', 'amount': 'billAmount'},
-                    'home_improvement': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost', 'cost': 'totalCost'},
-                    'ivf_treatment': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost'},
-                    'help_family': 'monthlyAmount',
-                    'elder_care': 'monthlyAmount',
-                    'divorce': 'settlementCost',
-                    'death_partner': 'monthlyIncomeLost',
-                    'work_equipment': 'totalCost',
-                    'debt_consolidation': 'lumpSumPayment',
-                    'sell_asset': 'saleProceeds',
-                    'windfall': 'lumpSumAmount',
-                    'start_business': 'investmentAmount',
-                    'property_repair': 'repairCost'
-                }
-                
-                # 1. Apply SPECIFIC mappings first (preventing overwrite by normalization)
-                if intent_scenario in PARAM_MAPPINGS:
-                    mapping = PARAM_MAPPINGS[intent_scenario]
-                    if isinstance(mapping, dict):
-                         # Direct Multi-Key Mapping
-                         for ai_key, target_key in mapping.items():
-                             if ai_key in intent_params:
-                                 intent_params[target_key] = intent_params.pop(ai_key)
-                                 print(f"[MAPPING] Direct Map {ai_key} -> {target_key}")
-
-                # 2. Generic Normalization (Convert synonyms to targetAmount)
-                # Only if targetAmount doesn't already exist (and wasn't just mapped)
-                if 'targetAmount' not in intent_params:
-                    GENERIC_KEYS = ['amount', 'cost', 'value', 'price', 'total', 'settlement_amount', 'total_settlement_cost', 'monthly_income_lost', 'lost_income']
-                    found_generic_key = next((k for k in GENERIC_KEYS if k in intent_params), None)
-                    if found_generic_key:
-                        intent_params['targetAmount'] = intent_params.pop(found_generic_key)
-                        print(f"[NORMALIZATION] Mapped {found_generic_key} -> targetAmount")
-
-                # 3. Apply SINGLE mapping (if applicable and strictly string-based)
-                if intent_scenario in PARAM_MAPPINGS:
-                    mapping = PARAM_MAPPINGS[intent_scenario]
-                    if isinstance(mapping, str) and 'targetAmount' in intent_params:
-                         intent_params[mapping] = intent_params.pop('targetAmount')
-                         print(f"[MAPPING] Mapped targetAmount -> {mapping}")
-                
-                # Generate action from tag
+                logger.debug("Intent tag: %s params=%s", intent_scenario, intent_params)
+
+            if intent_scenario:
+                # Frontend key names and types in one pass; "in 5 years" style dates are resolved locally
+                intent_params = knowledge.params.normalize(intent_scenario, intent_params)
+                # Malformed values are dropped here and reported in missingFields, not sent to the config screen
+                intent_params, invalid_params = knowledge.params.validate(intent_scenario, intent_params)
                 
                 # Generate action from tag
                 action = ScenarioAction(
@@ -384,73 +382,383 @@ class AIAgent:
                     scenarioId=intent_scenario,
                     params=intent_params
                 )
+            main_intent = intent_scenario
             
             # RULE 4: Regex-based Fallback (If no tag detected)
             # CRITICAL FIX: Only trigger fallback if AI is NOT asking a question
             if not action and goal_type and amount and "?" not in assistant_message:
                 intent_scenario = goal_type
-                intent_params = {"targetAmount": amount}
-                
-                # Apply validation mapping here too
-                PARAM_MAPPINGS = {
-                    'childbirth': 'oneOffCosts',
-                    'buy_vehicle': 'totalCost',
-                    'buy_home': 'propertyPrice',
-                    'marriage': 'totalBudget',
-                    'medical_emergency': 'totalCost',
-                    'tax_bill': 'billAmount',
-                    'home_improvement': 'totalCost',
-                    'work_equipment': 'totalCost'
-                }
-                if intent_scenario in PARAM_MAPPINGS:
-                     intent_params[PARAM_MAPPINGS[intent_scenario]] = intent_params.pop('targetAmount')
-
-                print(f"[REGEX FALLBACK] Goal: {goal_type}, Amount: £{amount:,}")
+                intent_params = knowledge.params.normalize(intent_scenario, {"targetAmount": amount})
+                intent_params, invalid_params = knowledge.params.validate(intent_scenario, intent_params)
+
+                logger.info("Regex fallback: %s, amount £%s", goal_type, amount)
+                request_trace.note('intent', source="fallback", scenario=goal_type)
                 
                 action = ScenarioAction(
                     type="OPEN_CONFIG",
                     scenarioId=goal_type,
                     params=intent_params
                 )
-                print(f"[ACTION GENERATED] {action.type} for {goal_type}")
+                logger.debug("Action %s for %s", action.type, goal_type)
+            stages.add('intent_parsing', time.perf_counter() - parsing_started)
+            
+            if speculation:
+                reconcile(main_intent, speculation, used_speculation=bool(action) and not main_intent)
+            if early_action:
+                record_early_action(speculation.source, early_action.scenarioId, action.scenarioId if action else None, lead)
+            
+            # Slot store: what the user has already told us for the active scenario
+            slots = update_slots(match_state.get("slots"), intent_scenario or goal_type, knowledge.scenario_params,
+                                 turn_extraction, intent_params)
+            self.session_state[session_id]["slots"] = slots
+            missing = missing_fields(slots, knowledge.scenario_params, invalid_params, knowledge.params)
+            
+            outcome = "action" if action else ("question" if "?" in clean_message else "reply")
+            record_tier_outcome(tier, turn_type, main_latency, outcome,
+                                action_scenario=action.scenarioId if action else None, matched_scenario=goal_type)
             
             # Add assistant response to history (without any tags)
             if clean_message:
-                self.sessions[session_id].append({
+                history.append({
                     "role": "assistant",
                     "content": clean_message
                 })
             elif action:
                 # Fallback if AI only returned a tag
                 clean_message = "I've prepared that for you."
-                self.sessions[session_id].append({
+                history.append({
                     "role": "assistant",
                     "content": clean_message
                 })
             
+            with stages.stage('persistence'):
+                self._save_sessions()
+            
             # Return response with deterministically detected intent and action
             return AgentResponse(
                 message=clean_message,
-                profile_extracted=None,
-                profile_complete=False,
+                profileExtracted=None,
+                profileComplete=False,
                 confidence=0.9 if (intent_scenario and intent_params) else 0.0,
-                missing_fields=[],
+                missingFields=missing,
                 intent=intent_scenario,
                 params=intent_params if intent_params else None,
                 customScenario=custom_scenario,
-                action=action  # NEW: Action to execute
+                action=action,  # NEW: Action to execute
+                knowledgeVersion=knowledge.version,
+                serviceMode=MODE_FULL
             )
             
+        except (asyncio.TimeoutError, APITimeoutError):
+            metrics.inc('requests_cancelled_total', reason='deadline')
+            logger.warning("Deadline exceeded, turn discarded")
+            raise DeadlineExceeded()
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            metrics.inc('chat_turn_errors_total', error=type(e).__name__)
+            logger.exception("Turn failed")
             return AgentResponse(
                 message=f"I encountered an error: {type(e).__name__} - {str(e)}",
-                profile_extracted=None,
-                profile_complete=False,
+                profileExtracted=None,
+                profileComplete=False,
                 confidence=0.0,
-                missing_fields=[]
+                missingFields=[]
+            )
+        finally:
+            stages.observe()
+
+    def build_turn_messages(self, knowledge: KnowledgeSnapshot, history: Optional[List[Dict]], user_input: str,
+                            context: Optional[Dict], mode: str = "goals"):
+        """
+        Assemble the message list for one turn.
+        
+        Shared by processUserInput and the prompt profiler, so a profile
+        measures exactly what the next upstream request sends.
+        
+        Args:
+            knowledge: Snapshot the turn runs on
+            history: The session's stored messages, or None for a new session
+            user_input: The new user message
+            context: Simulation state sent with the turn
+            mode: Conversation mode (goals, health, events)
+        
+        Returns:
+            Tuple of (history, turn_messages, messages): the history (with a new
+            system prompt if the session is new), the messages the turn adds to
+            it once committed, and the full list sent upstream (which also
+            carries the per-turn retrieval block in retrieval mode)
+        """
+        if history is None:
+            from datetime import datetime
+            financial_kb, scenario_kb = knowledge.system_prompt_kbs()
+            system_prompt = get_system_prompt(
+                mode=mode,
+                financial_kb=financial_kb,
+                scenario_kb=scenario_kb,
+                profile=(context or {}).get('profile', {}),
+                current_date=datetime.now().strftime("%Y-%m-%d"),
+                structured_intents=knowledge.intent_tool is not None
             )
+            
+            history = [{
+                "role": "system",
+                "content": system_prompt
+            }]
+        turn_messages = []
+        
+        # Build context-aware prompt if context provided
+        context_prompt = ""
+        if context:
+            profile = context.get('profile', {})
+            scenarios = context.get('activeScenarios', [])
+            
+            if profile:
+                context_prompt = f"\n\nCURRENT USER CONTEXT:\n"
+                if profile.get('name'):
+                    context_prompt += f"Name: {profile['name']}\n"
+                if profile.get('age'):
+                    context_prompt += f"Age: {profile['age']}\n"
+                if profile.get('income'):
+                    context_prompt += f"Annual Income: £{profile['income']:,}\n"
+                if profile.get('savings'):
+                    context_prompt += f"Current Savings: £{profile['savings']:,}\n"
+            
+            # NEW: Add Solvency Metrics
+            solvency = context.get('solvency')
+            if solvency:
+                is_solvent = solvency.get('isSolvent', True)
+                context_prompt += "\nFINANCIAL HEALTH CHECK:\n"
+                if not is_solvent:
+                    max_deficit = solvency.get('maxDeficit', 0)
+                    first_deficit = solvency.get('firstDeficitDate')
+                    context_prompt += f"⚠️ INSOLVENCY ALERT: User runs out of money (Deficit: £{max_deficit:,.0f}).\n"
+                    if first_deficit:
+                         context_prompt += f"   - Bankruptcy projected around: {first_deficit}\n"
+                else:
+                     context_prompt += "✅ Solvency Check: PASS (Plan is sustainable)\n"
+                
+                monthly_surplus = solvency.get('monthlySurplus', 0)
+                context_prompt += f"   - Avg Monthly Surplus: £{monthly_surplus:,.0f}\n"
+
+            if scenarios:
+                context_prompt += f"\nActive Goals ({len(scenarios)}):\n"
+                for s in scenarios[:5]:  # Limit to 5 to avoid token bloat
+                    context_prompt += f"- {s.get('type', 'Unknown')}: {s.get('params', {})}\n"
+        
+        # Add context as system message if present
+        if context_prompt:
+            turn_messages.append({
+                "role": "system",
+                "content": context_prompt
+            })
+        
+        # Add user message
+        turn_messages.append({
+            "role": "user",
+            "content": user_input
+        })
+        
+        messages = history + turn_messages
+        if knowledge.retriever:
+            # Retrieved scenarios/facts go just before the user message and are not persisted
+            recent_user = [m["content"] for m in history if m["role"] == "user"][-2:]
+            retrieved = knowledge.retriever.render(" ".join(recent_user + [user_input]))
+            messages = history + turn_messages[:-1] + [{"role": "system", "content": retrieved}] + turn_messages[-1:]
+        return history, turn_messages, messages
+
+    async def _timed(self, awaitable):
+        """Await and return (result, elapsed seconds)."""
+        started = time.perf_counter()
+        result = await awaitable
+        return result, time.perf_counter() - started
+
+    def _save_sessions(self):
+        """Persist all sessions (and their matching state) to disk."""
+        try:
+            import json
+            with open(self.session_file, 'w') as f:
+                json.dump(self.sessions, f, indent=2)
+            with open(self.session_state_file, 'w') as f:
+                json.dump(self.session_state, f)
+        except Exception as e:
+            logger.error("Error saving sessions: %s", e)
+
+    def _reply_deterministically(self, session_id: str, history: List[Dict], turn_messages: List[Dict],
+                                 knowledge: KnowledgeSnapshot, match_state: Dict[str, Any], turn_hits: frozenset,
+                                 turn_extraction, stages: metrics.StageTimer) -> AgentResponse:
+        """
+        Answer a turn without the LLM: pattern match, extraction and slots, and a templated reply.
+        
+        Same rule as the regex fallback: a matched scenario plus an amount opens
+        its config screen; otherwise the reply asks for the first missing field.
+        The turn is committed like any other, so the LLM picks up the
+        conversation once the service is back in full mode.
+        """
+        request_trace.note('routing', serviceMode=MODE_DETERMINISTIC)
+        with stages.stage('matching'):
+            goal_type, _, amount = self._classify_locally(knowledge, match_state, turn_hits, turn_extraction.amount)
+        action = None
+        intent_params, invalid_params = {}, []
+        if goal_type and amount:
+            with stages.stage('intent_parsing'):
+                intent_params = knowledge.params.normalize(goal_type, {"targetAmount": amount})
+                intent_params, invalid_params = knowledge.params.validate(goal_type, intent_params)
+            action = ScenarioAction(type="OPEN_CONFIG", scenarioId=goal_type, params=intent_params)
+        
+        slots = update_slots(match_state.get("slots"), goal_type, knowledge.scenario_params, turn_extraction, intent_params)
+        missing = missing_fields(slots, knowledge.scenario_params, invalid_params, knowledge.params)
+        message = template_reply(goal_type or (slots or {}).get("scenarioId"), intent_params if action else None, missing)
+        
+        history.extend(turn_messages)
+        history.append({"role": "assistant", "content": message})
+        self.sessions[session_id] = history
+        self.session_state[session_id] = advance_match_state(match_state, turn_hits, turn_extraction.amount)
+        self.session_state[session_id]["slots"] = slots
+        with stages.stage('persistence'):
+            self._save_sessions()
+        metrics.inc('deterministic_turns_total', outcome="action" if action else "question")
+        
+        return AgentResponse(
+            message=message,
+            confidence=0.9 if (goal_type and intent_params) else 0.0,
+            missingFields=missing,
+            intent=goal_type,
+            params=intent_params if intent_params else None,
+            action=action,
+            knowledgeVersion=knowledge.version,
+            serviceMode=MODE_DETERMINISTIC
+        )
+
+    def _match_state(self, session_id: str, history: List[Dict], knowledge: KnowledgeSnapshot) -> Dict[str, Any]:
+        """Cached matching state for a session, rebuilt if missing, out of step with the history or built for older keywords."""
+        state = self.session_state.get(session_id)
+        cached = is_current(state, history, knowledge.matcher.fingerprint)
+        request_trace.note('cache', matchState="cached" if cached else "rebuilt")
+        if not cached:
+            rebuilt = build_match_state(history, knowledge.matcher)
+            # Slots don't depend on the keywords; keep them across a reload if the history still lines up
+            if state and state.get("slots") and state.get("userMessageCount") == rebuilt["userMessageCount"]:
+                rebuilt["slots"] = state["slots"]
+            state = rebuilt
+        return state
+
+    def _route_model(self, user_input: str, history: List[Dict], knowledge: KnowledgeSnapshot,
+                     turn_hits: frozenset, turn_amount: Optional[int]):
+        """
+        Pick the model for this turn.
+        
+        Returns:
+            Tuple of (model, tier, turn_type)
+        """
+        new_match = knowledge.matcher.match_hits([turn_hits])
+        turn_type = classify_turn(
+            user_input,
+            previous_reply=last_assistant_message(history),
+            new_scenario=new_match[0] if new_match else None,
+            has_amount=turn_amount is not None
+        )
+        tier = tier_for_turn(turn_type, fast_model_configured=bool(self.fast_model))
+        logger.debug("Routing %s -> %s tier", turn_type, tier)
+        model = self.fast_model if tier == TIER_FAST else self.model
+        request_trace.note('routing', serviceMode=MODE_FULL, model=model, tier=tier, turnType=turn_type)
+        return model, tier, turn_type
+
+    def _classify_locally(self, knowledge: KnowledgeSnapshot, match_state: Dict[str, Any],
+                          turn_hits: frozenset, turn_amount: Optional[int]):
+        """
+        Deterministic intent detection: pattern-match the scenario and extract the amount.
+        
+        Uses the cached keyword hits of the session's recent user messages plus
+        the current turn's, so no earlier message is rescanned.
+        
+        Returns:
+            Tuple of (scenario_id or None, confidence, amount or None)
+        """
+        # NEW: Use pattern matcher for scenario detection
+        match_result = knowledge.matcher.match_hits(window_hits(match_state, turn_hits))
+        
+        if match_result:
+            goal_type, confidence = match_result
+            logger.debug("Pattern match: %s (confidence %.2f)", goal_type, confidence)
+        else:
+            goal_type = None
+            logger.debug("No scenario pattern matched")
+        
+        # RULE 2: Most recent amount in ALL user messages (this turn's, else the last one seen)
+        amount = turn_amount if turn_amount is not None else match_state.get("lastAmount")
+        request_trace.note('match', scenario=goal_type, confidence=round(confidence, 2) if match_result else 0.0,
+                           amount=amount)
+        
+        if amount:
+            logger.debug("Amount £%s detected in conversation", amount)
+        
+        return goal_type, (confidence if match_result else 0.0), amount
+
+    async def _race_speculation(self, completion: Awaitable, speculate: Awaitable[SpeculativeIntent],
+                                knowledge: KnowledgeSnapshot,
+                                on_action: Optional[Callable[["ScenarioAction"], Awaitable[None]]]):
+        """
+        Run the main completion and the fast path together.
+        
+        If the fast path finishes first with a scenario and an amount, the action
+        the fallback rule would open is handed to on_action right away.
+        
+        Returns:
+            (completion result, speculation, early action or None, seconds the
+            early action went out ahead of the main reply or None)
+        """
+        main = asyncio.ensure_future(completion)
+        try:
+            speculation = await speculate
+            early_action, sent_at = None, None
+            if on_action and not main.done() and speculation.scenario_id and speculation.amount:
+                params = knowledge.params.normalize(speculation.scenario_id, {"targetAmount": speculation.amount})
+                params, _ = knowledge.params.validate(speculation.scenario_id, params)
+                early_action = ScenarioAction(type="OPEN_CONFIG", scenarioId=speculation.scenario_id, params=params)
+                await on_action(early_action)
+                sent_at = time.perf_counter()
+            result = await main
+        except BaseException:
+            main.cancel()
+            raise
+        return result, speculation, early_action, (time.perf_counter() - sent_at if early_action else None)
+
+    async def _speculate(self, user_input: str, messages: List[Dict], knowledge: KnowledgeSnapshot,
+                         match_state: Dict[str, Any], turn_hits: frozenset, turn_amount: Optional[int]) -> SpeculativeIntent:
+        """Fast path run alongside the main completion (see api/speculation.py)."""
+        started = time.perf_counter()
+        # Cached hits make local classification cheap enough to run inline
+        goal_type, confidence, amount = self._classify_locally(knowledge, match_state, turn_hits, turn_amount)
+        
+        if self.speculative_intents == "llm":
+            user_messages = [m["content"] for m in messages if m["role"] == "user"]
+            llm_scenario = await classify_with_llm(self.client, self.classifier_model, knowledge.scenario_ids, user_messages)
+            if llm_scenario:
+                goal_type, confidence = llm_scenario, 0.9
+        
+        return SpeculativeIntent(
+            scenario_id=goal_type,
+            confidence=confidence,
+            amount=amount,
+            source=self.speculative_intents,
+            latency=time.perf_counter() - started
+        )
+
+    def _parse_intent_tag(self, intent_data: str):
+        """Parse the body of an [INTENT:scenario|key:value|...] tag into (scenario, raw string params)."""
+        intent_params = {}
+        parts = intent_data.split('|')
+        intent_scenario = parts[0]
+        
+        for part in parts[1:]:
+            if ':' in part:
+                key, value = part.split(':', 1)
+                key = key.strip()
+                value = value.strip()
+                # Values stay strings here; the param registry types them
+                intent_params[key] = value
+        
+        return intent_scenario, intent_params
+
 
 def createAIAgent(api_key: str, model: str = "gpt-5-nano") -> AIAgent:
     """Create AI agent instance"""
@@ -488,6 +796,92 @@ class ChatResponse(BaseModel):
     customScenario: Optional[Dict[str, Any]] = None
     action: Optional[ScenarioAction] = None  # NEW: Actions to execute
     guidance: Optional[str] = None  # NEW: Educational insights
+    knowledgeVersion: Optional[str] = None  # Version of the scenario/KB snapshot that served the turn
+    serviceMode: Optional[str] = None  # 'deterministic' when the reply came from templates instead of the LLM
+    trace: Optional[Dict[str, Any]] = None  # Stage timings and decisions, only with ?debug=true (see api/request_trace.py)
+
+class ServiceModeRequest(BaseModel):
+    mode: str  # full, deterministic or off
+    reason: Optional[str] = None
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest]
+    concurrency: Optional[int] = None  # Turns in flight; capped at CHAT_BATCH_CONCURRENCY
+
+# ChatResponse fields that come straight from AgentResponse (same names); the rest keep their defaults
+_CHAT_DEFAULTS = {name: info.default for name, info in ChatResponse.model_fields.items()}
+_AGENT_FIELDS = [name for name in ChatResponse.model_fields if name in AgentResponse.__dataclass_fields__]
+
+def chat_payload(response_obj: AgentResponse, session_id: str) -> Dict[str, Any]:
+    """
+    The ChatResponse JSON for a turn, as a plain dict.
+    
+    Built straight from the AgentResponse fields; the agent's values are
+    already typed, so the model isn't re-validated on the hot path.
+    """
+    payload = dict(_CHAT_DEFAULTS)
+    for name in _AGENT_FIELDS:
+        payload[name] = getattr(response_obj, name)
+    payload["sessionId"] = session_id
+    if response_obj.action is not None:
+        payload["action"] = response_obj.action.model_dump()
+    return payload
+
+def get_ai_agent() -> AIAgent:
+    """Get or create the shared AI agent (configured from environment variables)."""
+    if not hasattr(app.state, 'ai_agent'):
+        # Check for Azure or Standard OpenAI
+        azure_key = os.getenv("AZURE_OPENAI_API_KEY")
+        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        azure_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+        
+        standard_key = os.getenv("OPENAI_API_KEY")
+        structured_intents = os.getenv("AI_STRUCTURED_INTENTS", "false").lower() == "true"
+        speculative_intents = os.getenv("AI_SPECULATIVE_INTENTS", "off")
+        classifier_model = os.getenv("AI_CLASSIFIER_MODEL")
+        prompt_retrieval = os.getenv("AI_PROMPT_RETRIEVAL", "false").lower() == "true"
+        
+        if azure_key and azure_endpoint:
+            logger.info("Configuring Azure OpenAI (deployment %s)", azure_deployment)
+            app.state.ai_agent = AIAgent(
+                api_key=azure_key,
+                model=azure_deployment or "gpt-4o-mini",
+                azure_endpoint=azure_endpoint,
+                api_version=azure_version,
+                structured_intents=structured_intents,
+                speculative_intents=speculative_intents,
+                classifier_model=classifier_model,
+                fast_model=os.getenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME"),
+                prompt_retrieval=prompt_retrieval
+            )
+        elif standard_key:
+            logger.info("Configuring Standard OpenAI")
+            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+            app.state.ai_agent = AIAgent(
+                api_key=standard_key,
+                model=model,
+                structured_intents=structured_intents,
+                speculative_intents=speculative_intents,
+                classifier_model=classifier_model,
+                fast_model=os.getenv("OPENAI_FAST_MODEL"),
+                prompt_retrieval=prompt_retrieval
+            )
+        else:
+            raise ValueError("No API Key found! Set AZURE_OPENAI_API_KEY or OPENAI_API_KEY.")
+    return app.state.ai_agent
+
+def is_admin(x_admin_key: Optional[str]) -> bool:
+    """True when ADMIN_API_KEY is set and x_admin_key matches it."""
+    admin_key = os.getenv("ADMIN_API_KEY")
+    return bool(admin_key and x_admin_key and hmac.compare_digest(x_admin_key, admin_key))
+
+def require_admin(x_admin_key: Optional[str] = Header(default=None)):
+    """Admin endpoints need ADMIN_API_KEY to be set and sent as X-Admin-Key."""
+    if not os.getenv("ADMIN_API_KEY"):
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_API_KEY)")
+    if not is_admin(x_admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
 
 @app.get("/")
 async def root():
@@ -503,78 +897,110 @@ async def health():
     api_key = os.getenv("OPENAI_API_KEY")
     return {
         "status": "healthy",
-        "api_key_configured": bool(api_key)
+        "api_key_configured": bool(api_key),
+        "serviceMode": service_mode.mode
+    }
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the startup build and warmup have finished, 503 before (or if it failed)."""
+    if not getattr(app.state, 'ready', False):
+        return ORJSONResponse({"status": "starting", **getattr(app.state, 'warmup', {})}, status_code=503)
+    return {
+        "status": "ready",
+        "knowledgeVersion": app.state.ai_agent.knowledge.current.version,
+        **app.state.warmup
     }
 
-@app.post("/api/chat")
-async def chat(request: ChatRequest):
+@app.get("/api/stats")
+async def stats():
+    """In-process counters (speculation agreement, tier outcomes, ...)"""
+    return metrics.snapshot()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Counters, per-stage latency histograms and gauges in the Prometheus text format"""
+    return Response(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _scrape_samples():
+    """Gauges and cache counters read on each /metrics scrape."""
+    current = service_mode.mode
+    samples = [("service_mode", "gauge", {"mode": mode}, float(mode == current)) for mode in MODES]
+    samples.append(("upstream_in_flight", "gauge", {}, service_mode.in_flight))
+    caches = {"extraction": extract.cache_info()}
+    agent = getattr(app.state, 'ai_agent', None)
+    if agent is not None:
+        samples.append(("chat_sessions", "gauge", {}, len(agent.sessions)))
+        caches["scenario_rank"] = agent.knowledge.current.matcher.cache_info()
+    for cache, info in caches.items():
+        samples.append(("cache_hits_total", "counter", {"cache": cache}, info.hits))
+        samples.append(("cache_misses_total", "counter", {"cache": cache}, info.misses))
+    return samples
+
+metrics.register_collector(_scrape_samples)
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request, debug: bool = False):
     """
     Chat endpoint for AI assistant
     Now accepts simulation context for context-aware responses
+    
+    The turn runs under an end-to-end deadline (CHAT_REQUEST_TIMEOUT_SECONDS, or a
+    shorter X-Request-Timeout header) and is cancelled if the client disconnects.
+    
+    Responses carry per-stage durations in a Server-Timing header; ?debug=true
+    also returns the turn's trace in the body when CHAT_DEBUG_TRACE is on and
+    the caller sends the admin key.
     """
+    if service_mode.mode == MODE_OFF:
+        raise HTTPException(status_code=503, detail=OFF_MESSAGE)
+    deadline = request_deadline(http_request.headers.get("x-request-timeout"))
+    request_id = http_request.headers.get("x-request-id") or uuid.uuid4().hex
+    started = time.perf_counter()
+    status = 500
+    trace = request_trace.start()
     try:
         # Extract request data
         user_message = request.message
         session_id = request.sessionId or str(uuid.uuid4())
         context = request.context or {}
+        bind_log_context(request_id, session_id)
         
-        # Log context for debugging
         if context:
-            print(f"[CONTEXT] Profile: {context.get('profile', {}).get('name', 'Unknown')}")
-            print(f"[CONTEXT] Active scenarios: {len(context.get('activeScenarios', []))}")
+            logger.debug("Context: profile %s, %s active scenarios",
+                         context.get('profile', {}).get('name', 'Unknown'), len(context.get('activeScenarios', [])))
         
         # Get or create AI agent
-        if not hasattr(app.state, 'ai_agent'):
-            # Check for Azure or Standard OpenAI
-            azure_key = os.getenv("AZURE_OPENAI_API_KEY")
-            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-            azure_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-            azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-            
-            standard_key = os.getenv("OPENAI_API_KEY")
-            
-            if azure_key and azure_endpoint:
-                print(f"[INIT] Configuring Azure OpenAI (Deployment: {azure_deployment})")
-                app.state.ai_agent = AIAgent(
-                    api_key=azure_key,
-                    model=azure_deployment or "gpt-4o-mini",
-                    azure_endpoint=azure_endpoint,
-                    api_version=azure_version
-                )
-            elif standard_key:
-                print("[INIT] Configuring Standard OpenAI")
-                model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-                app.state.ai_agent = AIAgent(api_key=standard_key, model=model)
-            else:
-                raise ValueError("No API Key found! Set AZURE_OPENAI_API_KEY or OPENAI_API_KEY.")
+        ai_agent = get_ai_agent()
         
         # Process message with context (note: processUserInput is now async)
-        response_obj = await app.state.ai_agent.processUserInput(
+        response_obj = await cancel_on_disconnect(http_request, ai_agent.processUserInput(
             user_message, 
             session_id,
             context,
-            mode=request.mode or "goals" # NEW: Pass mode
-        )
+            mode=request.mode or "goals", # NEW: Pass mode
+            deadline=deadline
+        ))
         
         # Build response
-        return ChatResponse(
-            message=response_obj.message,
-            sessionId=session_id,
-            profileExtracted=response_obj.profileExtracted if hasattr(response_obj, 'profileExtracted') else None,
-            profileComplete=response_obj.profileComplete if hasattr(response_obj, 'profileComplete') else False,
-            confidence=response_obj.confidence if hasattr(response_obj, 'confidence') else 0.0,
-            missingFields=response_obj.missingProfileFields if hasattr(response_obj, 'missingProfileFields') else [],
-            intent=response_obj.intent if hasattr(response_obj, 'intent') else None,
-            params=response_obj.params if hasattr(response_obj, 'params') else None,
-            customScenario=response_obj.customScenario if hasattr(response_obj, 'customScenario') else None,
-            action=response_obj.action if hasattr(response_obj, 'action') else None  # NEW
-        )
-        
-        # Debug: Log what we're returning
-        print(f"[API RESPONSE] Returning action: {response_obj.action if hasattr(response_obj, 'action') else 'NO ACTION ATTR'}")
-        
-        return chat_response
+        status = 200
+        total = time.perf_counter() - started
+        payload = chat_payload(response_obj, session_id)
+        if debug and request_trace.DEBUG_TRACE_ENABLED and is_admin(http_request.headers.get("x-admin-key")):
+            payload["trace"] = {"requestId": request_id, **trace.to_dict(total)}
+        return ORJSONResponse(payload, headers={"X-Request-ID": request_id, "Server-Timing": trace.server_timing(total)})
         
+    except ClientDisconnected:
+        # Nobody is listening; 499 is the conventional "client closed request" status
+        status = 499
+        return Response(status_code=499)
+    except DeadlineExceeded:
+        status = 504
+        raise HTTPException(
+            status_code=504,
+            detail="The assistant took too long to respond. Please try again.",
+            headers={"X-Request-ID": request_id, "Server-Timing": trace.server_timing(time.perf_counter() - started)}
+        )
     except ImportError as e:
         raise HTTPException(
             status_code=500,
@@ -586,6 +1012,126 @@ async def chat(request: ChatRequest):
             status_code=500,
             detail=f"Chat processing failed: {str(e)}\n{traceback.format_exc()}"
         )
+    finally:
+        metrics.inc('chat_requests_total', status=status)
+        metrics.observe('chat_request_seconds', time.perf_counter() - started)
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Chat turn streamed as NDJSON, so the scenario action can arrive before the reply.
+    
+    With AI_SPECULATIVE_INTENTS on, {"type": "action", "speculative": true, "action"}
+    is sent as soon as the fast path has a scenario and an amount. The last line
+    is {"type": "response", ...ChatResponse}, whose action is authoritative (it
+    replaces the early one), or {"type": "error", "status", "detail"}.
+    """
+    if service_mode.mode == MODE_OFF:
+        raise HTTPException(status_code=503, detail=OFF_MESSAGE)
+    try:
+        ai_agent = get_ai_agent()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+    
+    deadline = request_deadline(http_request.headers.get("x-request-timeout"))
+    session_id = request.sessionId or str(uuid.uuid4())
+    bind_log_context(http_request.headers.get("x-request-id") or uuid.uuid4().hex, session_id)
+    lines_out: asyncio.Queue = asyncio.Queue()
+    
+    async def on_action(action: ScenarioAction) -> None:
+        await lines_out.put({"type": "action", "speculative": True, "action": action.model_dump()})
+    
+    async def turn() -> None:
+        try:
+            response_obj = await ai_agent.processUserInput(
+                request.message, session_id, request.context or {}, mode=request.mode or "goals",
+                deadline=deadline, on_action=on_action
+            )
+            line = {"type": "response", **chat_payload(response_obj, session_id)}
+        except DeadlineExceeded:
+            line = {"type": "error", "status": 504, "detail": "The assistant took too long to respond. Please try again."}
+        except Exception as e:
+            line = {"type": "error", "status": 500, "detail": f"Chat processing failed: {str(e)}"}
+        await lines_out.put(line)
+    
+    async def lines():
+        # Closing the stream (client gone) cancels the turn, which leaves the history untouched
+        task = asyncio.create_task(turn())
+        try:
+            while True:
+                line = await lines_out.get()
+                yield orjson.dumps(line) + b"\n"
+                if line["type"] != "action":
+                    break
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: ChatBatchRequest, http_request: Request):
+    """
+    Run many chat turns in one request (QA / prompt-evaluation runs).
+    
+    Streams NDJSON, one line per item as it completes:
+    {"index", "sessionId", "status", "response"} or {"index", "sessionId", "status", "error"}.
+    Turns of one session run in submission order; items without a sessionId
+    each get a new session. Each turn gets its own deadline (X-Request-Timeout applies per turn).
+    
+    Every turn is rate limited like a separate /api/chat request. A turn that
+    would be turned away waits for its Retry-After instead, so a batch bigger
+    than the burst is throttled to the refill rate and each session's turns
+    still all run, in order.
+    """
+    if service_mode.mode == MODE_OFF:
+        raise HTTPException(status_code=503, detail=OFF_MESSAGE)
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    try:
+        ai_agent = get_ai_agent()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+    
+    timeout_header = http_request.headers.get("x-request-timeout")
+    batch_id = http_request.headers.get("x-request-id") or uuid.uuid4().hex
+    bind_log_context(batch_id)
+    items = [(item.sessionId or str(uuid.uuid4()), item) for item in request.items]
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    rate_limiter = http_request.scope.get("rate_limiter")
+    
+    async def run_turn(index: int, item: ChatRequest) -> Dict[str, Any]:
+        session_id = items[index][0]
+        bind_log_context(f"{batch_id}-{index}", session_id)
+        while rate_limiter:
+            limit, wait = await rate_limiter.admit(http_request.scope, session_id)
+            if not limit:
+                break
+            metrics.inc('chat_batch_throttled_seconds_total', wait, limit=limit)
+            await asyncio.sleep(wait)
+        try:
+            response_obj = await ai_agent.processUserInput(
+                item.message,
+                session_id,
+                item.context or {},
+                mode=item.mode or "goals",
+                deadline=request_deadline(timeout_header)
+            )
+        except DeadlineExceeded:
+            return {"index": index, "sessionId": session_id, "status": 504,
+                    "error": "The assistant took too long to respond."}
+        finally:
+            if rate_limiter:
+                rate_limiter.release()
+        response = chat_payload(response_obj, session_id)
+        return {"index": index, "sessionId": session_id, "status": 200, "response": response}
+    
+    async def lines():
+        async for result in run_batch(items, run_turn, concurrency):
+            yield orjson.dumps(result) + b"\n"
+    
+    logger.info("Batch of %s chat turns, %s sessions, concurrency %s", len(items), len({sid for sid, _ in items}), concurrency)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.delete("/api/sessions/{session_id}")
 async def clear_session(session_id: str):
@@ -595,6 +1141,78 @@ async def clear_session(session_id: str):
         return {"status": "cleared", "sessionId": session_id}
     return {"status": "not_found", "sessionId": session_id}
 
+def _profile_next_turn(ai_agent: AIAgent, session_id: str, history: Optional[List[Dict]], message: str,
+                       context: Optional[Dict[str, Any]], mode: str, include_messages: bool) -> Dict[str, Any]:
+    # The same assembly as a real turn; nothing is stored
+    _, _, messages = ai_agent.build_turn_messages(ai_agent.knowledge.current, history, message, context, mode)
+    return {"sessionId": session_id, **profile_session(messages, include_messages=include_messages)}
+
+@app.get("/api/admin/sessions/{session_id}/prompt-profile", dependencies=[Depends(require_admin)])
+async def session_prompt_profile(session_id: str, message: str = "", include_messages: bool = False):
+    """
+    Token/byte breakdown of the upstream request the session's next turn would send.
+    
+    Assembled like a chat turn: the stored history, then `message` as the user
+    message and, in retrieval mode, the block retrieved for it. POST a chat
+    request body to include its context block too.
+    """
+    ai_agent = get_ai_agent()
+    history = ai_agent.sessions.get(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return _profile_next_turn(ai_agent, session_id, history, message, None, "goals", include_messages)
+
+@app.post("/api/admin/sessions/{session_id}/prompt-profile", dependencies=[Depends(require_admin)])
+async def session_prompt_profile_for_request(session_id: str, request: ChatRequest, include_messages: bool = False):
+    """Breakdown of the upstream request for a given chat request body; an unknown session is profiled as a new one."""
+    ai_agent = get_ai_agent()
+    return _profile_next_turn(ai_agent, session_id, ai_agent.sessions.get(session_id), request.message,
+                              request.context, request.mode or "goals", include_messages)
+
+@app.get("/api/admin/prompt-profile", dependencies=[Depends(require_admin)])
+async def store_prompt_profile():
+    """Prompt size distributions across all sessions in the store"""
+    return profile_store(get_ai_agent().sessions)
+
+@app.get("/api/admin/service-mode", dependencies=[Depends(require_admin)])
+async def get_service_mode():
+    """Current service mode, why it is in it, and the auto-degrade inputs"""
+    return service_mode.status()
+
+@app.post("/api/admin/service-mode", dependencies=[Depends(require_admin)])
+async def set_service_mode(request: ServiceModeRequest):
+    """
+    Switch AI chat between full, deterministic and off.
+    
+    Lasts until the next switch (admin or SERVICE_MODE_FILE) or restart.
+    """
+    try:
+        service_mode.set(request.mode.lower(), 'admin', request.reason)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return service_mode.status()
+
+@app.post("/api/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_knowledge():
+    """
+    Rebuild the scenario library and KB indices from disk and swap them in.
+    
+    In-flight turns finish on the snapshot they started with.
+    """
+    store = get_ai_agent().knowledge
+    try:
+        snapshot = await asyncio.to_thread(store.reload, "admin")
+    except Exception as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Reload failed, still serving version {store.current.version}: {e}"
+        )
+    return {
+        "knowledgeVersion": snapshot.version,
+        "scenarios": len(snapshot.scenario_ids),
+        "knowledgeTopics": len(snapshot.financial_kb)
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
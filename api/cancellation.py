@@ -0,0 +1,83 @@
+"""
+Request Deadlines and Client-Disconnect Cancellation
+
+Each /api/chat request gets an end-to-end deadline that is propagated into the
+upstream completion call. If the browser goes away first, the in-flight turn
+is cancelled so the upstream request is dropped instead of running to
+completion for nobody.
+
+Partial-state rule: AIAgent commits a turn (context block, user message and
+assistant reply) to the session only after the completion returns, so a
+cancelled or timed-out turn leaves the session history untouched. Turns of
+one session hold a per-session asyncio.Lock, so concurrent requests for it
+run one after the other instead of interleaving their history writes.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("CHAT_REQUEST_TIMEOUT_SECONDS", "60"))
+MAX_TIMEOUT_SECONDS = float(os.getenv("CHAT_REQUEST_MAX_TIMEOUT_SECONDS", "120"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed before the turn completed."""
+
+
+class ClientDisconnected(Exception):
+    """The client went away and the turn was cancelled."""
+
+
+def request_deadline(timeout_header: Optional[str] = None) -> float:
+    """
+    Compute an absolute deadline (time.monotonic() based) for a request.
+
+    Clients may ask for a shorter budget with an X-Request-Timeout header
+    (seconds); it is capped at CHAT_REQUEST_MAX_TIMEOUT_SECONDS.
+    """
+    timeout = DEFAULT_TIMEOUT_SECONDS
+    if timeout_header:
+        try:
+            timeout = float(timeout_header)
+        except ValueError:
+            pass
+    timeout = min(max(timeout, 0.0), MAX_TIMEOUT_SECONDS)
+    return time.monotonic() + timeout
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until the deadline (None if there is no deadline)."""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.001)
+
+
+async def cancel_on_disconnect(request: Any, awaitable: Awaitable, label: str = "chat") -> Any:
+    """
+    Await `awaitable`, cancelling it if the ASGI client disconnects first.
+
+    Raises:
+        ClientDisconnected: the client went away and the work was cancelled
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                metrics.inc('requests_cancelled_total', reason='disconnect')
+                logger.info("Client disconnected, cancelled in-flight %s request", label)
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,59 @@
+"""
+Batch Chat Execution
+
+Runs the turns of one /api/chat/batch request (QA and prompt-evaluation
+runs) with a bounded number of turns in flight. Turns for the same session
+run one after another in submission order, because each turn builds on the
+history the previous one committed; different sessions run concurrently.
+Results are yielded as each turn finishes, tagged with the item's index.
+"""
+
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from . import metrics
+
+BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+
+
+async def run_batch(items: List[Tuple[str, Any]], run_turn: Callable[[int, Any], Awaitable[Dict[str, Any]]],
+                    concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run batch items and yield one result dict per item, in completion order.
+
+    Args:
+        items: (session_id, item) pairs in submission order
+        run_turn: Coroutine function (index, item) -> result dict for one turn
+        concurrency: Maximum number of turns in flight across all sessions
+
+    A turn that raises yields {"index", "status": 500, "error"}; later turns of
+    the same session still run. Closing the iterator cancels everything left.
+    """
+    by_session: Dict[str, List[Tuple[int, Any]]] = {}
+    for index, (session_id, item) in enumerate(items):
+        by_session.setdefault(session_id, []).append((index, item))
+
+    results: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_session(turns: List[Tuple[int, Any]]) -> None:
+        for index, item in turns:
+            # One slot per turn, not per session, so a long session can't starve the others
+            async with slots:
+                try:
+                    result = await run_turn(index, item)
+                except Exception as e:
+                    result = {"index": index, "status": 500, "error": f"{type(e).__name__}: {e}"}
+            metrics.inc('chat_batch_items_total', status=result.get("status", 200))
+            await results.put(result)
+
+    workers = [asyncio.create_task(run_session(turns)) for turns in by_session.values()]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
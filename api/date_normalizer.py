@@ -0,0 +1,155 @@
+"""
+Relative Date Normalizer (UK)
+
+Turns the date phrases users actually type ("in 5 years", "next month",
+"june 2028", "03/04/2027") into concrete dates relative to a supplied "now",
+so YYYY-MM-DD params can be resolved locally instead of asking the model
+again. Numeric dates are read day-first (UK). Intent params reach it through
+the param registry's date coercion (api/param_registry.py).
+
+A bare year ("by 2028") names no month or day, so it only resolves for params
+that are years themselves (see allows_bare_year); any other date slot stays
+open and the model asks when exactly.
+
+Deliberately small: a handful of precompiled patterns instead of a
+general-purpose parser, so importing it costs next to nothing.
+"""
+
+import calendar
+import re
+from datetime import date, timedelta
+from typing import Optional, Union
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+# Meteorological seasons, as used in the UK
+SEASONS = {'spring': (3, 1), 'summer': (6, 1), 'autumn': (9, 1), 'fall': (9, 1), 'winter': (12, 1), 'christmas': (12, 25)}
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'eighteen': 18, 'twenty': 20, 'thirty': 30,
+}
+
+_MONTH = r'(?P<month>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+_COUNT = r'(?P<count>\d+|' + '|'.join(NUMBER_WORDS) + r')'
+_UNIT = r'(?P<unit>years?|yrs?|months?|weeks?|days?)'
+
+ISO_PATTERN = re.compile(r'\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b')
+NUMERIC_PATTERN = re.compile(r'\b(?P<day>\d{1,2})[/.](?P<month>\d{1,2})[/.](?P<year>\d{4}|\d{2})\b')
+MONTH_YEAR_NUMERIC_PATTERN = re.compile(r'\b(?P<month>\d{1,2})/(?P<year>\d{4})\b')
+OFFSET_PATTERN = re.compile(rf'\b(?:in\s+)?{_COUNT}\s+{_UNIT}\b(?:\s+(?:from\s+now|time))?', re.I)
+NEXT_PATTERN = re.compile(r'\b(?P<which>next|this|coming)\s+(?P<what>year|month|week|' + '|'.join(SEASONS) + r')\b', re.I)
+END_OF_PATTERN = re.compile(r'\bend\s+of\s+(?:the\s+)?(?:(?:this\s+)?year|(?P<year>\d{4}))\b', re.I)
+NAMED_PATTERN = re.compile(
+    rf'\b(?:(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?)?{_MONTH}\b(?:\s+(?P<day_after>\d{{1,2}})(?:st|nd|rd|th)?\b)?(?:,?\s+(?P<year>\d{{4}})\b)?',
+    re.I,
+)
+YEAR_PATTERN = re.compile(r'\b(?P<year>(?:19|20)\d{2})\b')
+STRICT_ISO_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def add_months(start: date, months: int) -> date:
+    """start + months, clamping the day to the end of shorter months (31 Jan + 1 month = 28/29 Feb)."""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def allows_bare_year(param: str) -> bool:
+    """True for params that only need a year (targetYear, retirement_year)."""
+    return param.lower().endswith('year')
+
+
+def _count(text: str) -> int:
+    text = text.lower()
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def normalize_date(text: str, now: Optional[date] = None, allow_year: bool = False) -> Optional[date]:
+    """
+    Resolve a date phrase to a concrete date.
+
+    Args:
+        text: A phrase or sentence mentioning a date
+        now: Reference date for relative phrases (default: today)
+        allow_year: Resolve a bare year ("by 2028") to 1 January; otherwise it gives None
+
+    Returns:
+        The first date found in the text, or None. Dates without a day resolve
+        to the 1st of the month; a month without a year to its next
+        occurrence from now.
+    """
+    now = now or date.today()
+    text = text.strip()
+
+    if match := ISO_PATTERN.search(text):
+        return _safe_date(int(match['year']), int(match['month']), int(match['day']))
+
+    if match := NUMERIC_PATTERN.search(text):
+        year = int(match['year'])
+        year = year + 2000 if year < 100 else year
+        return _safe_date(year, int(match['month']), int(match['day']))  # UK: day first
+
+    if match := MONTH_YEAR_NUMERIC_PATTERN.search(text):
+        return _safe_date(int(match['year']), int(match['month']), 1)
+
+    if match := OFFSET_PATTERN.search(text):
+        count = _count(match['count'])
+        unit = match['unit'].lower().rstrip('s')
+        if unit in ('year', 'yr'):
+            return add_months(now, 12 * count)
+        if unit == 'month':
+            return add_months(now, count)
+        return now + timedelta(weeks=count) if unit == 'week' else now + timedelta(days=count)
+
+    if match := NEXT_PATTERN.search(text):
+        which, what = match['which'].lower(), match['what'].lower()
+        step = 0 if which == 'this' else 1
+        if what == 'year':
+            return add_months(now, 12 * step)
+        if what == 'month':
+            return add_months(now, step)
+        if what == 'week':
+            return now + timedelta(weeks=step)
+        month, day = SEASONS[what]
+        season_start = date(now.year, month, day)
+        # "this summer" is this year's; "next summer" is the next one that hasn't started yet
+        return season_start if which == 'this' or season_start > now else date(now.year + 1, month, day)
+
+    if match := END_OF_PATTERN.search(text):
+        return date(int(match['year']) if match['year'] else now.year, 12, 31)
+
+    match = NAMED_PATTERN.search(text)
+    # A bare "may" is the verb ("I may move"), not the month
+    if match and not (match['month'].lower() == 'may' and not (match['day'] or match['day_after'] or match['year'])):
+        month = MONTHS[match['month'][:3].lower()]
+        day = int(match['day'] or match['day_after'] or 1)
+        if match['year']:
+            return _safe_date(int(match['year']), month, day)
+        candidate = _safe_date(now.year, month, day)
+        if candidate and candidate < now:
+            candidate = _safe_date(now.year + 1, month, day)
+        return candidate
+
+    if allow_year and (match := YEAR_PATTERN.search(text)):
+        return date(int(match['year']), 1, 1)
+
+    return None
+
+
+def to_iso(value: Union[str, int], now: Optional[date] = None, allow_year: bool = False) -> Optional[str]:
+    """normalize_date() as a YYYY-MM-DD string (ints are treated as years)."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return None
+    resolved = normalize_date(value, now, allow_year)
+    return resolved.isoformat() if resolved else None
@@ -0,0 +1,163 @@
+"""
+Money, Duration and Date Extraction
+
+Tokenizes a message once with a single compiled pattern and pulls out every
+amount (k/m suffixes, comma groups, £, "a month"), duration ("18 months")
+and date mention ("2027-06-01", "june 2027", "next year") in one pass. Each
+amount keeps the words around it in its clause ("deposit of 30k" ->
+deposit, of), so the slot store can tell which param it is for.
+
+Results are memoized per message. Stored messages never change, so the
+message text itself serves as the cache key (history dicts are sent upstream
+as-is, so they can't carry an extra id field).
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+EXTRACTION_CACHE_SIZE = 8192
+# Words before (and after) an amount kept as its label
+LABEL_WORDS_BEFORE = 3
+LABEL_WORDS_AFTER = 1
+
+MULTIPLIERS = {
+    'k': 1000, 'thousand': 1000, 'grand': 1000,
+    'm': 1000000, 'mil': 1000000, 'million': 1000000,
+}
+PERIODS = {
+    'month': 'month', 'mo': 'month', 'pm': 'month', 'p/m': 'month', 'monthly': 'month',
+    'year': 'year', 'yr': 'year', 'annum': 'year', 'pa': 'year', 'yearly': 'year', 'annually': 'year',
+    'week': 'week', 'wk': 'week', 'weekly': 'week',
+}
+DURATION_MONTHS = {'year': 12, 'yr': 12, 'month': 1, 'mo': 1, 'week': 0.25, 'wk': 0.25}
+
+_NUMBER = r'(?<![\w.,])(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?'
+_MONTH_NAME = r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+_UNIT = r'(?:years?|yrs?|months?|mos?|weeks?|wks?)\b'
+
+# Alternatives are tried left to right at each position: dates before numbers,
+# durations before amounts (so "6 months" is never read as £6m)
+TOKEN_PATTERN = re.compile(rf"""
+    (?P<iso_date>\b\d{{4}}-\d{{1,2}}-\d{{1,2}}\b)
+  | (?P<numeric_date>\b\d{{1,2}}[/.]\d{{1,2}}[/.](?:\d{{4}}|\d{{2}})\b)
+  | (?P<named_date>\b(?:\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?)?{_MONTH_NAME}\b(?:\s+\d{{1,2}}(?:st|nd|rd|th)?\b)?(?:,?\s+(?:19|20)\d{{2}}\b)?)
+  | (?P<relative_date>\b(?:next|this)\s+(?:year|month|week|spring|summer|autumn|fall|winter|christmas)\b
+                     |\bin\s+(?P<in_count>\d+)\s+(?P<in_unit>{_UNIT}))
+  | (?P<year_date>\b(?:in|by|until|before|from|after)\s+(?P<year>(?:19|20)\d{{2}})\b)
+  | (?P<duration>(?P<duration_count>{_NUMBER})\s*(?P<duration_unit>{_UNIT}))
+  | (?P<context>\b(?:amount|target|save|need)\s+(?:of\s+)?)
+  | (?P<amount>(?P<currency>£\s*)?(?P<number>{_NUMBER})
+       (?:\s*(?P<suffix>million|mil|thousand|grand|k|m)\b)?
+       (?:\s*(?:a|per|each|/)\s*(?P<per>month|year|annum|week|mo|yr|wk)\b
+         |\s+(?P<per_word>monthly|yearly|annually|weekly)\b
+         |\s*(?P<per_abbrev>pm|pa|p/m)\b)?)
+""", re.IGNORECASE | re.VERBOSE)
+WORD_PATTERN = re.compile(r'[a-z]+')
+# A label doesn't reach across these: "300k for the house, 30k deposit"
+CLAUSE_BREAK = re.compile(r'[,.;:!?()]|\band\b|\bwith\b|\bplus\b', re.IGNORECASE)
+
+
+class Amount(NamedTuple):
+    value: int
+    period: Optional[str]  # 'month', 'year', 'week' or None for a one-off amount
+    kind: str  # 'million', 'thousand', 'currency' (£ with comma groups), 'context' (after save/need/...) or 'plain'
+    start: int
+    label: Tuple[str, ...] = ()  # lowercase words around the amount in its clause, e.g. ('a', 'deposit', 'of')
+
+
+class Duration(NamedTuple):
+    months: float
+    text: str
+    start: int
+
+
+class DateMention(NamedTuple):
+    text: str
+    kind: str  # 'iso', 'numeric', 'named', 'relative' or 'year'
+    start: int
+
+
+# Legacy priority for the single amount of a message: any million figure, then thousands,
+# then £ with comma groups, then a number after amount/target/save/need
+AMOUNT_PRIORITY = ('million', 'thousand', 'currency', 'context')
+
+
+class Extraction(NamedTuple):
+    amounts: Tuple[Amount, ...]
+    durations: Tuple[Duration, ...]
+    dates: Tuple[DateMention, ...]
+
+    @property
+    def amount(self) -> Optional[int]:
+        """The message's headline amount (1m, 300k, £300,000, 'save 5000'), or None."""
+        for kind in AMOUNT_PRIORITY:
+            for amount in self.amounts:
+                if amount.kind == kind:
+                    return amount.value
+        return None
+
+
+def _to_number(text: str) -> float:
+    return float(text.replace(',', ''))
+
+
+def _label(text: str, start: int, end: int) -> Tuple[str, ...]:
+    before = CLAUSE_BREAK.split(text[max(0, start - 60):start])[-1]
+    after = CLAUSE_BREAK.split(text[end:end + 30])[0]
+    return (tuple(WORD_PATTERN.findall(before.lower())[-LABEL_WORDS_BEFORE:])
+            + tuple(WORD_PATTERN.findall(after.lower())[:LABEL_WORDS_AFTER]))
+
+
+@lru_cache(maxsize=EXTRACTION_CACHE_SIZE)
+def extract(text: str) -> Extraction:
+    """All amounts, durations and dates in a message, in order of appearance (memoized)."""
+    amounts, durations, dates = [], [], []
+    context_end = -1
+
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.group('amount') is not None:
+            number = match.group('number')
+            suffix = (match.group('suffix') or '').lower()
+            period_word = (match.group('per') or match.group('per_word') or match.group('per_abbrev') or '').lower()
+            value = _to_number(number) * MULTIPLIERS.get(suffix, 1)
+            if not math.isfinite(value):
+                continue  # a digit run too long to be money
+            value = int(value)
+            if suffix:
+                amount_kind = 'million' if MULTIPLIERS[suffix] == 1000000 else 'thousand'
+            elif match.start() == context_end:
+                amount_kind = 'context'
+            elif match.group('currency') and ',' in number:
+                amount_kind = 'currency'
+            else:
+                amount_kind = 'plain'
+            amounts.append(Amount(value, PERIODS.get(period_word), amount_kind, match.start(),
+                                  _label(text, match.start(), match.end())))
+        elif match.group('context') is not None:
+            context_end = match.end()
+        elif match.group('duration') is not None:
+            unit = match.group('duration_unit').lower().rstrip('s')
+            months = _to_number(match.group('duration_count')) * DURATION_MONTHS[unit]
+            if not math.isfinite(months):
+                continue
+            durations.append(Duration(months, match.group('duration'), match.start()))
+        else:
+            date_kind = next(k for k in ('iso_date', 'numeric_date', 'named_date', 'relative_date', 'year_date')
+                             if match.group(k) is not None)
+            date_text = match.group(date_kind)
+            if date_kind == 'named_date' and date_text.lower() == 'may':
+                continue  # the verb, most of the time ("I may buy a car")
+            dates.append(DateMention(date_text, date_kind[:-len('_date')], match.start()))
+            if match.group('in_count'):
+                unit = match.group('in_unit').lower().rstrip('s')
+                months = int(match.group('in_count')) * DURATION_MONTHS[unit]
+                durations.append(Duration(months, date_text, match.start()))
+
+    return Extraction(tuple(amounts), tuple(durations), tuple(dates))
+
+
+def extract_amount(text: str) -> Optional[int]:
+    """Headline money amount in one message (1m, 300k, £300,000, 'save 5000')."""
+    return extract(text).amount
@@ -0,0 +1,130 @@
+"""
+Structured Intent Schema
+
+Builds the `open_config` tool definition from scenario_patterns.json so the
+model can return a scenario action as a typed object instead of an
+[INTENT:...] tag embedded in its reply. The arguments schema is a oneOf with
+one branch per scenario: scenarioId is fixed to a const and params lists only
+that scenario's params, so each scenario's params keep their own types.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+INTENT_TOOL_NAME = "open_config"
+
+# Extra fields the custom_goal prompt asks for that are not in the pattern file
+CUSTOM_GOAL_EXTRAS = {
+    'direction': {'type': 'string', 'enum': ['save', 'spend', 'income', 'debt', 'withdraw']},
+    'frequency': {'type': 'string', 'description': 'lump_sum or monthly'},
+    'monthlyAmount': {'type': 'number', 'description': 'GBP per month'},
+}
+
+DATE_HINTS = ('date', 'deadline', 'last_day')
+MONEY_HINTS = ('amount', 'cost', 'price', 'budget', 'salary', 'income', 'debt', 'payment',
+               'balance', 'proceeds', 'payout', 'expenses', 'severance', 'contribution',
+               'reduction', 'lost')
+RATE_HINTS = ('rate', 'severity')
+COUNT_HINTS = ('months', 'years', 'duration', 'age', 'period')
+
+
+def split_param_hint(raw_name: str) -> Tuple[str, str]:
+    """Split 'total_settlement_cost (Include legal fees)' into name and hint."""
+    match = re.match(r'\s*([^\s(]+)\s*(?:\((.*)\))?', raw_name)
+    if not match:
+        return raw_name.strip(), ""
+    return match.group(1), (match.group(2) or "").strip()
+
+
+def infer_param_schema(name: str) -> Dict[str, Any]:
+    """Infer a JSON schema fragment from a param name (e.g. 'due_date' -> date string)."""
+    lowered = name.lower()
+    if any(hint in lowered for hint in DATE_HINTS):
+        return {'type': 'string', 'format': 'date', 'description': 'YYYY-MM-DD'}
+    if any(hint in lowered for hint in RATE_HINTS):
+        return {'type': 'number', 'description': 'Percentage, e.g. 4.5'}
+    if any(hint in lowered for hint in COUNT_HINTS):
+        return {'type': 'integer'}
+    if any(hint in lowered for hint in MONEY_HINTS):
+        return {'type': 'number', 'description': 'GBP, plain number'}
+    return {'type': 'string'}
+
+
+def scenario_branch(scenario_id: str, raw_params: List[str]) -> Dict[str, Any]:
+    """The oneOf branch for one scenario: its scenarioId const and only its own params."""
+    param_properties: Dict[str, Any] = {}
+    for raw_name in raw_params:
+        name, hint = split_param_hint(raw_name)
+        schema = infer_param_schema(name)
+        if hint:
+            schema = {**schema, 'description': f"{schema.get('description', '')} {hint}".strip()}
+        param_properties[name] = schema
+    if scenario_id == 'custom_goal':
+        for name, schema in CUSTOM_GOAL_EXTRAS.items():
+            param_properties.setdefault(name, schema)
+
+    return {
+        'type': 'object',
+        'properties': {
+            'scenarioId': {'const': scenario_id},
+            'params': {
+                'type': 'object',
+                'properties': param_properties,
+                'additionalProperties': False,
+            },
+        },
+        'required': ['scenarioId', 'params'],
+    }
+
+
+def build_intent_tool(patterns: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the OpenAI tool definition for opening a scenario config.
+
+    Args:
+        patterns: Parsed scenario_patterns.json ({theme: {scenario_id: config}})
+
+    Returns:
+        Tool definition suitable for the `tools` argument of chat.completions.create
+    """
+    branches = [
+        scenario_branch(scenario_id, config.get('params', []))
+        for scenarios in patterns.values()
+        for scenario_id, config in scenarios.items()
+    ]
+
+    return {
+        'type': 'function',
+        'function': {
+            'name': INTENT_TOOL_NAME,
+            'description': ('Open the configuration screen for a scenario once all of its required params are known. '
+                            'Params are named as listed in SCENARIO INSTRUCTIONS for that scenario.'),
+            'parameters': {
+                'type': 'object',
+                'oneOf': branches,
+            },
+        },
+    }
+
+
+def parse_intent_tool_call(message: Any) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Extract (scenario_id, params) from an assistant message's tool calls.
+
+    Returns None if the model did not call open_config or sent malformed arguments.
+    """
+    for tool_call in getattr(message, 'tool_calls', None) or []:
+        function = getattr(tool_call, 'function', None)
+        if not function or function.name != INTENT_TOOL_NAME:
+            continue
+        try:
+            arguments = json.loads(function.arguments or '{}')
+        except json.JSONDecodeError:
+            return None
+        scenario_id = arguments.get('scenarioId')
+        params = arguments.get('params') or {}
+        if not scenario_id or not isinstance(params, dict):
+            return None
+        return scenario_id, params
+    return None
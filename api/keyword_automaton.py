@@ -0,0 +1,93 @@
+"""
+Aho-Corasick Keyword Automaton
+
+Finds every occurrence of a fixed set of keywords in one linear pass over
+the text. Used by ScenarioPatternMatcher instead of running one
+r'\\b<keyword>\\b' regex search per keyword per scenario.
+
+Matching is case-insensitive and keeps the regex word-boundary semantics:
+a hit counts only if there is a \\b at both ends, i.e. the characters either
+side of each end differ in "wordness" (alphanumeric or underscore).
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def _is_word(char: str) -> bool:
+    # Same definition as \w for str patterns
+    return char.isalnum() or char == '_'
+
+
+def fold_case(text: str) -> str:
+    """Lowercase without changing the length (so offsets still line up with the original text)."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over a list of keywords."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        index_of: Dict[str, int] = {}
+
+        # Trie: one transition dict per state; outputs are (keyword index, keyword length)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[List[Tuple[int, int]]] = [[]]
+        for keyword in keywords:
+            folded = fold_case(keyword)
+            if not folded or folded in index_of:
+                continue
+            index_of[folded] = len(self.keywords)
+            self.keywords.append(folded)
+
+            state = 0
+            for char in folded:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((index_of[folded], len(folded)))
+
+        # Failure links (breadth-first); outputs of the fallback state are merged in
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[str]:
+        """Keywords (lowercased) that occur in text with a word boundary at both ends."""
+        text = fold_case(text)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        length = len(text)
+        found: Set[int] = set()
+        state = 0
+
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            for keyword_index, keyword_length in outputs[state]:
+                if keyword_index in found:
+                    continue
+                start = end - keyword_length
+                before = start > 0 and _is_word(text[start - 1])
+                after = end < length and _is_word(text[end])
+                if before != _is_word(text[start]) and after != _is_word(text[end - 1]):
+                    found.add(keyword_index)
+
+        return {self.keywords[index] for index in found}
@@ -0,0 +1,176 @@
+"""
+Knowledge Hot Reload
+
+Everything derived from scenario_patterns.json and financial_knowledge.json
+(pattern matcher, KB prompt strings, retrieval index, intent tool, param
+registry) lives in one KnowledgeSnapshot. A reload builds a complete new
+snapshot off the event loop and swaps it in with a single reference
+assignment, so in-flight turns keep the snapshot they started with and never
+see a half-built index.
+
+A snapshot's version is a hash of the file contents it was built from, so the
+same files give the same version in every process and across restarts.
+
+Sessions that already exist keep the system prompt they were created with;
+new sessions pick up the reloaded KB.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .intent_schema import build_intent_tool, split_param_hint
+from .param_registry import ParamRegistry
+from .pattern_matcher import ScenarioPatternMatcher, set_matcher
+from .prompts import RETRIEVED_KB_PLACEHOLDER, RETRIEVED_SCENARIOS_PLACEHOLDER, precompile_system_prompts
+from .retrieval import KnowledgeRetriever, render_financial_fact, render_scenario_line
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_PATTERNS_FILE = Path(__file__).parent / 'scenario_patterns.json'
+FINANCIAL_KB_FILE = Path(__file__).parent / 'financial_knowledge.json'
+
+# Seconds between mtime checks of the KB files (0 disables the watcher)
+WATCH_INTERVAL_SECONDS = float(os.getenv("KNOWLEDGE_WATCH_INTERVAL_SECONDS", "2"))
+# Hex digits of the content hash used as the snapshot version
+VERSION_LENGTH = 12
+
+
+class KnowledgeSnapshot:
+    """All indices and prompt fragments built from one version of the KB files. Treat as read-only."""
+
+    def __init__(self, version: str, patterns: Dict[str, Dict[str, Any]], financial_kb: Dict[str, Dict[str, Any]],
+                 structured_intents: bool = False, prompt_retrieval: bool = False):
+        self.version = version
+        self.patterns = patterns
+        self.financial_kb = financial_kb
+        self.matcher = ScenarioPatternMatcher(patterns)
+
+        kb_lines = []
+        self.scenario_ids: List[str] = []
+        self.scenario_params: Dict[str, List[str]] = {}  # param names with the "(hint)" stripped
+        for theme, scenarios in patterns.items():
+            for sid, sdata in scenarios.items():
+                kb_lines.append(render_scenario_line(sid, sdata))
+                self.scenario_ids.append(sid)
+                self.scenario_params[sid] = [split_param_hint(p)[0] for p in sdata.get('params', [])]
+        self.knowledge_base_prompt = "\\n".join(kb_lines)
+        self.financial_kb_prompt = "\\n".join(render_financial_fact(topic, info) for topic, info in financial_kb.items())
+
+        self.params = ParamRegistry(patterns)
+        self.intent_tool = build_intent_tool(patterns) if structured_intents and patterns else None
+        # Retrieval mode: only the top-k relevant scenarios/facts are sent each turn
+        self.retriever = KnowledgeRetriever(patterns, financial_kb) if prompt_retrieval else None
+
+        # Compile the static system prompt fragments for every mode before the snapshot goes live
+        precompile_system_prompts(*self.system_prompt_kbs(), self.intent_tool is not None)
+
+    def system_prompt_kbs(self) -> Tuple[str, str]:
+        """(financial_kb, scenario_kb) for the system prompt; placeholders in retrieval mode."""
+        if self.retriever:
+            return RETRIEVED_KB_PLACEHOLDER, RETRIEVED_SCENARIOS_PLACEHOLDER
+        return self.financial_kb_prompt, self.knowledge_base_prompt
+
+
+class KnowledgeStore:
+    """Holds the live KnowledgeSnapshot and rebuilds it when the KB files change."""
+
+    def __init__(self, structured_intents: bool = False, prompt_retrieval: bool = False):
+        self.structured_intents = structured_intents
+        self.prompt_retrieval = prompt_retrieval
+        self._reload_lock = threading.Lock()  # serialises reloads; readers never take it
+        self._mtimes = self._file_mtimes()
+
+        # Startup is lenient: a missing or broken file leaves that part of the KB empty
+        digest = hashlib.sha256()
+        patterns = self._load(SCENARIO_PATTERNS_FILE, digest, strict=False)
+        financial_kb = self._load(FINANCIAL_KB_FILE, digest, strict=False)
+        self.current = KnowledgeSnapshot(digest.hexdigest()[:VERSION_LENGTH], patterns, financial_kb,
+                                         structured_intents, prompt_retrieval)
+        set_matcher(self.current.matcher)
+
+    @staticmethod
+    def _file_mtimes() -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for path in (SCENARIO_PATTERNS_FILE, FINANCIAL_KB_FILE):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @staticmethod
+    def _load(path: Path, digest, strict: bool) -> Dict[str, Any]:
+        """Parse one KB file, feeding its raw bytes to digest (nothing is fed for a missing file)."""
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            digest.update(raw)
+            return json.loads(raw.decode('utf-8'))
+        except Exception as e:
+            if strict:
+                raise
+            logger.error("Error loading knowledge base %s: %s", path.name, e)
+            return {}
+
+    def changed(self) -> bool:
+        """True if either KB file was modified since the last (attempted) load."""
+        return self._file_mtimes() != self._mtimes
+
+    def reload(self, trigger: str = "admin") -> KnowledgeSnapshot:
+        """
+        Rebuild every index from the KB files and swap the new snapshot in.
+
+        Blocking (file I/O and index builds); call it from a worker thread.
+        If a file is missing or invalid the current snapshot stays live.
+
+        Raises:
+            OSError, ValueError: a KB file could not be read or parsed
+        """
+        with self._reload_lock:
+            mtimes = self._file_mtimes()
+            try:
+                digest = hashlib.sha256()
+                patterns = self._load(SCENARIO_PATTERNS_FILE, digest, strict=True)
+                financial_kb = self._load(FINANCIAL_KB_FILE, digest, strict=True)
+                snapshot = KnowledgeSnapshot(digest.hexdigest()[:VERSION_LENGTH], patterns, financial_kb,
+                                             self.structured_intents, self.prompt_retrieval)
+            except Exception as e:
+                # Don't retry the same broken edit on every poll; wait for the next change
+                self._mtimes = mtimes
+                metrics.inc('knowledge_reload_errors_total', trigger=trigger)
+                logger.error("Reload failed, keeping version %s: %s", self.current.version, e)
+                raise
+
+            self.current = snapshot
+            self._mtimes = mtimes
+            set_matcher(snapshot.matcher)
+
+        metrics.inc('knowledge_reloads_total', trigger=trigger)
+        logger.info("Reloaded knowledge version %s: %s scenarios, %s KB topics (%s)",
+                    snapshot.version, len(snapshot.scenario_ids), len(snapshot.financial_kb), trigger)
+        return snapshot
+
+
+async def watch(get_store: Callable[[], Optional[KnowledgeStore]], interval: float = WATCH_INTERVAL_SECONDS) -> None:
+    """
+    Poll the KB files and reload the store whenever they change.
+
+    get_store returns the store to watch, or None while the agent has not
+    been created yet. Runs until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        store = get_store()
+        if store is None or not store.changed():
+            continue
+        try:
+            await asyncio.to_thread(store.reload, "watch")
+        except Exception:
+            pass  # already logged and counted; the previous snapshot stays live
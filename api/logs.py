@@ -0,0 +1,140 @@
+"""
+Structured Logging
+
+Records from the api package go through a QueueHandler: the request path
+only appends the record to an in-memory queue and a QueueListener thread
+formats and writes it, so a slow stdout never holds up a chat turn. Every
+record carries the request and session id of the turn that logged it (from
+context variables the chat endpoints bind), and with LOG_FORMAT=json each
+record is one JSON line with any extra fields alongside the message.
+
+Per-turn detail (matching, routing, param renames, ...) is logged at DEBUG
+and is off by default. With LOG_LEVEL=DEBUG it is kept for a
+LOG_DEBUG_SAMPLE_RATE fraction of requests, chosen per request id so a
+sampled turn keeps all of its debug lines.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from . import metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # 'text' or 'json'
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+# Records waiting to be written; when full, new records are dropped rather than blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+session_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "session_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+def bind(request: Optional[str] = None, session: Optional[str] = None) -> None:
+    """Set the ids logged with every record from the current task (and the tasks it starts)."""
+    if request is not None:
+        request_id.set(request)
+    if session is not None:
+        session_id.set(session)
+
+
+def sampled(request: Optional[str], rate: float = DEBUG_SAMPLE_RATE) -> bool:
+    """Whether a request's debug records are kept; the same request id always gets the same answer."""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    if request is None:
+        return random.random() < rate
+    return zlib.crc32(request.encode()) % 10000 < rate * 10000
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the request/session ids on each record and drops debug records of unsampled requests."""
+
+    def __init__(self, debug_sample_rate: float = DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        record.session_id = session_id.get()
+        return record.levelno > logging.DEBUG or sampled(record.request_id, self.debug_sample_rate)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of waiting when the queue is full."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc('log_records_dropped_total')
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(ids)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        ids = [f"{key}={value}" for key, value in (("req", getattr(record, "request_id", None)),
+                                                    ("session", getattr(record, "session_id", None))) if value]
+        record.ids = f" [{' '.join(ids)}]" if ids else ""
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "requestId": getattr(record, "request_id", None),
+            "sessionId": getattr(record, "session_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "ids":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> None:
+    """
+    Send the api package's records through a queue to one writer thread (idempotent).
+
+    Without this call (tests, CLI tools) records fall through to Python's
+    default handling, which only shows warnings and errors.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter())
+    logger = logging.getLogger("api")
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _listener = QueueListener(handler.queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
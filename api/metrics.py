@@ -0,0 +1,167 @@
+"""
+In-Process Metrics
+
+Thread-safe counters and latency histograms for the agent service. Kept in
+memory so no external collector is required; read them as JSON through the
+/api/stats endpoint or in the Prometheus text format through /metrics.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+# (name, 'counter' or 'gauge', labels, value), produced at scrape time
+Sample = Tuple[str, str, Dict[str, str], float]
+
+# Histogram bucket upper bounds, in seconds: 1 ms up to the 60 s chat deadline
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+# (name, labels) -> [count per bucket (last one is +Inf), sum, count]
+_histograms: Dict[Tuple[str, LabelSet], List[float]] = {}
+_buckets: Dict[str, Tuple[float, ...]] = {}
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def _label_set(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    """Increment a counter, e.g. inc('speculation_total', source='local', outcome='agree')."""
+    key = (name, _label_set(labels))
+    with _lock:
+        _counters[key] += value
+
+
+def get(name: str, **labels) -> float:
+    """Current value of a single counter (0.0 if it was never incremented)."""
+    with _lock:
+        return _counters.get((name, _label_set(labels)), 0.0)
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels) -> None:
+    """Record one value in a histogram, e.g. observe('chat_stage_seconds', 0.12, stage='upstream')."""
+    key = (name, _label_set(labels))
+    with _lock:
+        bounds = _buckets.setdefault(name, buckets)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0.0] * (len(bounds) + 3)
+        histogram[bisect.bisect_left(bounds, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+class StageTimer:
+    """
+    Stage durations of one request.
+
+    Time spent in a stage is summed over the request (a stage may run more
+    than once) and observed in the histogram once per stage by observe().
+    """
+
+    def __init__(self, histogram: str, stages: Optional[Dict[str, float]] = None):
+        self.histogram = histogram
+        # Pass a dict to also collect the durations elsewhere (e.g. a request trace)
+        self.stages: Dict[str, float] = {} if stages is None else stages
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def observe(self) -> None:
+        for name, seconds in self.stages.items():
+            observe(self.histogram, seconds, stage=name)
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """Add a function whose samples (e.g. cache sizes, open sessions) are read on every /metrics scrape."""
+    with _lock:
+        _collectors.append(collector)
+
+
+def _key_str(name: str, labels: LabelSet) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f'{key}="{val}"' for key, val in labels)
+    return f"{name}{{{label_str}}}"
+
+
+def snapshot() -> Dict[str, float]:
+    """All counters keyed as 'name{label="value",...}', plus each histogram's _count and _sum."""
+    with _lock:
+        items = list(_counters.items())
+        histograms = [(key, list(values)) for key, values in _histograms.items()]
+    result = {}
+    for (name, labels), value in sorted(items):
+        result[_key_str(name, labels)] = value
+    for (name, labels), values in sorted(histograms):
+        result[_key_str(f"{name}_count", labels)] = values[-1]
+        result[_key_str(f"{name}_sum", labels)] = values[-2]
+    return result
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _line(name: str, labels: LabelSet, value: float) -> str:
+    if labels:
+        name += "{" + ",".join(f'{key}="{_escape(val)}"' for key, val in labels) + "}"
+    return f"{name} {value:.17g}"
+
+
+def render_prometheus() -> str:
+    """Every counter, histogram and collector sample in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(values)) for key, values in _histograms.items())
+        buckets = dict(_buckets)
+        collectors = list(_collectors)
+
+    families: Dict[str, Tuple[str, List[str]]] = {}  # name -> (type, lines)
+
+    def family(name: str, kind: str) -> List[str]:
+        return families.setdefault(name, (kind, []))[1]
+
+    for (name, labels), value in counters:
+        family(name, 'counter').append(_line(name, labels, value))
+    for collector in collectors:
+        for name, kind, labels, value in collector():
+            family(name, kind).append(_line(name, _label_set(labels), value))
+    for (name, labels), values in histograms:
+        lines = family(name, 'histogram')
+        cumulative = 0.0
+        for bound, count in zip(buckets[name] + (float('inf'),), values[:-2]):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:g}"
+            lines.append(_line(f"{name}_bucket", labels + (('le', le),), cumulative))
+        lines.append(_line(f"{name}_sum", labels, values[-2]))
+        lines.append(_line(f"{name}_count", labels, values[-1]))
+
+    out = []
+    for name, (kind, lines) in sorted(families.items()):
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def reset() -> None:
+    """Clear all counters and histograms (used by tests)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _buckets.clear()
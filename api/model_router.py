@@ -0,0 +1,85 @@
+"""
+Model Tiering
+
+Classifies each turn before the completion so short slot-filling replies
+("300k", "2 years") go to a faster, cheaper model while new topics and
+open-ended coaching stay on the full model.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from . import metrics
+
+TURN_SLOT_ANSWER = 'slot_answer'
+TURN_NEW_TOPIC = 'new_topic'
+TURN_ADVICE = 'advice'
+
+TIER_FAST = 'fast'
+TIER_FULL = 'full'
+
+SLOT_ANSWER_MAX_WORDS = 6
+SLOT_ANSWER_WITH_VALUE_MAX_WORDS = 10  # "about 300k in two years I think" is still an answer
+
+VALUE_PATTERN = re.compile(r'\d|£')
+SHORT_REPLIES = {'yes', 'no', 'yeah', 'yep', 'nope', 'sure', 'ok', 'okay', 'monthly', 'yearly',
+                 'annually', 'weekly', 'once', 'lump sum', 'one off', 'one-off', 'save', 'spend'}
+
+
+def last_assistant_message(messages: List[Dict]) -> Optional[str]:
+    """Content of the most recent assistant message, if any."""
+    for message in reversed(messages):
+        if message.get("role") == "assistant":
+            return message.get("content") or ""
+    return None
+
+
+def classify_turn(user_input: str, previous_reply: Optional[str], new_scenario: Optional[str], has_amount: bool) -> str:
+    """
+    Classify a turn as a slot answer, a new topic or an advice request.
+
+    Args:
+        user_input: The user's message
+        previous_reply: The assistant's previous message (None on the first turn)
+        new_scenario: Scenario matched on this message alone, if any
+        has_amount: True if an amount was extracted from this message
+
+    Returns:
+        TURN_SLOT_ANSWER, TURN_NEW_TOPIC or TURN_ADVICE
+    """
+    text = user_input.strip().lower()
+
+    if new_scenario:
+        return TURN_NEW_TOPIC
+
+    if previous_reply and '?' in previous_reply and '?' not in text:
+        word_count = len(text.split())
+        has_value = has_amount or bool(VALUE_PATTERN.search(text))
+        if word_count <= SLOT_ANSWER_MAX_WORDS and (has_value or text.strip('.! ') in SHORT_REPLIES):
+            return TURN_SLOT_ANSWER
+        if has_value and word_count <= SLOT_ANSWER_WITH_VALUE_MAX_WORDS:
+            return TURN_SLOT_ANSWER
+
+    return TURN_ADVICE
+
+
+def tier_for_turn(turn_type: str, fast_model_configured: bool) -> str:
+    """Slot answers go to the fast tier when one is configured; everything else to the full model."""
+    if fast_model_configured and turn_type == TURN_SLOT_ANSWER:
+        return TIER_FAST
+    return TIER_FULL
+
+
+def record_tier_outcome(tier: str, turn_type: str, latency: float, outcome: str,
+                        action_scenario: Optional[str] = None, matched_scenario: Optional[str] = None) -> None:
+    """
+    Record per-tier latency and accuracy counters.
+
+    outcome is 'action' (config opened), 'question' (asked for more) or 'reply'.
+    A scenario mismatch means the tier opened a different scenario than the
+    pattern matcher detected for the conversation.
+    """
+    metrics.inc('model_tier_turns_total', tier=tier, turn=turn_type, outcome=outcome)
+    metrics.inc('model_tier_latency_seconds_total', latency, tier=tier)
+    if action_scenario and matched_scenario and action_scenario != matched_scenario:
+        metrics.inc('model_tier_scenario_mismatch_total', tier=tier)
@@ -0,0 +1,367 @@
+"""
+Intent Parameter Registry
+
+Compiled once per knowledge snapshot from scenario_patterns.json plus the
+frontend key overrides below. For every scenario it holds one alias table
+(AI/pattern param name -> the key the frontend config screen expects) and
+the type of each key, so intent params from the [INTENT:...] tag, the
+open_config tool and the regex fallback are renamed and coerced in a single
+pass over the params.
+
+Types come from the param names (see slots.slot_kind): money in GBP
+("150k", "£1,200" -> 150000, 1200), rates in percent ("4.5%" -> 4.5),
+durations in the param's unit ("2 years" -> 24 for a *_months param) and
+dates as YYYY-MM-DD (resolved with date_normalizer).
+
+The registry also knows which field of the scenario's config screen each
+pattern param is asked for on (the field keys in scenario_labels.json), so
+missingFields only ever names fields the screen shows.
+
+Each scenario also gets a Pydantic model, generated from the same types the
+first time the scenario is used and cached with the registry, so params are
+validated (non-negative money, real dates, ...) before an OPEN_CONFIG action
+goes out.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from datetime import date
+from typing import Annotated, Any, Dict, List, NamedTuple, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError, create_model
+
+from . import metrics
+from .date_normalizer import STRICT_ISO_PATTERN, allows_bare_year, to_iso
+from .extraction import MULTIPLIERS, extract
+from .intent_schema import split_param_hint
+from .slots import slot_kind
+
+logger = logging.getLogger(__name__)
+
+# Frontend keys per scenario. A string maps the scenario's single amount
+# (targetAmount) onto that key; a dict maps individual AI param names.
+FRONTEND_PARAM_OVERRIDES: Dict[str, Any] = {
+    'childbirth': 'oneOffCosts',
+    'buy_vehicle': 'totalCost',
+    'custom_goal': {'name': 'scenarioName', 'target_amount': 'targetAmount', 'monthly_amount': 'monthlyAmount', 'type': 'direction', 'frequency': 'frequency', 'date': 'targetDate'},
+    'buy_home': {
+        'property_price': 'propertyPrice',
+        'deposit_amount': 'depositAmount',
+        'purchase_date': 'purchaseDate',
+        'targetAmount': 'propertyPrice',
+        'amount': 'propertyPrice',
+        'price': 'propertyPrice',
+        'cost': 'propertyPrice',
+        'date': 'purchaseDate'
+    },
+    'marriage': {
+        'totalBudget': 'totalBudget',
+        'targetAmount': 'totalBudget',
+        'amount': 'totalBudget',
+        'cost': 'totalBudget',
+        'budget': 'totalBudget',
+        'value': 'totalBudget',
+        'date': 'weddingDate',
+        'weddingDate': 'weddingDate'
+    },
+    'medical_emergency': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost', 'cost': 'totalCost'},
+    'tax_bill': {'billAmount': 'billAmount', 'targetAmount': 'billAmount', 'amount': 'billAmount'},
+    'home_improvement': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost', 'cost': 'totalCost'},
+    'ivf_treatment': {'totalCost': 'totalCost', 'targetAmount': 'totalCost', 'amount': 'totalCost'},
+    'help_family': 'monthlyAmount',
+    'elder_care': 'monthlyAmount',
+    'divorce': 'settlementCost',
+    'death_partner': 'monthlyIncomeLost',
+    'work_equipment': 'totalCost',
+    'debt_consolidation': 'lumpSumPayment',
+    'sell_asset': 'saleProceeds',
+    'windfall': 'lumpSumAmount',
+    'start_business': 'investmentAmount',
+    'property_repair': 'repairCost'
+}
+
+# Config screen fields per scenario: {scenario_id: {"displayName", "fields": {key: label}}},
+# mirrored from sim-core's scenario registry and app-ui's simplifiedTemplates.ts
+SCENARIO_LABELS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenario_labels.json')
+
+# Pattern params whose screen field isn't found by name or kind (see _screen_field).
+# None: the screen has no field for it, so it is never reported in missingFields.
+SCREEN_FIELD_OVERRIDES: Dict[str, Dict[str, Optional[str]]] = {
+    'emergency_fund': {'target_months': 'targetAmount', 'monthly_expenses': 'targetAmount'},
+    'accelerate_debt': {'target_debt': 'linkedAccountName', 'extra_payment': 'extraMonthlyPayment'},
+    'student_loan': {'loan_amount': 'targetAmount', 'repayment_plan': 'studentLoanPlan'},
+    'pension_contribution': {'contribution_amount': 'allocationPercentage'},
+    'start_investing_isa': {'monthly_contribution': 'allocationPercentage'},
+    'transfer_balance': {'from_account': 'fromAccountType', 'to_account': 'toAccountType'},
+    'education_fund': {'target_date': 'universityAge'},
+    'reduce_expenses': {'target_reduction': 'monthlyReduction'},
+    'training': {'course_cost': 'oneOffCosts'},
+    'family_illness': {'care_costs': 'monthlyCareCosts'},
+    'market_crash': {'crash_severity': 'portfolioDeclinePercent'},
+    'market_boom': {'growth_rate': 'portfolioGainPercent'},
+    'interest_rate_increase': {'new_rate': 'percentageIncrease'},
+    'interest_rate_decrease': {'new_rate': 'percentageDecrease'},
+    'large_windfall': {'windfall_amount': 'amount'},
+}
+
+# Generic names the model uses for "the amount", in order of preference
+GENERIC_AMOUNT_KEYS = ['amount', 'cost', 'value', 'price', 'total', 'settlement_amount', 'total_settlement_cost', 'monthly_income_lost', 'lost_income']
+
+# Alias ranks: when several params land on the same key, the lowest rank wins
+# and the others keep their own names. Among override entries the later one
+# wins; among generic names the earlier one.
+RANK_EXACT, RANK_OVERRIDE, RANK_PATTERN, RANK_GENERIC = 0, 1, 2, 3
+
+_SUFFIXES = sorted(MULTIPLIERS, key=len, reverse=True)
+
+Number = Union[int, float]  # ints stay ints (150000, not 150000.0)
+
+def _number_as_text(value: Any) -> Any:
+    # A number is fine as text ("scenarioName": 2028). Done here rather than with
+    # ConfigDict(coerce_numbers_to_str), which the early pydantic 2.x releases we allow lack
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+# Pydantic field per slot kind: (type, default/constraints)
+FIELD_TYPES: Dict[str, Tuple[Any, Any]] = {
+    'money': (Optional[Number], Field(None, ge=0)),
+    'monthly': (Optional[Number], Field(None, ge=0)),
+    'count': (Optional[Number], Field(None, ge=0)),
+    'rate': (Optional[Number], Field(None, ge=-100, le=100)),
+    'date': (Optional[date], None),
+    'text': (Annotated[Optional[str], BeforeValidator(_number_as_text)], None),
+}
+
+
+class ScenarioParams(NamedTuple):
+    aliases: Dict[str, Tuple[str, Tuple[int, int]]]  # param name -> (frontend key, rank)
+    kinds: Dict[str, str]  # frontend key -> slot kind
+    # param name or screen key -> screen field (None: not on the screen); None if the screen is unknown
+    screen: Optional[Dict[str, Optional[str]]] = None
+
+
+def load_scenario_labels(path: str = SCENARIO_LABELS_FILE) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load scenario labels from %s (%s); screen fields unknown", path, e)
+        return {}
+
+
+SCENARIO_LABELS = load_scenario_labels()
+
+
+def _camel(name: str) -> str:
+    return re.sub(r'_([a-z])', lambda m: m.group(1).upper(), name)
+
+
+def _screen_field(name: str, alias: Optional[str], fields: List[str]) -> Optional[str]:
+    """The screen field for a pattern param: its alias, its camelCase name or the screen's only field of its kind."""
+    for key in (alias, _camel(name)):
+        if key in fields:
+            return key
+    same_kind = [key for key in fields if slot_kind(key) == slot_kind(name)]
+    return same_kind[0] if len(same_kind) == 1 else None
+
+
+def _number(value: str) -> Optional[float]:
+    text = value.strip().lower().replace('£', '').replace(',', '').replace(' ', '')
+    multiplier = 1
+    for suffix in _SUFFIXES:
+        if text.endswith(suffix) and text[:-len(suffix)]:
+            text, multiplier = text[:-len(suffix)], MULTIPLIERS[suffix]
+            break
+    try:
+        return float(text) * multiplier
+    except ValueError:
+        return None
+
+
+def _int_if_whole(value: float):
+    return int(value) if value.is_integer() else value
+
+
+def parse_scalar(value: Any) -> Any:
+    """Best-effort typing of an untyped tag value: '150k' -> 150000, '4.5' -> 4.5, '2027-06-01' stays a string."""
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if STRICT_ISO_PATTERN.fullmatch(text):
+        return text
+    number = _number(text)
+    return text if number is None else _int_if_whole(number)
+
+
+def coerce(key: str, value: Any, kind: str) -> Any:
+    """Coerce one value to its key's kind; values that don't parse are returned unchanged."""
+    if kind == 'date':
+        if isinstance(value, str) and STRICT_ISO_PATTERN.fullmatch(value):
+            return value
+        resolved = to_iso(value, allow_year=allows_bare_year(key))
+        if resolved and resolved != value:
+            logger.debug("Resolved date %s: %r -> %s", key, value, resolved)
+        return resolved or value
+    if not isinstance(value, str) or kind == 'text':
+        return value
+    if kind == 'count':
+        durations = extract(value).durations
+        if durations:
+            months = durations[0].months
+            return _int_if_whole(round(months / 12 if 'year' in key.lower() else months, 2))
+    if kind == 'rate':
+        value = value.strip().rstrip('%')
+    return parse_scalar(value)
+
+
+class ParamRegistry:
+    """Per-scenario param aliases and types, compiled from scenario_patterns.json. Treat as read-only."""
+
+    def __init__(self, patterns: Dict[str, Dict[str, Any]], overrides: Optional[Dict[str, Any]] = None,
+                 screen_fields: Optional[Dict[str, List[str]]] = None):
+        self.overrides = FRONTEND_PARAM_OVERRIDES if overrides is None else overrides
+        if screen_fields is None:
+            screen_fields = {sid: list(labels.get('fields', {})) for sid, labels in SCENARIO_LABELS.items()}
+        self.screen_fields = screen_fields
+        self._default = self._compile(None, [])
+        self._scenarios: Dict[str, ScenarioParams] = {}
+        self._models: Dict[str, Type[BaseModel]] = {}
+        for theme, scenarios in patterns.items():
+            for scenario_id, config in scenarios.items():
+                params = [split_param_hint(p)[0] for p in config.get('params', [])]
+                self._scenarios[scenario_id] = self._compile(scenario_id, params)
+        # Scenarios that only exist as overrides (older frontend ids)
+        for scenario_id in self.overrides:
+            self._scenarios.setdefault(scenario_id, self._compile(scenario_id, []))
+
+    def _compile(self, scenario_id: Optional[str], params: List[str]) -> ScenarioParams:
+        override = self.overrides.get(scenario_id)
+        aliases: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+
+        def add(name: str, key: str, rank: Tuple[int, int]):
+            if name not in aliases or rank < aliases[name][1]:
+                aliases[name] = (key, rank)
+
+        if isinstance(override, dict):
+            direct = override
+            amount_key = override.get('targetAmount', 'targetAmount')
+            date_key = override.get('date')
+        else:
+            direct = {'targetAmount': override} if override else {}
+            amount_key = override or 'targetAmount'
+            date_key = None
+
+        for position, (name, key) in enumerate(direct.items()):
+            add(name, key, (RANK_OVERRIDE, -position))
+        for key in set(direct.values()) - set(direct):
+            add(key, key, (RANK_EXACT, 0))
+
+        # The pattern file's own names for the amount and date land on the same keys
+        if override:
+            first_money = next((p for p in params if slot_kind(p) == 'money'), None)
+            first_date = next((p for p in params if slot_kind(p) == 'date'), None)
+            if first_money:
+                add(first_money, amount_key, (RANK_PATTERN, 0))
+            if first_date and date_key:
+                add(first_date, date_key, (RANK_PATTERN, 0))
+        for position, name in enumerate(GENERIC_AMOUNT_KEYS):
+            add(name, amount_key, (RANK_GENERIC, position))
+
+        keys = {key for key, _ in aliases.values()} | set(params)
+
+        screen = None
+        fields = self.screen_fields.get(scenario_id)
+        if fields is not None:
+            explicit = SCREEN_FIELD_OVERRIDES.get(scenario_id, {})
+            screen = {key: key for key in fields}
+            for name in params:
+                if name not in screen:
+                    alias = aliases.get(name, (None,))[0]
+                    screen[name] = explicit[name] if name in explicit else _screen_field(name, alias, fields)
+        return ScenarioParams(aliases, {key: slot_kind(key) for key in keys}, screen)
+
+    def scenario(self, scenario_id: str) -> ScenarioParams:
+        return self._scenarios.get(scenario_id, self._default)
+
+    def frontend_key(self, scenario_id: str, name: str) -> Optional[str]:
+        """
+        The config screen field a param is asked for on.
+
+        Returns None if the scenario's screen has no field for it. For scenarios
+        without known screen fields, the key the param is renamed to.
+        """
+        compiled = self.scenario(scenario_id)
+        if compiled.screen is None:
+            return compiled.aliases.get(name, (name,))[0]
+        return compiled.screen.get(name)
+
+    def normalize(self, scenario_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rename params to the frontend's keys and coerce their values (returns a new dict).
+
+        Args:
+            scenario_id: Scenario the params belong to
+            params: Params as parsed from a tag, tool call or the fallback rule
+
+        Returns:
+            Params keyed by frontend name, in input order
+        """
+        compiled = self.scenario(scenario_id)
+        winners: Dict[str, Tuple[Tuple[int, int], str]] = {}  # frontend key -> (rank, input name)
+        for name in params:
+            key, rank = compiled.aliases.get(name, (name, (RANK_EXACT, 0)))
+            if key not in winners or rank < winners[key][0]:
+                winners[key] = (rank, name)
+        renamed = {name: key for key, (_, name) in winners.items()}
+
+        normalized: Dict[str, Any] = {}
+        for name, value in params.items():
+            key = renamed.get(name, name)
+            if key != name:
+                logger.debug("Param %s: %s -> %s", scenario_id, name, key)
+            kind = compiled.kinds.get(key) or slot_kind(key)
+            normalized[key] = coerce(key, value, kind)
+        return normalized
+
+    def model(self, scenario_id: str) -> Type[BaseModel]:
+        """The scenario's params model (built on first use, then cached)."""
+        model = self._models.get(scenario_id)
+        if model is None:
+            fields = {key: FIELD_TYPES[kind] for key, kind in self.scenario(scenario_id).kinds.items()}
+            model = create_model(
+                f"{''.join(part.title() for part in scenario_id.split('_'))}Params",
+                __config__=ConfigDict(extra='allow'),
+                **fields,
+            )
+            self._models[scenario_id] = model
+        return model
+
+    def validate(self, scenario_id: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Validate normalized params against the scenario's model.
+
+        Returns:
+            Tuple of (valid params as JSON-ready values, keys whose values were
+            invalid and have been dropped)
+        """
+        started = time.perf_counter()
+        model = self.model(scenario_id)
+        invalid: List[str] = []
+        try:
+            validated = model.model_validate(params)
+        except ValidationError as e:
+            errors = {str(error['loc'][0]): error['msg'] for error in e.errors()}
+            invalid = [key for key in params if key in errors]
+            for key in invalid:
+                logger.info("Invalid param %s.%s=%r: %s", scenario_id, key, params[key], errors[key])
+            validated = model.model_validate({k: v for k, v in params.items() if k not in invalid})
+
+        metrics.inc('param_validation_seconds_total', time.perf_counter() - started)
+        metrics.inc('param_validations_total', outcome='invalid' if invalid else 'valid')
+        dumped = validated.model_dump(mode='json', exclude_unset=True)
+        return {key: dumped[key] for key in params if key in dumped}, invalid
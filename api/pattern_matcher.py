@@ -3,20 +3,49 @@ Pattern Matching Engine for Scenario Detection
 
 Provides deterministic, maintainable keyword-based matching for all 55 scenarios.
 Uses scenario_patterns.json as source of truth for keywords.
+
+Offline batch classification (e.g. to tune keywords against stored transcripts):
+    python -m api.pattern_matcher messages.txt --workers 4 > results.ndjson
+    python -m api.pattern_matcher --from-sessions sessions.json
 """
 
+import hashlib
 import json
-import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .keyword_automaton import KeywordAutomaton, fold_case
 
 # Load pattern library
 PATTERNS_FILE = Path(__file__).parent / 'scenario_patterns.json'
 
+# Normalized messages whose hits and ranking are kept per matcher
+RANK_CACHE_SIZE = 4096
+
+
+class ScenarioCandidate(NamedTuple):
+    scenario_id: str
+    score: float
+    keywords: Tuple[str, ...]  # the scenario's keywords found in the text (evidence)
+
+
+class BatchMatch(NamedTuple):
+    scenario_id: Optional[str]
+    confidence: float
+    keywords: List[str]  # every keyword hit in the message, matched scenario or not
+
+
 class ScenarioPatternMatcher:
-    def __init__(self):
-        with open(PATTERNS_FILE, 'r', encoding='utf-8') as f:
-            self.patterns = json.load(f)
+    def __init__(self, patterns: Optional[Dict[str, Dict[str, Any]]] = None):
+        if patterns is None:
+            with open(PATTERNS_FILE, 'r', encoding='utf-8') as f:
+                patterns = json.load(f)
+        self.patterns = patterns
         
         # Flatten for quick lookup
         self.scenario_map = {}
@@ -27,6 +56,28 @@ class ScenarioPatternMatcher:
                     'keywords': config['keywords'],
                     'params': config.get('params', [])
                 }
+        
+        # One automaton over every scenario's keywords; scores are derived from its hits
+        self._scenario_order = list(self.scenario_map)
+        self._scenario_keywords = {
+            scenario_id: [fold_case(keyword) for keyword in config['keywords']]
+            for scenario_id, config in self.scenario_map.items()
+        }
+        self._keyword_scenarios: Dict[str, List[int]] = {}
+        for position, scenario_id in enumerate(self._scenario_order):
+            for keyword in self._scenario_keywords[scenario_id]:
+                positions = self._keyword_scenarios.setdefault(keyword, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        self.automaton = KeywordAutomaton(self._keyword_scenarios)
+        # Identifies the keyword set across processes, for hits cached outside the matcher (session state)
+        self.fingerprint = hashlib.sha256(
+            json.dumps([[scenario_id, self._scenario_keywords[scenario_id]] for scenario_id in self._scenario_order],
+                       ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        
+        # Per-instance so a reloaded matcher starts with an empty cache
+        self._analyse = lru_cache(maxsize=RANK_CACHE_SIZE)(self._analyse_normalized)
     
     def match_scenario(self, text: str, conversation_history: List[str] = None) -> Optional[Tuple[str, float]]:
         """
@@ -41,44 +92,123 @@ class ScenarioPatternMatcher:
         """
         text_lower = text.lower()
         
+        if not conversation_history:
+            return self.match_hits([self.message_hits(text_lower)])
+        
         # Combine current text with recent history for context
-        search_text = text_lower
-        if conversation_history:
-            search_text = ' '.join(conversation_history[-3:] + [text_lower])
+        search_text = ' '.join(conversation_history[-3:] + [text_lower])
+        return self.match_hits([self.automaton.find(search_text)])
+    
+    def rank_scenarios(self, text: str, k: int = 3, conversation_history: List[str] = None) -> List[ScenarioCandidate]:
+        """
+        Top-k scenarios for a message, best first, with the keywords that matched.
         
-        best_match = None
-        best_score = 0.0
+        Unlike match_scenario there is no confidence threshold. Ties keep the
+        scenario_patterns.json order, so the first candidate is the scenario
+        match_scenario would pick.
         
-        for scenario_id, config in self.scenario_map.items():
-            score = self._calculate_match_score(search_text, config['keywords'])
-            
-            if score > best_score:
-                best_score = score
-                best_match = scenario_id
+        Args:
+            text: User input or current message
+            k: Maximum number of candidates
+            conversation_history: Previous user messages; the last 3 are matched with the text
+        """
+        if not conversation_history:
+            return list(self._analyse(self._normalize(text))[1][:k])
+        hit_sets = [self.message_hits(message) for message in conversation_history[-3:] + [text]]
+        return self._rank_hits(set().union(*hit_sets))[:k]
+    
+    def message_hits(self, text: str) -> FrozenSet[str]:
+        """Keywords found in one message; cache these to avoid rescanning old messages."""
+        return self._analyse(self._normalize(text))[0]
+    
+    def match_hits(self, hit_sets: Iterable[Iterable[str]]) -> Optional[Tuple[str, float]]:
+        """
+        Match a window of messages from their keyword hits (see message_hits).
+        
+        Returns:
+            Tuple of (scenario_id, confidence_score) or None if no match
+        """
+        ranked = self._rank_hits(set().union(*hit_sets))
         
         # Require minimum confidence threshold (adjusted for weighted scoring)
-        if best_score >= 0.45:  # Minimum 0.5 base score - small margin
-            return (best_match, best_score)
+        if ranked and ranked[0].score >= 0.45:  # Minimum 0.5 base score - small margin
+            return (ranked[0].scenario_id, ranked[0].score)
         
         return None
     
-    def _calculate_match_score(self, text: str, keywords: List[str]) -> float:
+    def cache_info(self):
+        """Hit/miss statistics of the normalized-text cache."""
+        return self._analyse.cache_info()
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        # Case and surrounding whitespace never change which keywords match
+        return fold_case(text.strip())
+    
+    def _analyse_normalized(self, text: str) -> Tuple[FrozenSet[str], Tuple[ScenarioCandidate, ...]]:
+        hits = frozenset(self.automaton.find(text))
+        return hits, tuple(self._rank_hits(hits))
+    
+    def _rank_hits(self, hits: set) -> List[ScenarioCandidate]:
+        """Every scenario with at least one hit, by score (ties in scenario order)."""
+        ranked = []
+        # Only scenarios with at least one hit can score; hits cached before a keyword was removed score nothing
+        for position in sorted({position for keyword in hits for position in self._keyword_scenarios.get(keyword, ())}):
+            scenario_id = self._scenario_order[position]
+            keywords = self._scenario_keywords[scenario_id]
+            score = self._calculate_match_score(hits, keywords)
+            if score > 0:
+                evidence = tuple(dict.fromkeys(keyword for keyword in keywords if keyword in hits))
+                ranked.append(ScenarioCandidate(scenario_id, score, evidence))
+        ranked.sort(key=lambda candidate: -candidate.score)  # stable: ties stay in scenario order
+        return ranked
+    
+    def match_many(self, texts: Iterable[str], workers: int = 1, chunk_size: int = 1000) -> Iterator[BatchMatch]:
+        """
+        Classify many independent messages (no conversation history), in input order.
+        
+        Texts are consumed lazily in chunks, so arbitrarily large inputs can be
+        streamed. With workers > 1 the chunks are spread across a process pool;
+        at most 2 chunks per worker are in flight at once.
+        """
+        chunks = _chunked(texts, chunk_size)
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self._match_chunk(chunk)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.patterns,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_match_chunk_in_worker, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
+    def _match_chunk(self, texts: List[str]) -> List[BatchMatch]:
+        results = []
+        for text in texts:
+            hits = self.message_hits(text.lower())
+            match = self.match_hits([hits])
+            results.append(BatchMatch(match[0], match[1], sorted(hits)) if match else BatchMatch(None, 0.0, sorted(hits)))
+        return results
+    
+    def _calculate_match_score(self, hits: set, keywords: List[str]) -> float:
         """
         Calculate match score using weighted approach (industry best practice).
         
+        Args:
+            hits: Keywords found in the text (word-bounded, case-insensitive)
+            keywords: The scenario's keywords
+        
         Returns:
             Float between 0.0 and 1.0 representing match confidence
         """
         if not keywords:
             return 0.0
         
-        matched_keywords = []
-        
-        for keyword in keywords:
-            # Use word boundaries for better matching
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, text, re.IGNORECASE):
-                matched_keywords.append(keyword)
+        matched_keywords = [keyword for keyword in keywords if keyword in hits]
         
         if not matched_keywords:
             return 0.0
@@ -115,21 +245,27 @@ class ScenarioPatternMatcher:
             if config['theme'] == theme
         ]
     
-    def suggest_related_scenarios(self, scenario_id: str, limit: int = 3) -> List[str]:
+    def suggest_related_scenarios(self, scenario_id: str, limit: int = 3, text: Optional[str] = None) -> List[str]:
         """
         Suggest related scenarios from the same theme.
         
         Useful for multi-scenario recommendations (e.g., "having a baby" 
         might suggest both childbirth and education_fund).
+        
+        If the user's text is given, same-theme scenarios it also matches come first.
         """
         theme = self.get_scenario_theme(scenario_id)
         if not theme:
             return []
         
-        related = self.get_all_scenarios_by_theme(theme)
+        related = [s for s in self.get_all_scenarios_by_theme(theme) if s != scenario_id]
+        
+        if text:
+            ranked = [c.scenario_id for c in self.rank_scenarios(text, k=len(self.scenario_map)) if c.scenario_id in related]
+            related = ranked + [s for s in related if s not in ranked]
         
         # Return other scenarios from same theme
-        return [s for s in related if s != scenario_id][:limit]
+        return related[:limit]
 
 
 # Singleton instance
@@ -141,3 +277,112 @@ def get_matcher() -> ScenarioPatternMatcher:
     if _matcher is None:
         _matcher = ScenarioPatternMatcher()
     return _matcher
+
+def set_matcher(matcher: ScenarioPatternMatcher) -> None:
+    """Swap in a rebuilt matcher (used by knowledge hot reload)."""
+    global _matcher
+    _matcher = matcher
+
+
+#############################################
+# Batch classification (process pool + CLI)
+#############################################
+
+_worker_matcher: Optional[ScenarioPatternMatcher] = None
+
+def _init_worker(patterns: Dict[str, Dict[str, Any]]) -> None:
+    global _worker_matcher
+    _worker_matcher = ScenarioPatternMatcher(patterns)
+
+def _match_chunk_in_worker(texts: List[str]) -> List[BatchMatch]:
+    return _worker_matcher._match_chunk(texts)
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _read_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """One message per line: plain text, or a JSON object with a "text" (or "content") field."""
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        if line.lstrip().startswith('{'):
+            try:
+                record = json.loads(line)
+                record['text'] = record.pop('text', None) or record.pop('content', '') or ''
+                yield record
+                continue
+            except ValueError:
+                pass
+        yield {'text': line}
+
+def _session_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Every user message stored in a sessions.json file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        sessions = json.load(f)
+    for session_id, messages in sessions.items():
+        for index, message in enumerate(messages):
+            if message.get('role') == 'user':
+                yield {'sessionId': session_id, 'index': index, 'text': message.get('content') or ''}
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Classify messages against scenario_patterns.json and write NDJSON results.")
+    parser.add_argument('input', nargs='?', default='-', help="Text or JSONL file, one message per line ('-' for stdin)")
+    parser.add_argument('--from-sessions', metavar='SESSIONS_JSON', help="Classify every user message in a sessions.json file instead")
+    parser.add_argument('--patterns', default=str(PATTERNS_FILE), help="Pattern library to test (default: api/scenario_patterns.json)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (default: 1, in-process)")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Messages per chunk sent to a worker")
+    parser.add_argument('--output', default='-', help="NDJSON output file ('-' for stdout)")
+    args = parser.parse_args(argv)
+    
+    with open(args.patterns, 'r', encoding='utf-8') as f:
+        matcher = ScenarioPatternMatcher(json.load(f))
+    
+    if args.from_sessions:
+        source = None
+        records = _session_records(args.from_sessions)
+    else:
+        source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+        records = _read_records(source)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    
+    # Records wait here only while their chunk is in flight; results come back in input order
+    in_flight = deque()
+    
+    def texts() -> Iterator[str]:
+        for record in records:
+            in_flight.append(record)
+            yield record['text']
+    
+    started = time.perf_counter()
+    count = matched = 0
+    try:
+        for result in matcher.match_many(texts(), workers=args.workers, chunk_size=args.chunk_size):
+            record = in_flight.popleft()
+            record.update(scenarioId=result.scenario_id, confidence=result.confidence, keywords=result.keywords)
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+            matched += result.scenario_id is not None
+    finally:
+        if source not in (None, sys.stdin):
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"[BATCH] {count} messages ({matched} matched) in {elapsed:.2f}s: {rate:,.0f} msgs/sec with {args.workers} worker(s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
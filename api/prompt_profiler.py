@@ -0,0 +1,138 @@
+"""
+Prompt Size Profiler
+
+Breaks a message list down into sections (base instructions, persona, KB,
+scenario list, context blocks, retrieved context, history turns) with token
+and byte counts, and aggregates those numbers across all stored sessions.
+
+The per-session admin profile is taken of the next upstream request as
+AIAgent.build_turn_messages assembles it (stored history plus the turn's
+context block, retrieved block and user message), not of the stored history
+alone.
+"""
+
+import statistics
+from typing import Any, Dict, List, Tuple
+
+from .prompts import estimate_tokens
+from .retrieval import RETRIEVED_BLOCK_HEADER
+
+# Markers that start each section of the system prompt, in assembly order (see get_system_prompt).
+# Sections missing from older stored prompts are simply folded into the previous one.
+SYSTEM_PROMPT_MARKERS = [
+    ('action_instructions', 'ACTION TRIGGERS:'),
+    ('date', 'CURRENT DATE:'),
+    ('coaching_tips', 'PERSONALIZED COACHING TIPS'),
+    ('persona', 'PERSONA:'),
+    ('financial_kb', 'FINANCIAL KNOWLEDGE BASE:'),
+    ('scenario_list', 'SCENARIO INSTRUCTIONS'),
+]
+
+SECTION_ORDER = (['base_instructions'] + [name for name, _ in SYSTEM_PROMPT_MARKERS]
+                 + ['context_blocks', 'retrieved_context', 'history'])
+
+
+def measure(text: str) -> Dict[str, int]:
+    return {'tokens': estimate_tokens(text), 'bytes': len(text.encode('utf-8'))}
+
+
+def split_system_prompt(prompt: str) -> List[Tuple[str, str]]:
+    """Split a system prompt into (section name, text) pairs using the known section markers."""
+    boundaries = [(0, 'base_instructions')]
+    position = 0
+    for name, marker in SYSTEM_PROMPT_MARKERS:
+        found = prompt.find(marker, position)
+        if found == -1:
+            continue
+        line_start = prompt.rfind('\n', 0, found) + 1  # include prefixes like "46: "
+        boundaries.append((line_start, name))
+        position = found + len(marker)
+
+    sections = []
+    for index, (start, name) in enumerate(boundaries):
+        end = boundaries[index + 1][0] if index + 1 < len(boundaries) else len(prompt)
+        sections.append((name, prompt[start:end]))
+    return sections
+
+
+def profile_session(messages: List[Dict[str, Any]], include_messages: bool = False) -> Dict[str, Any]:
+    """
+    Per-section and per-turn size breakdown of a session's message list.
+
+    The first system message is split into prompt sections; later system
+    messages count as retrieved context (retrieval mode) or context blocks;
+    user/assistant messages as history.
+    """
+    sections: Dict[str, Dict[str, int]] = {name: {'tokens': 0, 'bytes': 0} for name in SECTION_ORDER}
+    turns = []
+
+    for index, message in enumerate(messages):
+        content = message.get('content') or ''
+        if index == 0 and message.get('role') == 'system':
+            parts = split_system_prompt(content)
+        elif message.get('role') == 'system' and content.startswith(RETRIEVED_BLOCK_HEADER):
+            parts = [('retrieved_context', content)]
+        elif message.get('role') == 'system':
+            parts = [('context_blocks', content)]
+        else:
+            parts = [('history', content)]
+            turns.append({'index': index, 'role': message.get('role'), **measure(content)})
+
+        for name, text in parts:
+            size = measure(text)
+            sections[name]['tokens'] += size['tokens']
+            sections[name]['bytes'] += size['bytes']
+
+    report = {
+        'messageCount': len(messages),
+        'totalTokens': sum(section['tokens'] for section in sections.values()),
+        'totalBytes': sum(section['bytes'] for section in sections.values()),
+        'sections': [{'name': name, **size} for name, size in sections.items()],
+        'turns': turns,
+    }
+    if include_messages:
+        report['messages'] = messages
+    return report
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """count/mean/p50/p90/p99/max summary of a list of numbers."""
+    if not values:
+        return {'count': 0, 'mean': 0, 'p50': 0, 'p90': 0, 'p99': 0, 'max': 0}
+    ordered = sorted(values)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.mean(ordered), 1),
+        'p50': percentile(0.50),
+        'p90': percentile(0.90),
+        'p99': percentile(0.99),
+        'max': ordered[-1],
+    }
+
+
+def profile_store(sessions: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Aggregate size distributions across every session in the store."""
+    totals: List[float] = []
+    message_counts: List[float] = []
+    per_section: Dict[str, List[float]] = {name: [] for name in SECTION_ORDER}
+    largest = []
+
+    for session_id, messages in sessions.items():
+        report = profile_session(messages)
+        totals.append(report['totalTokens'])
+        message_counts.append(report['messageCount'])
+        for section in report['sections']:
+            per_section[section['name']].append(section['tokens'])
+        largest.append((report['totalTokens'], session_id))
+
+    return {
+        'sessions': len(sessions),
+        'totalTokens': distribution(totals),
+        'messageCount': distribution(message_counts),
+        'sectionTokens': {name: distribution(values) for name, values in per_section.items()},
+        'largestSessions': [{'sessionId': sid, 'totalTokens': tokens} for tokens, sid in sorted(largest, reverse=True)[:10]],
+    }
@@ -3,7 +3,10 @@ System Prompts for Financial AI Agent
 Separated by Persona Mode
 """
 
-BASE_INSTRUCTIONS = """You are a friendly, conversational UK financial planning assistant.
+from functools import lru_cache
+from typing import Tuple
+
+CORE_INSTRUCTIONS = """You are a friendly, conversational UK financial planning assistant.
 Your goal is to chat naturally, like a human advisor (a "Coach").
 
 CORE LOGIC:
@@ -43,7 +46,10 @@ CORE LOGIC:
    - **NO MATH**: Don't list calculations.
    - **NATURAL LANGUAGE**: Use "Home Purchase" not "buy_home".
 
-46: ACTION TRIGGERS:
+"""
+
+# Free-text action format: the model appends an [INTENT:...] tag to its reply
+INTENT_TAG_INSTRUCTIONS = """46: ACTION TRIGGERS:
 47: - **CRITICAL**: Only output `[INTENT:...]` when you have ALL parameters.
 48: - **CUSTOM GOAL**: Use `[INTENT:custom_goal|scenarioName:X|targetAmount:Y|targetDate:Z|direction:save/spend/income|frequency:lump/monthly...]`
 49: - Standard ID: `[INTENT:scenario_id|param:val|...]`
@@ -57,6 +63,16 @@ CORE LOGIC:
 57: MONEY: "1m" = £1m. "10k" = £10k.
 """
 
+# Structured action format: the model calls the open_config tool instead of writing a tag
+TOOL_CALL_INSTRUCTIONS = """ACTION TRIGGERS:
+- **CRITICAL**: Only call the `open_config` tool when you have ALL parameters. Otherwise ask your question as normal.
+- Use the scenario IDs and params listed under SCENARIO INSTRUCTIONS. For anything else use `custom_goal`.
+- Dates are `YYYY-MM-DD`; money is a plain number (e.g. 100000).
+"""
+
+# Kept for callers that import the combined tag-mode instructions
+BASE_INSTRUCTIONS = CORE_INSTRUCTIONS + INTENT_TAG_INSTRUCTIONS
+
 GOAL_SETTER_PROMPT = """
 PERSONA: **GOAL SETTER** 🎯
 Your Vibe: Efficient, Encouraging, Action-Oriented.
@@ -90,58 +106,108 @@ INSTRUCTIONS:
 - Caution: Check for 3-6 month emergency fund.
 """
 
-def get_contextual_advice(profile: dict) -> str:
-    """Generate personalized financial tips based on profile"""
-    advice = []
+# Speculative classifier (see api/speculation.py): kept tiny so it returns well before the main reply
+INTENT_CLASSIFIER_PROMPT = """Classify the user's latest financial goal into ONE scenario ID from this list, or "none" if nothing fits.
+Reply with JSON only: {{"scenarioId": "<id or none>"}}
+IDs: {scenario_ids}"""
+
+PROMPT_MODES = ('goals', 'health', 'events')
+
+# Retrieval mode (see api/retrieval.py): the KB sections are sent per turn instead of in the system prompt
+RETRIEVED_KB_PLACEHOLDER = "(Relevant facts are provided with each user message.)"
+RETRIEVED_SCENARIOS_PLACEHOLDER = "(Relevant scenarios are provided with each user message. Use custom_goal if none fit.)"
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional dependency
+    _encoding = None
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, otherwise the ~4 chars/token rule of thumb."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+ADVICE_LISA = "- **LISA Opportunity**: You are under 40. Consider opening a Lifetime ISA (LISA) for a 25% govt bonus towards a first home or retirement."
+ADVICE_TAX = "- **Tax Efficiency**: You are a higher-rate taxpayer. Increasing pension contributions can claim back 40% tax relief."
+ADVICE_EMERGENCY = "- **Emergency Fund**: Your savings seem low. Prioritize building a 3-6 month emergency fund before investing."
+ADVICE_ISA = "- **ISA Limits**: You have significant savings. Ensure you utilize your £20k ISA allowance to maximize tax-free growth."
+
+def get_profile_bucket(profile: dict) -> Tuple[bool, bool, str]:
+    """
+    Discretize a profile into the thresholds the coaching tips depend on.
     
-    if not profile:
-        return ""
-
+    Returns:
+        (LISA eligible, higher-rate taxpayer, savings band 'low'/'mid'/'high')
+    """
     age = profile.get('age')
     income = profile.get('income')
     savings = profile.get('savings', 0)
     
+    lisa_eligible = bool(age and isinstance(age, int) and 18 <= age < 40)
+    higher_rate = bool(income and isinstance(income, int) and income > 50270)
+    
+    if savings < 3000:
+        savings_band = 'low'
+    elif savings > 20000:
+        savings_band = 'high'
+    else:
+        savings_band = 'mid'
+    
+    return lisa_eligible, higher_rate, savings_band
+
+@lru_cache(maxsize=64)
+def _advice_for_bucket(bucket: Tuple[bool, bool, str]) -> str:
+    lisa_eligible, higher_rate, savings_band = bucket
+    advice = []
+    
     # 1. Age-based Logic (LISA)
-    if age and isinstance(age, int) and 18 <= age < 40:
-        advice.append("- **LISA Opportunity**: You are under 40. Consider opening a Lifetime ISA (LISA) for a 25% govt bonus towards a first home or retirement.")
+    if lisa_eligible:
+        advice.append(ADVICE_LISA)
 
     # 2. Income-based Logic (Tax Relief)
-    if income and isinstance(income, int) and income > 50270:
-        advice.append("- **Tax Efficiency**: You are a higher-rate taxpayer. Increasing pension contributions can claim back 40% tax relief.")
+    if higher_rate:
+        advice.append(ADVICE_TAX)
         
     # 3. Savings Checks
-    if savings < 3000:
-        advice.append("- **Emergency Fund**: Your savings seem low. Prioritize building a 3-6 month emergency fund before investing.")
-    elif savings > 20000:
-        advice.append("- **ISA Limits**: You have significant savings. Ensure you utilize your £20k ISA allowance to maximize tax-free growth.")
+    if savings_band == 'low':
+        advice.append(ADVICE_EMERGENCY)
+    elif savings_band == 'high':
+        advice.append(ADVICE_ISA)
         
     if not advice:
         return ""
         
     return "PERSONALIZED COACHING TIPS (Mention these if relevant to user query):\\n" + "\\n".join(advice)
 
-def get_system_prompt(mode: str, financial_kb: str, scenario_kb: str, profile: dict = None, current_date: str = None) -> str:
-    """Combine Base Prompt with Persona-Specific Prompt"""
-    
-    persona_prompt = GOAL_SETTER_PROMPT # Default
+def get_contextual_advice(profile: dict) -> str:
+    """Generate personalized financial tips based on profile (memoized per profile bucket)"""
+    if not profile:
+        return ""
     
+    return _advice_for_bucket(get_profile_bucket(profile))
+
+def get_persona_prompt(mode: str) -> str:
     if mode == 'health':
-        persona_prompt = HEALTH_OPTIMIZER_PROMPT
+        return HEALTH_OPTIMIZER_PROMPT
     elif mode == 'events':
-        persona_prompt = STRESS_TESTER_PROMPT
-        
-    driver_advice = get_contextual_advice(profile) if profile else ""
-    
-    date_context = f"CURRENT DATE: {current_date}" if current_date else ""
-
-    return f"""{BASE_INSTRUCTIONS}
-
-{date_context}
-
+        return STRESS_TESTER_PROMPT
+    return GOAL_SETTER_PROMPT # Default
 
-{driver_advice}
+@lru_cache(maxsize=32)
+def _static_fragments(mode: str, financial_kb: str, scenario_kb: str, structured_intents: bool) -> Tuple[str, str]:
+    """
+    Compile the parts of the system prompt that don't depend on the user.
+    
+    Returns:
+        (head, tail): everything before the date line and everything after the coaching tips
+    """
+    action_instructions = TOOL_CALL_INSTRUCTIONS if structured_intents else INTENT_TAG_INSTRUCTIONS
+    head = f"{CORE_INSTRUCTIONS}{action_instructions}\n\n"
+    tail = f"""
 
-{persona_prompt}
+{get_persona_prompt(mode)}
 
 FINANCIAL KNOWLEDGE BASE:
 {financial_kb}
@@ -149,3 +215,26 @@ FINANCIAL KNOWLEDGE BASE:
 SCENARIO INSTRUCTIONS (ID: [Required Params]):
 {scenario_kb}
 """
+    return head, tail
+
+def precompile_system_prompts(financial_kb: str, scenario_kb: str, structured_intents: bool = False) -> None:
+    """Compile the static fragments for every mode up front (at startup and after each knowledge reload)."""
+    for mode in PROMPT_MODES:
+        _static_fragments(mode, financial_kb, scenario_kb, structured_intents)
+
+def get_system_prompt(mode: str, financial_kb: str, scenario_kb: str, profile: dict = None, current_date: str = None, structured_intents: bool = False) -> str:
+    """Combine Base Prompt with Persona-Specific Prompt
+
+    structured_intents swaps the [INTENT:...] tag instructions for the shorter
+    open_config tool instructions (see api/intent_schema.py).
+    
+    Assembled by joining cached fragments: the static head/tail per mode and
+    the coaching tips per profile bucket.
+    """
+    head, tail = _static_fragments(mode, financial_kb, scenario_kb, structured_intents)
+    
+    driver_advice = get_contextual_advice(profile) if profile else ""
+    
+    date_context = f"CURRENT DATE: {current_date}" if current_date else ""
+
+    return "".join((head, date_context, "\n\n\n", driver_advice, tail))
@@ -0,0 +1,306 @@
+"""
+Rate Limiting and Admission Control
+
+ASGI middleware in front of the chat endpoints. Every request must find a
+token in each of its buckets: one per session (sessionId in the JSON body),
+one per client IP and, when an X-API-Key header is sent, one per API key.
+A token bucket allows a burst of requests and then refills at a steady
+per-minute rate. On top of that a per-worker cap on in-flight chat requests
+turns away new work as soon as the worker is saturated.
+
+A batch request carries many turns, so it is not charged as one request: the
+middleware only hands itself to the endpoint (scope["rate_limiter"]), which
+admits each turn like a separate /api/chat request and waits out the
+Retry-After rather than dropping the turn.
+
+Rejections are immediate 429s with a Retry-After header; nothing queues, so
+one noisy client can't build up a backlog that eats everyone's upstream quota.
+
+Buckets live in memory by default (per worker process). Set
+RATE_LIMIT_REDIS_URL to share them across workers; that needs the optional
+`redis` package.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Paths (prefixes) that are limited; health, readiness and admin endpoints are not
+RATE_LIMITED_PATHS = ("/api/chat",)
+# Paths whose endpoint charges every item through RateLimitMiddleware.admit
+PER_ITEM_PATHS = ("/api/chat/batch",)
+MAX_CONCURRENT = int(os.getenv("RATE_LIMIT_MAX_CONCURRENT", "32"))
+REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Only behind a trusted proxy: take the client IP from the first X-Forwarded-For entry
+TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# Largest request body read to find the sessionId
+MAX_BODY_BYTES = 1024 * 1024
+# Idle buckets are dropped once the in-memory store grows past this
+MAX_MEMORY_BUCKETS = 10000
+
+
+class Limit(NamedTuple):
+    name: str  # 'session', 'ip' or 'api_key'
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.per_minute / 60.0
+
+
+def _limit(name: str, env_prefix: str, per_minute: str, burst: str) -> Limit:
+    return Limit(name, float(os.getenv(f"{env_prefix}_PER_MINUTE", per_minute)), int(os.getenv(f"{env_prefix}_BURST", burst)))
+
+
+SESSION_LIMIT = _limit('session', 'RATE_LIMIT_SESSION', '20', '5')
+IP_LIMIT = _limit('ip', 'RATE_LIMIT_IP', '60', '20')
+API_KEY_LIMIT = _limit('api_key', 'RATE_LIMIT_API_KEY', '600', '100')
+
+
+class MemoryBuckets:
+    """Token buckets in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated at)
+
+    async def take(self, keys: List[Tuple[str, Limit]]) -> Tuple[float, Optional[str]]:
+        """
+        Take one token from every bucket, or from none of them.
+
+        Returns:
+            (0.0, None) if allowed, else (seconds until a retry can succeed,
+            name of the limit that was hit)
+        """
+        now = time.monotonic()
+        with self._lock:
+            refilled = []
+            wait, hit = 0.0, None
+            for key, limit in keys:
+                tokens, updated = self._buckets.get(key, (limit.burst, now))
+                tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+                refilled.append(tokens)
+                if tokens < 1 and (1 - tokens) / limit.rate > wait:
+                    wait, hit = (1 - tokens) / limit.rate, limit.name
+            if hit:
+                return wait, hit
+            for (key, _), tokens in zip(keys, refilled):
+                self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._evict_idle(now, dict(keys))
+        return 0.0, None
+
+    def _evict_idle(self, now: float, limits: Dict[str, Limit]) -> None:
+        # A bucket idle for a full refill period is indistinguishable from a new one
+        longest = max(limit.burst / limit.rate for limit in (SESSION_LIMIT, IP_LIMIT, API_KEY_LIMIT, *limits.values()))
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated > longest:
+                del self._buckets[key]
+
+
+# Same all-or-nothing rule as MemoryBuckets.take, atomically on the Redis server.
+# ARGV: now, then (burst, rate) for each key. Returns {wait seconds ("0" = allowed), index of the key hit}.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait, hit = 0, 0
+for i = 1, #KEYS do
+  local burst, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+  local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local t = tonumber(state[1]) or burst
+  local ts = tonumber(state[2]) or now
+  t = math.min(burst, t + math.max(0, now - ts) * rate)
+  tokens[i] = t
+  if t < 1 and (1 - t) / rate > wait then
+    wait, hit = (1 - t) / rate, i
+  end
+end
+if hit > 0 then
+  return {tostring(wait), hit}
+end
+for i = 1, #KEYS do
+  local burst, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+  redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i] - 1), 'ts', tostring(now))
+  redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+end
+return {'0', 0}
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker through Redis."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    async def take(self, keys: List[Tuple[str, Limit]]) -> Tuple[float, Optional[str]]:
+        args: List[Any] = [time.time()]
+        for _, limit in keys:
+            args += [limit.burst, limit.rate]
+        wait, hit = await self._take(keys=[self._prefix + key for key, _ in keys], args=args)
+        wait = float(wait)
+        return (wait, keys[int(hit) - 1][1].name) if wait > 0 else (0.0, None)
+
+
+def create_backend(redis_url: Optional[str] = REDIS_URL):
+    """Redis buckets when configured (and the package is installed), otherwise in-memory ones."""
+    if redis_url:
+        try:
+            return RedisBuckets(redis_url)
+        except ImportError:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; using per-worker buckets")
+    return MemoryBuckets()
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_ip(scope: Dict[str, Any], trust_forwarded: bool = TRUST_FORWARDED) -> str:
+    """The client address, or the first X-Forwarded-For hop when the proxy is trusted."""
+    if trust_forwarded:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Per-session/IP/API-key token buckets plus a cap on concurrent chat requests."""
+
+    def __init__(self, app, backend=None, limits: Tuple[Limit, Limit, Limit] = (SESSION_LIMIT, IP_LIMIT, API_KEY_LIMIT),
+                 max_concurrent: int = MAX_CONCURRENT, paths: Tuple[str, ...] = RATE_LIMITED_PATHS,
+                 per_item_paths: Tuple[str, ...] = PER_ITEM_PATHS, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.session_limit, self.ip_limit, self.api_key_limit = limits
+        self.max_concurrent = max_concurrent
+        self.paths = paths
+        self.per_item_paths = per_item_paths
+        self.enabled = enabled
+        self.in_flight = 0  # only touched on the event loop
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        # Reject before reading the body: a saturated worker shouldn't do any more work
+        if self.in_flight >= self.max_concurrent:
+            metrics.inc('rate_limited_total', limit="concurrency")
+            await self._reject(send, "concurrency", 1.0)
+            return
+
+        if scope["path"].startswith(self.per_item_paths):
+            # The endpoint admits each item itself; the request holds no slot of its own
+            scope["rate_limiter"] = self
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await self._buffer_body(receive)
+        hit, wait = await self.admit(scope, _session_id(body))
+        if hit:
+            await self._reject(send, hit, wait)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.release()
+
+    async def admit(self, scope: Dict[str, Any], session_id: Optional[str]) -> Tuple[Optional[str], float]:
+        """
+        Take a concurrency slot and a token from each bucket for one chat turn.
+
+        Returns:
+            (None, 0.0) if admitted - call release() when the turn is done -
+            else (name of the limit that was hit, seconds until a retry can succeed)
+        """
+        if self.in_flight >= self.max_concurrent:
+            metrics.inc('rate_limited_total', limit="concurrency")
+            return "concurrency", 1.0
+        keys = [(f"ip:{client_ip(scope)}", self.ip_limit)]
+        api_key = _header(scope, b"x-api-key")
+        if api_key:
+            keys.append((f"key:{api_key}", self.api_key_limit))
+        if session_id:
+            keys.append((f"session:{session_id}", self.session_limit))
+
+        # Hold the slot while the buckets are checked so concurrent turns can't overshoot the cap
+        self.in_flight += 1
+        wait, hit = await self.backend.take(keys)
+        if hit:
+            self.in_flight -= 1
+            metrics.inc('rate_limited_total', limit=hit)
+            return hit, wait
+        return None, 0.0
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    async def _buffer_body(self, receive):
+        """Read the request body, and return it with a receive() that replays it to the app."""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away; let the app see the disconnect
+                return b"", _replay([message], receive)
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if not message.get("more_body") or size > MAX_BODY_BYTES:
+                break
+        body = b"".join(chunks)
+        return body, _replay([{"type": "http.request", "body": body, "more_body": message.get("more_body", False)}], receive)
+
+    async def _reject(self, send, limit: str, wait: float) -> None:
+        retry_after = max(1, math.ceil(wait))
+        detail = "Server busy, try again shortly" if limit == "concurrency" else "Too many requests"
+        body = json.dumps({"detail": detail, "limit": limit, "retryAfter": retry_after}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [(b"content-type", b"application/json"), (b"retry-after", str(retry_after).encode()),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _replay(messages: List[Dict[str, Any]], receive):
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+    return replay
+
+
+def _session_id(body: bytes) -> Optional[str]:
+    if not body or len(body) > MAX_BODY_BYTES:
+        return None
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    session_id = payload.get("sessionId") if isinstance(payload, dict) else None
+    return session_id if isinstance(session_id, str) and session_id else None
@@ -0,0 +1,66 @@
+"""
+Per-Request Trace
+
+Where one chat turn spent its time and what it decided, for debugging a
+single slow chat from the browser. /api/chat starts a trace in a context
+variable; processUserInput and its helpers add stage timings (the same ones
+that feed chat_stage_seconds) and notes: routing, token counts, cache
+decisions and the matcher result.
+
+Every /api/chat response carries the stage timings as a Server-Timing header,
+which browser dev tools show under the request's Timing tab. The whole trace
+is returned in the response body as "trace" only when CHAT_DEBUG_TRACE=true
+and the request sends ?debug=true with a valid X-Admin-Key.
+"""
+
+import contextvars
+import os
+from typing import Any, Dict, Optional
+
+# Set to true to honour ?debug=true from admins (Server-Timing is always sent)
+DEBUG_TRACE_ENABLED = os.getenv("CHAT_DEBUG_TRACE", "false").lower() == "true"
+
+
+class RequestTrace:
+    __slots__ = ("stages", "notes")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}  # stage -> seconds
+        self.notes: Dict[str, Dict[str, Any]] = {}  # section -> values
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self, total: Optional[float] = None) -> Dict[str, Any]:
+        trace: Dict[str, Any] = {"stagesMs": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}}
+        if total is not None:
+            trace["totalMs"] = round(total * 1000, 2)
+        trace.update(self.notes)
+        return trace
+
+
+current: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def start() -> RequestTrace:
+    """Start a trace for the current request; tasks started from here on add to it."""
+    trace = RequestTrace()
+    current.set(trace)
+    return trace
+
+
+def stages() -> Optional[Dict[str, float]]:
+    """The current trace's stage timings (for metrics.StageTimer to write into), or None outside a trace."""
+    trace = current.get()
+    return trace.stages if trace is not None else None
+
+
+def note(section: str, **values: Any) -> None:
+    """Add values to a section of the current trace, e.g. note('cache', extraction='hit'). No-op outside a trace."""
+    trace = current.get()
+    if trace is not None:
+        trace.notes.setdefault(section, {}).update(values)
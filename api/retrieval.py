@@ -0,0 +1,131 @@
+"""
+Prompt Knowledge Retrieval
+
+BM25 over the scenario library (scenario_patterns.json) and the financial
+knowledge base (financial_knowledge.json). Instead of rendering all 55
+scenarios and every KB topic into each session's system prompt, the agent
+can select only the top-k entries relevant to the current turn.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'i', 'im', 'in', 'is', 'it',
+    'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'this', 'to', 'we', 'what', 'with', 'you', 'your',
+}
+
+# Always offered so the model can fall back to a custom goal (STEP B of the decision tree)
+ALWAYS_INCLUDE_SCENARIOS = ('custom_goal',)
+# First line of the per-turn block (the prompt profiler counts blocks starting with it as retrieved context)
+RETRIEVED_BLOCK_HEADER = "RELEVANT SCENARIOS (ID: [Required Params]):"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed and a light plural strip ('isas' -> 'isa')."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def render_scenario_line(scenario_id: str, config: Dict[str, Any]) -> str:
+    """Scenario entry as rendered in the SCENARIO INSTRUCTIONS prompt section."""
+    return f"- {scenario_id}: {config.get('params', [])}"
+
+
+def render_financial_fact(topic: str, info: Dict[str, Any]) -> str:
+    """KB entry as rendered in the FINANCIAL KNOWLEDGE BASE prompt section."""
+    source = f" (Source: {info.get('source', 'Unknown')})" if info.get('source') else ""
+    return f"{topic}: {info.get('coach_tip', '')} (Fact: {info.get('limit', '')} {info.get('tax_relief', '')}){source}"
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory corpus."""
+
+    def __init__(self, documents: Dict[str, List[str]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = {doc_id: len(tokens) for doc_id, tokens in documents.items()}
+        self.avg_length = (sum(self.doc_lengths.values()) / len(documents)) if documents else 0.0
+
+        self.postings: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for doc_id, tokens in documents.items():
+            for term, freq in Counter(tokens).items():
+                self.postings[term].append((doc_id, freq))
+
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query_tokens: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs, best first. Documents with no matching term are omitted."""
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(query_tokens):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class KnowledgeRetriever:
+    """Selects the scenario definitions and KB facts relevant to a turn."""
+
+    def __init__(self, patterns: Dict[str, Dict[str, Any]], financial_kb: Dict[str, Dict[str, Any]]):
+        self.scenario_lines: Dict[str, str] = {}
+        scenario_docs: Dict[str, List[str]] = {}
+        for theme, scenarios in patterns.items():
+            for scenario_id, config in scenarios.items():
+                self.scenario_lines[scenario_id] = render_scenario_line(scenario_id, config)
+                text = ' '.join([scenario_id.replace('_', ' ')] + config.get('keywords', []) +
+                                [p.replace('_', ' ') for p in config.get('params', [])])
+                scenario_docs[scenario_id] = tokenize(text)
+
+        self.fact_lines: Dict[str, str] = {}
+        fact_docs: Dict[str, List[str]] = {}
+        for topic, info in financial_kb.items():
+            self.fact_lines[topic] = render_financial_fact(topic, info)
+            values = [str(value) for key, value in info.items() if key not in ('source', 'last_updated')]
+            fact_docs[topic] = tokenize(' '.join([topic] + values))
+
+        self.scenario_index = BM25Index(scenario_docs)
+        self.fact_index = BM25Index(fact_docs)
+
+    def select(self, query: str, k_scenarios: int = 6, k_facts: int = 2) -> Tuple[List[str], List[str]]:
+        """
+        Retrieve the most relevant entries for a query.
+
+        Returns:
+            (scenario IDs, KB topics), best first
+        """
+        tokens = tokenize(query)
+        scenario_ids = [doc_id for doc_id, _ in self.scenario_index.search(tokens, k_scenarios)]
+        for scenario_id in ALWAYS_INCLUDE_SCENARIOS:
+            if scenario_id in self.scenario_lines and scenario_id not in scenario_ids:
+                scenario_ids.append(scenario_id)
+        topics = [doc_id for doc_id, _ in self.fact_index.search(tokens, k_facts)]
+        return scenario_ids, topics
+
+    def render(self, query: str, k_scenarios: int = 6, k_facts: int = 2) -> str:
+        """Per-turn prompt block with the retrieved scenarios and facts."""
+        scenario_ids, topics = self.select(query, k_scenarios, k_facts)
+        parts = [RETRIEVED_BLOCK_HEADER]
+        parts.extend(self.scenario_lines[scenario_id] for scenario_id in scenario_ids)
+        if topics:
+            parts.append("")
+            parts.append("RELEVANT FINANCIAL KNOWLEDGE:")
+            parts.extend(self.fact_lines[topic] for topic in topics)
+        return "\n".join(parts)
@@ -0,0 +1,246 @@
+"""
+Service Mode and Load Shedding
+
+How chat turns are answered, switchable at runtime:
+
+- full: the LLM, as normal
+- deterministic: no upstream call; the pattern matcher, extraction and the
+  slot store pick the scenario and the reply comes from a template
+- off: AI chat is turned off and the chat endpoints answer 503
+
+The starting mode comes from SERVICE_MODE. It can be changed while running
+through POST /api/admin/service-mode or by writing SERVICE_MODE_FILE
+({"mode": "deterministic", "reason": "..."}); whichever changed last wins, and
+deleting the file goes back to SERVICE_MODE.
+
+While the configured mode is full, the service also drops to deterministic by
+itself when upstream calls get slow (moving average above
+SERVICE_DEGRADE_LATENCY_SECONDS) or pile up (SERVICE_DEGRADE_QUEUE_DEPTH calls
+in flight), so replies keep coming back in time under overload. After
+SERVICE_DEGRADE_COOLDOWN_SECONDS it tries the LLM again; if upstream is still
+slow the first slow call trips it straight back.
+
+Deterministic replies name the scenario and its fields the way the config
+screens do, from scenario_labels.json (loaded by api/param_registry.py).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+from .param_registry import SCENARIO_LABELS
+
+logger = logging.getLogger(__name__)
+
+MODE_FULL = 'full'
+MODE_DETERMINISTIC = 'deterministic'
+MODE_OFF = 'off'
+MODES = (MODE_FULL, MODE_DETERMINISTIC, MODE_OFF)
+
+SERVICE_MODE = os.getenv("SERVICE_MODE", MODE_FULL).lower()
+SERVICE_MODE_FILE = os.getenv("SERVICE_MODE_FILE", "service_mode.json")
+# Seconds between mtime checks of SERVICE_MODE_FILE (0 disables the watcher)
+MODE_WATCH_INTERVAL_SECONDS = float(os.getenv("SERVICE_MODE_WATCH_INTERVAL_SECONDS", "2"))
+
+# Auto-degrade thresholds (0 disables either trigger)
+DEGRADE_LATENCY_SECONDS = float(os.getenv("SERVICE_DEGRADE_LATENCY_SECONDS", "15"))
+DEGRADE_QUEUE_DEPTH = int(os.getenv("SERVICE_DEGRADE_QUEUE_DEPTH", "24"))
+DEGRADE_COOLDOWN_SECONDS = float(os.getenv("SERVICE_DEGRADE_COOLDOWN_SECONDS", "30"))
+# Weight of the newest upstream latency in the moving average
+LATENCY_SMOOTHING = 0.3
+
+OFF_MESSAGE = "The assistant is switched off at the moment. Please try again later."
+
+
+class ServiceMode:
+    """The configured mode plus the automatic fallback. Only touched from the event loop."""
+
+    def __init__(self, mode: str = SERVICE_MODE, path: Optional[str] = SERVICE_MODE_FILE,
+                 latency_threshold: float = DEGRADE_LATENCY_SECONDS, queue_threshold: int = DEGRADE_QUEUE_DEPTH,
+                 cooldown: float = DEGRADE_COOLDOWN_SECONDS):
+        if mode not in MODES:
+            logger.warning("Unknown SERVICE_MODE %r, using %s", mode, MODE_FULL)
+            mode = MODE_FULL
+        self.default = mode
+        self.configured = mode
+        self.source = 'env'
+        self.reason: Optional[str] = None
+        self.path = path
+        self.latency_threshold = latency_threshold
+        self.queue_threshold = queue_threshold
+        self.cooldown = cooldown
+        self.degraded: Optional[str] = None  # why the service fell back to deterministic, if it did
+        self.degraded_at = 0.0
+        self.in_flight = 0  # upstream calls waiting for a completion
+        self.latency: Optional[float] = None  # moving average of upstream latency, seconds
+        self._mtime = self._file_mtime()
+        if self._mtime is not None:
+            self.load_file()
+
+    @property
+    def mode(self) -> str:
+        """The mode the next turn should run in."""
+        if self.configured != MODE_FULL:
+            return self.configured
+        if self.degraded and time.monotonic() - self.degraded_at >= self.cooldown and not self._queue_full():
+            self._recover()
+        return MODE_DETERMINISTIC if self.degraded else MODE_FULL
+
+    def set(self, mode: str, source: str = 'admin', reason: Optional[str] = None) -> None:
+        """
+        Set the configured mode.
+
+        Raises:
+            ValueError: mode is not one of MODES
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown service mode {mode!r} (expected one of {', '.join(MODES)})")
+        if mode != self.configured:
+            metrics.inc('service_mode_changes_total', mode=mode, source=source)
+        logger.info("Service mode %s -> %s (%s%s)", self.configured, mode, source, f": {reason}" if reason else "")
+        self.configured, self.source, self.reason = mode, source, reason
+        if mode == MODE_FULL:
+            self.degraded = None  # an explicit switch to full overrides the automatic fallback
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "configured": self.configured,
+            "source": self.source,
+            "reason": self.reason,
+            "degraded": self.degraded,
+            "upstreamInFlight": self.in_flight,
+            "upstreamLatency": round(self.latency, 3) if self.latency is not None else None,
+            "thresholds": {"latencySeconds": self.latency_threshold, "queueDepth": self.queue_threshold,
+                           "cooldownSeconds": self.cooldown},
+        }
+
+    @asynccontextmanager
+    async def upstream(self):
+        """Wrap one upstream completion: counts it in flight and feeds its latency to the auto-degrade check."""
+        self.in_flight += 1
+        if self._queue_full():
+            self._degrade('queue', f"{self.in_flight} upstream calls in flight")
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # The client went away; how long that took says nothing about upstream
+            raise
+        except BaseException:
+            self._record(time.monotonic() - started)
+            raise
+        else:
+            self._record(time.monotonic() - started)
+        finally:
+            self.in_flight -= 1
+
+    def _queue_full(self) -> bool:
+        return self.queue_threshold > 0 and self.in_flight >= self.queue_threshold
+
+    def _record(self, latency: float) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        if self.latency_threshold > 0 and self.latency > self.latency_threshold:
+            self._degrade('latency', f"upstream latency {self.latency:.1f}s")
+
+    def _degrade(self, trigger: str, reason: str) -> None:
+        self.degraded_at = time.monotonic()  # a fresh trigger restarts the cooldown
+        if self.degraded or self.configured != MODE_FULL:
+            return
+        self.degraded = reason
+        metrics.inc('service_mode_degraded_total', trigger=trigger)
+        logger.warning("Falling back to %s: %s", MODE_DETERMINISTIC, reason)
+
+    def _recover(self) -> None:
+        logger.info("Trying %s again after %gs (%s)", MODE_FULL, self.cooldown, self.degraded)
+        self.degraded = None
+        self.latency = None  # judge upstream on fresh calls only
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        """True if SERVICE_MODE_FILE was written, created or deleted since it was last read."""
+        return self._file_mtime() != self._mtime
+
+    def load_file(self) -> None:
+        """Apply SERVICE_MODE_FILE (or SERVICE_MODE, if the file is gone). A bad file is logged and ignored."""
+        self._mtime = self._file_mtime()
+        if self._mtime is None:
+            self.set(self.default, 'file', f"{self.path} removed")
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            self.set(str(config.get('mode', '')).lower(), 'file', config.get('reason'))
+        except Exception as e:
+            metrics.inc('service_mode_file_errors_total')
+            logger.warning("Ignoring %s, keeping %s: %s", self.path, self.configured, e)
+
+
+async def watch(service_mode: ServiceMode, interval: float = MODE_WATCH_INTERVAL_SECONDS) -> None:
+    """Poll SERVICE_MODE_FILE and apply it whenever it changes. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if service_mode.changed():
+            service_mode.load_file()
+
+
+def _label(name: str) -> str:
+    # propertyPrice / property_price -> "property price"
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', name).replace('_', ' ').lower()
+
+
+def scenario_name(scenario_id: str) -> str:
+    """The scenario's display name, as shown in the scenario list."""
+    return SCENARIO_LABELS.get(scenario_id, {}).get('displayName') or _label(scenario_id)
+
+
+def field_label(scenario_id: str, key: str) -> str:
+    """
+    The label of a param on the scenario's config screen, for use mid-sentence.
+
+    "Total Wedding Budget" -> "total wedding budget"; "Current Rate (%)" ->
+    "current rate". Keys the screen doesn't show fall back to the key in words.
+    """
+    fields = SCENARIO_LABELS.get(scenario_id, {}).get('fields', {})
+    label = fields.get(key) or fields.get(re.sub(r'_([a-z])', lambda m: m.group(1).upper(), key))
+    if not label:
+        return _label(key)
+    label = re.sub(r'\s*\(.*?\)', '', label)
+    return ' '.join(word if word.isupper() else word.lower() for word in label.split())
+
+
+def template_reply(scenario_id: Optional[str], action_params: Optional[Dict[str, Any]], missing: List[str]) -> str:
+    """
+    The assistant message for a deterministic turn.
+
+    Args:
+        scenario_id: Scenario the matcher picked, if any
+        action_params: Params of the OPEN_CONFIG action, if one is sent this turn
+        missing: Frontend keys of the scenario's params that are still missing
+    """
+    if not scenario_id:
+        return ("I'm running in a simplified mode right now. Tell me what you're planning, for example buying a home, "
+                "a wedding or a new car, and roughly how much it will cost, and I'll open the right planner.")
+    scenario = scenario_name(scenario_id)
+    if action_params is not None:
+        reply = f"I've opened the {scenario} planner with what you've told me so far."
+        if missing:
+            reply += f" You can add the {', '.join(field_label(scenario_id, field) for field in missing)} there."
+        return reply
+    if missing:
+        return f"That sounds like the {scenario} scenario. What's the {field_label(scenario_id, missing[0])}?"
+    return f"That sounds like the {scenario} scenario. Roughly how much will it cost?"
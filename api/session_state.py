@@ -0,0 +1,65 @@
+"""
+Per-Session Matching State
+
+Caches, for each session, the keyword hits of the most recent user messages
+and the last amount the user mentioned. A turn only scans its own message;
+the scenario is matched on the union of the cached hits for the window.
+
+The same dict also carries the session's slot store (see api/slots.py).
+
+State is plain JSON (persisted to session_state.json next to sessions.json).
+It is rebuilt from the session history when missing or stale, e.g. for
+sessions stored before it existed or after a reload or restart changed the
+keywords. Staleness is judged by the matcher's keyword fingerprint, which is
+the same in every process for the same keywords.
+"""
+
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from .extraction import extract_amount
+
+# Number of user messages (including the current one) matched together
+MATCH_WINDOW = 3
+
+
+def build_state(history: List[Dict[str, Any]], matcher) -> Dict[str, Any]:
+    """Rebuild a session's matching state from its stored history."""
+    user_messages = [m["content"] for m in history if m.get("role") == "user"]
+
+    last_amount = None
+    for user_msg in reversed(user_messages):
+        last_amount = extract_amount(user_msg)
+        if last_amount is not None:
+            break
+
+    return {
+        "keywordFingerprint": matcher.fingerprint,
+        "userMessageCount": len(user_messages),
+        "recentHits": [sorted(matcher.message_hits(text)) for text in user_messages[-MATCH_WINDOW:]],
+        "lastAmount": last_amount,
+    }
+
+
+def is_current(state: Optional[Dict[str, Any]], history: List[Dict[str, Any]], keyword_fingerprint: str) -> bool:
+    """True if the cached state matches the history it was built from and the live keyword set."""
+    return (
+        state is not None
+        and state.get("keywordFingerprint") == keyword_fingerprint
+        and state.get("userMessageCount") == sum(1 for m in history if m.get("role") == "user")
+    )
+
+
+def window_hits(state: Dict[str, Any], turn_hits: FrozenSet[str]) -> List[FrozenSet[str]]:
+    """Hit sets for the previous MATCH_WINDOW - 1 user messages plus the current one."""
+    previous = state["recentHits"][-(MATCH_WINDOW - 1):] if MATCH_WINDOW > 1 else []
+    return [frozenset(hits) for hits in previous] + [turn_hits]
+
+
+def advance(state: Dict[str, Any], turn_hits: FrozenSet[str], turn_amount: Optional[int]) -> Dict[str, Any]:
+    """State after committing a turn (returns a new dict; the input is left unchanged)."""
+    return {
+        **state,
+        "userMessageCount": state["userMessageCount"] + 1,
+        "recentHits": (state["recentHits"] + [sorted(turn_hits)])[-MATCH_WINDOW:],
+        "lastAmount": turn_amount if turn_amount is not None else state["lastAmount"],
+    }
@@ -0,0 +1,206 @@
+"""
+Per-Session Slot Store
+
+Records which params of the active scenario (from scenario_patterns.json)
+the user has already given, so missingFields can be answered locally and the
+frontend can prefill the config screen instead of asking again.
+
+Each turn only reads its own message: amounts, durations and dates come from
+extraction.extract(), explicit values from the parsed intent params. An
+amount only fills a param its label names ("a 30k deposit" ->
+deposit_amount), or the scenario's only param of that kind. Slots are plain
+JSON ({"scenarioId": ..., "filled": {param: value}}) kept in the session's
+matching state, and start empty whenever the active scenario changes.
+
+Slots are keyed by the pattern file's param names; missingFields reports the
+frontend's keys for them (via the param registry).
+"""
+
+import re
+from datetime import date
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from .date_normalizer import allows_bare_year, to_iso
+from .extraction import AMOUNT_PRIORITY, Amount, Extraction
+from .intent_schema import infer_param_schema
+
+# Count params a spoken duration ("18 months", "2 years") can fill; ages never come from durations
+DURATION_HINTS = ('months', 'years', 'duration', 'term', 'period')
+# Words in a param name that don't say which amount it is (total_cost, loan_amount)
+GENERIC_LABEL_WORDS = frozenset({'amount', 'total', 'cost', 'value', 'monthly'})
+
+
+def slot_kind(name: str) -> str:
+    """'date', 'rate', 'count', 'monthly', 'money' or 'text', from the param name alone."""
+    schema = infer_param_schema(name)
+    if schema.get('format') == 'date':
+        return 'date'
+    if schema['type'] == 'integer':
+        return 'count'
+    if schema['type'] == 'number':
+        if 'Percentage' in schema.get('description', ''):
+            return 'rate'
+        return 'monthly' if 'monthly' in name.lower() else 'money'
+    return 'text'
+
+
+def _key(name: str) -> str:
+    # property_price and propertyPrice name the same slot
+    return name.replace('_', '').lower()
+
+
+def _first_open(params: List[str], filled: Dict[str, Any], kind: str) -> Optional[str]:
+    return next((p for p in params if p not in filled and slot_kind(p) == kind), None)
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if word.endswith('s') and len(word) > 3 else word
+
+
+def _label_words(param: str) -> FrozenSet[str]:
+    # treatment_cost / treatmentCost -> {"treatment"}
+    words = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', param).lower().split('_')
+    return frozenset(_stem(word) for word in words if word and _stem(word) not in GENERIC_LABEL_WORDS)
+
+
+def _slot_for_amount(params: List[str], filled: Dict[str, Any], amount: Amount, kind: str) -> Optional[str]:
+    """The open param of this kind the amount is for: the one its label names, else the scenario's only one."""
+    candidates = [p for p in params if slot_kind(p) == kind]
+    label = {_stem(word) for word in amount.label}
+    named = [p for p in candidates if _label_words(p) & label]
+    if named:
+        return next((p for p in named if p not in filled), None)
+    if len(candidates) == 1 and candidates[0] not in filled:
+        return candidates[0]
+    return None  # several params it could be for and nothing says which
+
+
+def _one_off_amounts(extraction: Extraction) -> List[Amount]:
+    """The amounts Extraction.amount considers, headline first, ignoring amounts quoted per month/year/week."""
+    return [amount for kind in AMOUNT_PRIORITY for amount in extraction.amounts
+            if amount.kind == kind and amount.period is None]
+
+
+def fill_from_message(params: List[str], filled: Dict[str, Any], extraction: Extraction,
+                      now: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Fill open slots from one message's extraction (returns a new dict).
+
+    One-off and monthly amounts fill the open param their label names, or
+    the scenario's only param of that kind; an amount that could be for
+    several params is left for the model to ask about. The first resolvable
+    date and the first spoken duration fill the first open param of their
+    kind, in the order the scenario lists them.
+    """
+    filled = dict(filled)
+
+    for amount in _one_off_amounts(extraction):
+        if param := _slot_for_amount(params, filled, amount, 'money'):
+            filled[param] = amount.value
+
+    for amount in extraction.amounts:
+        if amount.period == 'month' and (param := _slot_for_amount(params, filled, amount, 'monthly')):
+            filled[param] = amount.value
+
+    for mention in extraction.dates:
+        param = _first_open(params, filled, 'date')
+        resolved = to_iso(mention.text, now, allow_year=bool(param) and allows_bare_year(param))
+        if resolved:
+            if param:
+                filled[param] = resolved
+            break
+
+    # "in 2 years" is a date, not a duration
+    date_starts = {mention.start for mention in extraction.dates}
+    duration = next((d for d in extraction.durations if d.start not in date_starts), None)
+    if duration is not None:
+        param = next((p for p in params if p not in filled and slot_kind(p) == 'count'
+                      and any(hint in p.lower() for hint in DURATION_HINTS)), None)
+        if param:
+            months = duration.months / 12 if 'year' in param.lower() else duration.months
+            filled[param] = max(1, round(months))
+
+    return filled
+
+
+def fill_from_intent(params: List[str], filled: Dict[str, Any], intent_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill slots from the params the model (or the fallback rule) put in an action (returns a new dict).
+
+    A param is matched by name (propertyPrice -> property_price), otherwise
+    by kind (totalBudget -> the scenario's first open money param). Explicit
+    values overwrite anything read from the message.
+    """
+    filled = dict(filled)
+    by_key = {_key(p): p for p in params}
+    assigned: Dict[str, Any] = {}
+    for name, value in intent_params.items():
+        if value is None or value == '':
+            continue
+        param = by_key.get(_key(name))
+        if param is None:
+            kind = slot_kind(name)
+            param = _first_open(params, assigned, kind) if kind != 'text' else None
+        if param:
+            assigned[param] = value
+    filled.update(assigned)
+    return filled
+
+
+def update_slots(slots: Optional[Dict[str, Any]], scenario_id: Optional[str], scenario_params: Dict[str, List[str]],
+                 extraction: Extraction, intent_params: Optional[Dict[str, Any]] = None,
+                 now: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Slots after a turn (returns a new dict; the input is left unchanged).
+
+    Args:
+        slots: The session's slots before the turn, or None
+        scenario_id: Active scenario for this turn (None keeps the previous one)
+        scenario_params: Param names per scenario, hints stripped (KnowledgeSnapshot.scenario_params)
+        extraction: extract() of the turn's user message
+        intent_params: Params of the action sent this turn, if any
+        now: Reference date for relative dates (default: today)
+    """
+    scenario_id = scenario_id or (slots or {}).get("scenarioId")
+    if not scenario_id:
+        return slots
+    params = scenario_params.get(scenario_id, [])
+    filled = slots["filled"] if slots and slots.get("scenarioId") == scenario_id else {}
+    filled = fill_from_message(params, filled, extraction, now)
+    if intent_params:
+        filled = fill_from_intent(params, filled, intent_params)
+    return {"scenarioId": scenario_id, "filled": filled}
+
+
+def slot_for(params: List[str], name: str) -> Optional[str]:
+    """The scenario param an action param name corresponds to, by name or else by kind."""
+    param = next((p for p in params if _key(p) == _key(name)), None)
+    kind = slot_kind(name)
+    if param is None and kind != 'text':
+        param = next((p for p in params if slot_kind(p) == kind), None)
+    return param
+
+
+def missing_fields(slots: Optional[Dict[str, Any]], scenario_params: Dict[str, List[str]],
+                   invalid: List[str] = (), registry=None) -> List[str]:
+    """
+    The active scenario's params that have no value yet, in scenario order.
+
+    Action params that failed validation (invalid) are reported under their
+    slot's name, or as they are if they don't correspond to a slot. With a
+    ParamRegistry every name is reported as the config screen field it is
+    asked for on (marriage: amount -> totalBudget; childbirth: due_date ->
+    dueDate), and params the screen has no field for are left out.
+    """
+    if not slots:
+        return list(invalid)
+    params = scenario_params.get(slots["scenarioId"], [])
+    missing = [p for p in params if p not in slots["filled"]]
+    for name in invalid:
+        field = slot_for(params, name) or name
+        if field not in missing:
+            missing.append(field)
+    if registry is not None:
+        keys = (registry.frontend_key(slots["scenarioId"], field) for field in missing)
+        missing = list(dict.fromkeys(key for key in keys if key))
+    return missing
@@ -0,0 +1,115 @@
+"""
+Speculative Intent Classification
+
+Classifies the user's turn alongside the main chat completion (with the local
+pattern matcher or a small, cheap model call). When the fast path finishes
+first with a scenario and an amount, the action it implies can be sent ahead
+of the main reply (POST /api/chat/stream); the main reply stays
+authoritative and its action replaces the early one if they differ.
+reconcile() records how often the two agree, and record_early_action() how
+much sooner the action reached the client when the early one was kept.
+"""
+
+import json
+import logging
+from typing import List, NamedTuple, Optional
+
+from . import metrics
+from .prompts import INTENT_CLASSIFIER_PROMPT
+
+logger = logging.getLogger(__name__)
+
+SPECULATION_MODES = ('off', 'local', 'llm')
+
+
+def speculation_mode(value: str) -> str:
+    """AI_SPECULATIVE_INTENTS as a known mode; anything else is logged and treated as 'off'."""
+    mode = (value or 'off').lower()
+    if mode not in SPECULATION_MODES:
+        logger.warning("Unknown AI_SPECULATIVE_INTENTS %r (expected one of %s), using off",
+                       value, ", ".join(SPECULATION_MODES))
+        return 'off'
+    return mode
+
+
+class SpeculativeIntent(NamedTuple):
+    scenario_id: Optional[str]
+    confidence: float
+    amount: Optional[int]
+    source: str  # 'local' or 'llm'
+    latency: float  # seconds
+
+
+async def classify_with_llm(client, model: str, scenario_ids: List[str], user_messages: List[str]) -> Optional[str]:
+    """
+    Ask a small model which scenario the latest user messages refer to.
+
+    Returns a known scenario ID, or None if the model answered 'none',
+    returned an unknown ID or the call failed.
+    """
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": INTENT_CLASSIFIER_PROMPT.format(scenario_ids=", ".join(scenario_ids))},
+                {"role": "user", "content": "\n".join(user_messages[-3:])},
+            ],
+            temperature=0.0,
+            max_tokens=20,
+            response_format={"type": "json_object"},
+        )
+        scenario_id = json.loads(response.choices[0].message.content or "{}").get("scenarioId")
+    except Exception as e:
+        logger.warning("Classifier call failed: %s", e)
+        metrics.inc('speculation_errors_total')
+        return None
+
+    return scenario_id if scenario_id in scenario_ids else None
+
+
+def reconcile(main_scenario: Optional[str], speculative: SpeculativeIntent, used_speculation: bool) -> str:
+    """
+    Compare the speculative result with the main reply and record the outcome.
+
+    Args:
+        main_scenario: Scenario parsed from the main reply (tool call or tag), if any
+        speculative: Result of the fast path
+        used_speculation: True if the speculative result produced the returned action
+
+    Returns:
+        Outcome label: agree, disagree, main_only, speculative_only or none
+    """
+    if main_scenario and speculative.scenario_id:
+        outcome = 'agree' if main_scenario == speculative.scenario_id else 'disagree'
+    elif main_scenario:
+        outcome = 'main_only'
+    elif speculative.scenario_id and used_speculation:
+        outcome = 'speculative_only'
+    else:
+        outcome = 'none'
+
+    metrics.inc('speculation_total', source=speculative.source, outcome=outcome)
+    logger.debug("Speculation %s: %s in %.3fs vs main: %s -> %s", speculative.source, speculative.scenario_id,
+                 speculative.latency, main_scenario, outcome)
+    return outcome
+
+
+def record_early_action(source: str, early_scenario: str, final_scenario: Optional[str], lead: float) -> bool:
+    """
+    Record an action that was sent before the main reply arrived.
+
+    Args:
+        source: Speculation mode that produced it ('local' or 'llm')
+        early_scenario: Scenario of the early action
+        final_scenario: Scenario of the action in the final response, if any
+        lead: Seconds between sending the early action and the main reply
+
+    Returns:
+        True if the final response kept the early action; only then does the
+        lead count as latency saved (speculation_latency_saved_seconds)
+    """
+    kept = early_scenario == final_scenario
+    metrics.inc('speculation_early_actions_total', source=source, outcome='kept' if kept else 'replaced')
+    if kept:
+        metrics.observe('speculation_latency_saved_seconds', lead, source=source)
+    return kept
@@ -0,0 +1,98 @@
+"""
+Microbenchmark: amount extraction
+
+Compares the original four-regex amount extraction, run newest-first over
+every user message in the history on each turn, with the single-pass
+tokenizer in api/extraction.py (cold, and with its per-message memo warm).
+
+Usage: python bench_extraction.py [sessions.json] [repeats]
+"""
+
+import sys
+import os
+import re
+import json
+import time
+
+sys.path.append(os.getcwd())
+
+from api import extraction
+
+
+def legacy_extract_amount(text):
+    if match := re.search(r'£?\s*(\d+(?:\.\d+)?)\s*m(?:illion)?', text, re.I):
+        return int(float(match.group(1)) * 1000000)
+    if match := re.search(r'£?\s*(\d+(?:\.\d+)?)\s*k', text, re.I):
+        return int(float(match.group(1)) * 1000)
+    if match := re.search(r'£\s*(\d{1,3}(?:,\d{3})+)', text):
+        return int(match.group(1).replace(',', ''))
+    if match := re.search(r'(?:amount|target|save|need)\s+(?:of\s+)?£?\s*(\d+(?:,\d{3})*)', text):
+        return int(match.group(1).replace(',', ''))
+    return None
+
+
+def legacy_turn(user_messages):
+    """What processUserInput used to do every turn: lowercase and scan history newest first."""
+    for user_msg in reversed([m.lower() for m in user_messages]):
+        amount = legacy_extract_amount(user_msg)
+        if amount is not None:
+            return amount
+    return None
+
+
+def new_turn(user_messages):
+    for user_msg in reversed(user_messages):
+        amount = extraction.extract_amount(user_msg)
+        if amount is not None:
+            return amount
+    return None
+
+
+def load_turns(path):
+    """The user-message history as of every user turn in the session store."""
+    with open(path, 'r') as f:
+        sessions = json.load(f)
+    turns = []
+    for messages in sessions.values():
+        user_messages = []
+        for message in messages:
+            if message.get('role') == 'user':
+                user_messages.append(message.get('content') or '')
+                turns.append(list(user_messages))
+    return turns
+
+
+def timed(fn, turns, repeats, before_each=None):
+    best = float('inf')
+    for _ in range(repeats):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        for user_messages in turns:
+            fn(user_messages)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'sessions.json'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    turns = load_turns(path)
+
+    changed = [(t[-1], legacy_turn(t), new_turn(t)) for t in turns if legacy_turn(t) != new_turn(t)]
+    print(f"Corpus: {len(turns)} turns from {path}")
+    print(f"Different results: {len(changed)}")
+    for text, legacy, new in changed[:10]:
+        print(f"  {text!r}: legacy={legacy} new={new}")
+
+    legacy_time = timed(legacy_turn, turns, repeats)
+    cold_time = timed(new_turn, turns, repeats, before_each=extraction.extract.cache_clear)
+    warm_time = timed(new_turn, turns, repeats)
+    per_turn = lambda seconds: seconds / max(len(turns), 1) * 1e6
+    print(f"Legacy 4-regex scan:  {per_turn(legacy_time):8.1f} us/turn")
+    print(f"Single pass (cold):   {per_turn(cold_time):8.1f} us/turn")
+    print(f"Single pass (memo):   {per_turn(warm_time):8.1f} us/turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Microbenchmark: scenario pattern matching
+
+Compares the original matcher (one r'\\b<keyword>\\b' regex search per keyword
+per scenario) with the Aho-Corasick automaton in api/keyword_automaton.py on
+the user messages stored in sessions.json, and checks both pick the same
+scenario and score for every turn.
+
+Usage: python bench_pattern_matcher.py [sessions.json] [repeats]
+"""
+
+import sys
+import os
+import re
+import json
+import time
+
+sys.path.append(os.getcwd())
+
+from api.pattern_matcher import ScenarioPatternMatcher
+
+
+def legacy_score(text, keywords):
+    if not keywords:
+        return 0.0
+    matched_keywords = []
+    for keyword in keywords:
+        pattern = r'\b' + re.escape(keyword) + r'\b'
+        if re.search(pattern, text, re.IGNORECASE):
+            matched_keywords.append(keyword)
+    if not matched_keywords:
+        return 0.0
+    score = 0.5
+    for keyword in matched_keywords:
+        if len(keyword.split()) >= 2:
+            score += 0.3
+            break
+    if len(matched_keywords) >= 2:
+        score += 0.2
+    return min(score, 1.0)
+
+
+def legacy_match(scenario_map, text, conversation_history=None):
+    text_lower = text.lower()
+    search_text = text_lower
+    if conversation_history:
+        search_text = ' '.join(conversation_history[-3:] + [text_lower])
+    best_match = None
+    best_score = 0.0
+    for scenario_id, config in scenario_map.items():
+        score = legacy_score(search_text, config['keywords'])
+        if score > best_score:
+            best_score = score
+            best_match = scenario_id
+    if best_score >= 0.45:
+        return (best_match, best_score)
+    return None
+
+
+def load_corpus(path):
+    """(text, history) pairs for every user turn, as AIAgent passes them to the matcher."""
+    with open(path, 'r') as f:
+        sessions = json.load(f)
+    corpus = []
+    for messages in sessions.values():
+        user_messages = []
+        for message in messages:
+            if message.get('role') == 'user':
+                user_messages.append((message.get('content') or '').lower())
+                corpus.append((message['content'], list(user_messages)))
+    return corpus
+
+
+def timed(fn, corpus, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text, history in corpus:
+            fn(text, history)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'sessions.json'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    corpus = load_corpus(path)
+    matcher = ScenarioPatternMatcher()
+
+    mismatches = [
+        (text, legacy, new) for text, history in corpus
+        if (legacy := legacy_match(matcher.scenario_map, text, history)) != (new := matcher.match_scenario(text, history))
+    ]
+    print(f"Corpus: {len(corpus)} user turns from {path}")
+    print(f"Mismatches: {len(mismatches)}")
+    for text, legacy, new in mismatches[:10]:
+        print(f"  {text!r}: legacy={legacy} automaton={new}")
+
+    legacy_time = timed(lambda text, history: legacy_match(matcher.scenario_map, text, history), corpus, repeats)
+    automaton_time = timed(matcher.match_scenario, corpus, repeats)
+    per_turn = lambda seconds: seconds / max(len(corpus), 1) * 1e6
+    print(f"Legacy regex:  {per_turn(legacy_time):8.1f} us/turn")
+    print(f"Aho-Corasick:  {per_turn(automaton_time):8.1f} us/turn")
+    print(f"Speedup:       {legacy_time / automaton_time:8.1f}x")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Microbenchmark: system prompt assembly
+
+Compares the original f-string rebuild of get_system_prompt (recomputing the
+coaching tips for every call) with the cached-fragment version in api/prompts.py.
+
+Usage: python bench_prompts.py [iterations]
+"""
+
+import sys
+import os
+import timeit
+
+sys.path.append(os.getcwd())
+
+from api import prompts
+from api.prompts import get_system_prompt, precompile_system_prompts
+
+PROFILES = [
+    {"age": 25, "income": 30000, "savings": 1000},
+    {"age": 31, "income": 62000, "savings": 12000},
+    {"age": 45, "income": 80000, "savings": 45000},
+    {"age": 52, "income": 28000, "savings": 2500},
+    {"name": "Test User"},
+]
+MODES = ['goals', 'health', 'events']
+
+
+def legacy_advice(profile):
+    advice = []
+    age = profile.get('age')
+    income = profile.get('income')
+    savings = profile.get('savings', 0)
+    if age and isinstance(age, int) and 18 <= age < 40:
+        advice.append(prompts.ADVICE_LISA)
+    if income and isinstance(income, int) and income > 50270:
+        advice.append(prompts.ADVICE_TAX)
+    if savings < 3000:
+        advice.append(prompts.ADVICE_EMERGENCY)
+    elif savings > 20000:
+        advice.append(prompts.ADVICE_ISA)
+    if not advice:
+        return ""
+    return "PERSONALIZED COACHING TIPS (Mention these if relevant to user query):\\n" + "\\n".join(advice)
+
+
+def legacy_system_prompt(mode, financial_kb, scenario_kb, profile=None, current_date=None):
+    persona_prompt = prompts.get_persona_prompt(mode)
+    driver_advice = legacy_advice(profile) if profile else ""
+    date_context = f"CURRENT DATE: {current_date}" if current_date else ""
+    return f"""{prompts.BASE_INSTRUCTIONS}
+
+{date_context}
+
+
+{driver_advice}
+
+{persona_prompt}
+
+FINANCIAL KNOWLEDGE BASE:
+{financial_kb}
+
+SCENARIO INSTRUCTIONS (ID: [Required Params]):
+{scenario_kb}
+"""
+
+
+def load_kbs():
+    import json
+    with open('api/scenario_patterns.json', 'r') as f:
+        data = json.load(f)
+    scenario_kb = "\\n".join(f"- {sid}: {s.get('params', [])}" for scenarios in data.values() for sid, s in scenarios.items())
+    with open('api/financial_knowledge.json', 'r') as f:
+        kb_data = json.load(f)
+    financial_kb = "\\n".join(f"{topic}: {info.get('coach_tip', '')}" for topic, info in kb_data.items())
+    return financial_kb, scenario_kb
+
+
+def run(iterations):
+    financial_kb, scenario_kb = load_kbs()
+    precompile_system_prompts(financial_kb, scenario_kb)
+
+    cases = [(mode, profile) for mode in MODES for profile in PROFILES]
+    for mode, profile in cases:
+        assert legacy_system_prompt(mode, financial_kb, scenario_kb, profile, "2026-01-01") == \
+            get_system_prompt(mode, financial_kb, scenario_kb, profile, "2026-01-01"), "Cached prompt differs from legacy"
+
+    def legacy():
+        for mode, profile in cases:
+            legacy_system_prompt(mode, financial_kb, scenario_kb, profile, "2026-01-01")
+
+    def cached():
+        for mode, profile in cases:
+            get_system_prompt(mode, financial_kb, scenario_kb, profile, "2026-01-01")
+
+    legacy_time = min(timeit.repeat(legacy, number=iterations, repeat=5))
+    cached_time = min(timeit.repeat(cached, number=iterations, repeat=5))
+    calls = iterations * len(cases)
+
+    print(f"System prompt assembly ({calls} calls, prompt ~{len(get_system_prompt('goals', financial_kb, scenario_kb)):,} chars)")
+    print(f"  legacy f-string: {legacy_time / calls * 1e6:8.2f} µs/call")
+    print(f"  cached fragments: {cached_time / calls * 1e6:8.2f} µs/call")
+    print(f"  speedup: {legacy_time / cached_time:.1f}x")
+    print(f"  advice cache: {prompts._advice_for_bucket.cache_info()}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,117 @@
+"""
+Benchmark: BM25 prompt retrieval vs full knowledge base in the system prompt
+
+Measures prompt tokens per turn with the full scenario/KB sections and with
+only the top-k retrieved entries, using user messages from sessions.json as
+the query corpus. With --live it also times real completions in both modes
+(needs OPENAI_API_KEY; OPENAI_MODEL defaults to gpt-4o-mini).
+
+Usage: python bench_retrieval.py [--live N]
+"""
+
+import sys
+import os
+import json
+import time
+import statistics
+
+sys.path.append(os.getcwd())
+
+from api.prompts import (
+    RETRIEVED_KB_PLACEHOLDER, RETRIEVED_SCENARIOS_PLACEHOLDER, estimate_tokens, get_system_prompt
+)
+from api.retrieval import KnowledgeRetriever, render_financial_fact, render_scenario_line
+
+FALLBACK_QUERIES = [
+    "I want to save for a house deposit",
+    "300k",
+    "I'm planning a wedding next summer",
+    "What is the ISA limit?",
+    "I might lose my job, what happens?",
+    "Should I pay off my credit card or invest?",
+    "I'm inheriting £50k",
+]
+
+
+def load_sources():
+    with open('api/scenario_patterns.json', 'r') as f:
+        patterns = json.load(f)
+    with open('api/financial_knowledge.json', 'r') as f:
+        kb_data = json.load(f)
+    return patterns, kb_data
+
+
+def load_queries():
+    if not os.path.exists('sessions.json'):
+        return FALLBACK_QUERIES
+    with open('sessions.json', 'r') as f:
+        sessions = json.load(f)
+    queries = [m["content"] for history in sessions.values() for m in history if m["role"] == "user"]
+    return queries or FALLBACK_QUERIES
+
+
+def build_prompts(patterns, kb_data):
+    scenario_kb = "\\n".join(render_scenario_line(sid, s) for scenarios in patterns.values() for sid, s in scenarios.items())
+    financial_kb = "\\n".join(render_financial_fact(topic, info) for topic, info in kb_data.items())
+    full = get_system_prompt('goals', financial_kb, scenario_kb, current_date="2026-01-01")
+    lean = get_system_prompt('goals', RETRIEVED_KB_PLACEHOLDER, RETRIEVED_SCENARIOS_PLACEHOLDER, current_date="2026-01-01")
+    return full, lean
+
+
+def run_offline():
+    patterns, kb_data = load_sources()
+    retriever = KnowledgeRetriever(patterns, kb_data)
+    full, lean = build_prompts(patterns, kb_data)
+    queries = load_queries()
+
+    full_tokens = estimate_tokens(full)
+    lean_tokens = []
+    started = time.perf_counter()
+    blocks = [retriever.render(query) for query in queries]
+    retrieval_seconds = time.perf_counter() - started
+    for block in blocks:
+        lean_tokens.append(estimate_tokens(lean) + estimate_tokens(block))
+
+    print(f"Queries: {len(queries)} user messages")
+    print(f"  full KB prompt:   {full_tokens:6d} tokens/turn")
+    print(f"  retrieval prompt: {statistics.mean(lean_tokens):6.0f} tokens/turn (p95 {sorted(lean_tokens)[int(len(lean_tokens) * 0.95) - 1]})")
+    print(f"  reduction:        {100 * (1 - statistics.mean(lean_tokens) / full_tokens):5.1f}%")
+    print(f"  retrieval cost:   {retrieval_seconds / len(queries) * 1e6:6.1f} µs/turn")
+    return full, lean, retriever
+
+
+def run_live(samples, full, lean, retriever):
+    import asyncio
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI()
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    queries = FALLBACK_QUERIES[:samples]
+
+    async def timed(messages):
+        started = time.perf_counter()
+        await client.chat.completions.create(model=model, messages=messages, temperature=0.0)
+        return time.perf_counter() - started
+
+    async def main():
+        full_times, lean_times = [], []
+        for query in queries:
+            full_times.append(await timed([{"role": "system", "content": full}, {"role": "user", "content": query}]))
+            lean_times.append(await timed([
+                {"role": "system", "content": lean},
+                {"role": "system", "content": retriever.render(query)},
+                {"role": "user", "content": query},
+            ]))
+        print(f"Live end-to-end ({model}, {len(queries)} queries)")
+        print(f"  full KB:   {statistics.median(full_times) * 1000:7.0f} ms median")
+        print(f"  retrieval: {statistics.median(lean_times) * 1000:7.0f} ms median")
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    full, lean, retriever = run_offline()
+    if "--live" in sys.argv:
+        index = sys.argv.index("--live")
+        samples = int(sys.argv[index + 1]) if len(sys.argv) > index + 1 else len(FALLBACK_QUERIES)
+        run_live(samples, full, lean, retriever)
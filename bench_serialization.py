@@ -0,0 +1,108 @@
+"""
+Microbenchmark: /api/chat response serialization
+
+Compares the original path (hasattr chain into a validated ChatResponse,
+jsonable_encoder, stdlib json.dumps as FastAPI's JSONResponse does) with
+chat_payload() + orjson, for a typical turn and a large one (long reply,
+many params, a big customScenario).
+
+Usage: python bench_serialization.py [iterations]
+"""
+
+import sys
+import os
+import json
+import time
+
+sys.path.append(os.getcwd())
+
+from fastapi.encoders import jsonable_encoder
+
+from api.agent_service import AgentResponse, ChatResponse, ORJSONResponse, ScenarioAction, chat_payload
+
+
+class LegacyAgentResponse:
+    def __init__(self, message, profile_extracted=None, profile_complete=False, confidence=0.0,
+                 missing_fields=[], intent=None, params=None, customScenario=None, action=None,
+                 knowledge_version=None):
+        self.message = message
+        self.profileExtracted = profile_extracted
+        self.profileComplete = profile_complete
+        self.confidence = confidence
+        self.missingProfileFields = missing_fields
+        self.intent = intent
+        self.params = params
+        self.customScenario = customScenario
+        self.action = action
+        self.knowledgeVersion = knowledge_version
+
+
+def legacy_render(response_obj, session_id):
+    chat_response = ChatResponse(
+        message=response_obj.message,
+        sessionId=session_id,
+        profileExtracted=response_obj.profileExtracted if hasattr(response_obj, 'profileExtracted') else None,
+        profileComplete=response_obj.profileComplete if hasattr(response_obj, 'profileComplete') else False,
+        confidence=response_obj.confidence if hasattr(response_obj, 'confidence') else 0.0,
+        missingFields=response_obj.missingProfileFields if hasattr(response_obj, 'missingProfileFields') else [],
+        intent=response_obj.intent if hasattr(response_obj, 'intent') else None,
+        params=response_obj.params if hasattr(response_obj, 'params') else None,
+        customScenario=response_obj.customScenario if hasattr(response_obj, 'customScenario') else None,
+        action=response_obj.action if hasattr(response_obj, 'action') else None,
+        knowledgeVersion=response_obj.knowledgeVersion if hasattr(response_obj, 'knowledgeVersion') else None
+    )
+    content = jsonable_encoder(chat_response)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def new_render(response_obj, session_id):
+    return ORJSONResponse(chat_payload(response_obj, session_id)).body
+
+
+def cases():
+    params = {'propertyPrice': 300000, 'depositAmount': 30000, 'purchaseDate': '2028-01-01'}
+    typical = dict(
+        message="Great, a £300,000 home with a £30,000 deposit in January 2028. I've opened the planner for you.",
+        confidence=0.9, missing=['date'], intent='buy_home', params=params,
+        action=ScenarioAction(type="OPEN_CONFIG", scenarioId='buy_home', params=params), version='5d41402abc4b',
+    )
+    big_params = {f"param{i}": i * 1000.5 for i in range(200)}
+    large = dict(
+        message=("Here is a month-by-month breakdown of how your savings could grow. " * 300),
+        confidence=0.9, missing=[f"field{i}" for i in range(50)], intent='custom_goal', params=big_params,
+        action=ScenarioAction(type="OPEN_CONFIG", scenarioId='custom_goal', params=big_params), version='5d41402abc4b',
+        custom={'schedule': [{'month': m, 'balance': m * 512.25, 'note': 'contribution'} for m in range(360)]},
+    )
+    for name, case in (('typical', typical), ('large', large)):
+        legacy = LegacyAgentResponse(case['message'], confidence=case['confidence'], missing_fields=case['missing'],
+                                     intent=case['intent'], params=case['params'], customScenario=case.get('custom'),
+                                     action=case['action'], knowledge_version=case['version'])
+        new = AgentResponse(case['message'], confidence=case['confidence'], missingFields=case['missing'],
+                            intent=case['intent'], params=case['params'], customScenario=case.get('custom'),
+                            action=case['action'], knowledgeVersion=case['version'])
+        yield name, legacy, new
+
+
+def timed(fn, response_obj, iterations):
+    best = float('inf')
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(response_obj, "session-1")
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for name, legacy, new in cases():
+        legacy_body, new_body = legacy_render(legacy, "session-1"), new_render(new, "session-1")
+        assert json.loads(legacy_body) == json.loads(new_body), f"{name}: bodies differ"
+        legacy_us = timed(legacy_render, legacy, iterations)
+        new_us = timed(new_render, new, max(iterations, 1))
+        print(f"{name:8s} ({len(new_body):7,d} bytes)  legacy {legacy_us:9.1f} us   orjson {new_us:8.1f} us   "
+              f"{legacy_us / new_us:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import sys
+import os
+import io
+import json
+import contextlib
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import pattern_matcher
+from api.pattern_matcher import ScenarioPatternMatcher
+
+MESSAGES = ["We're getting married next summer", "hello", "I want a new car", "Buying a house with my S&S ISA"] * 50
+
+def test_match_many_matches_single_calls():
+    print("Testing match_many against match_scenario...")
+    matcher = ScenarioPatternMatcher()
+    expected = [matcher.match_scenario(text) for text in MESSAGES]
+
+    for workers in (1, 2):
+        results = list(matcher.match_many(iter(MESSAGES), workers=workers, chunk_size=7))
+        assert len(results) == len(MESSAGES)
+        actual = [(r.scenario_id, r.confidence) if r.scenario_id else None for r in results]
+        assert actual == expected, f"workers={workers} disagrees with match_scenario"
+    print("PASS: Same results in order, in-process and across workers")
+
+def test_cli_ndjson():
+    print("\nTesting CLI NDJSON output...")
+    stdin = io.StringIO('I want a new car\n{"id": 7, "text": "wedding next year"}\n\n')
+    stdout, stderr = io.StringIO(), io.StringIO()
+    sys.stdin = stdin
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            pattern_matcher.main([])
+    finally:
+        sys.stdin = sys.__stdin__
+
+    rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert len(rows) == 2, f"Blank lines should be skipped. Got: {rows}"
+    assert rows[1]['id'] == 7 and rows[1]['scenarioId'] == 'marriage', rows[1]
+    assert 'msgs/sec' in stderr.getvalue(), "Throughput not reported"
+    print("PASS: One JSON object per message")
+
+if __name__ == "__main__":
+    try:
+        test_match_many_matches_single_calls()
+        test_cli_ndjson()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,147 @@
+import sys
+import os
+import asyncio
+import tempfile
+import time
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api.agent_service import AIAgent, app
+from api.cancellation import ClientDisconnected, DeadlineExceeded, cancel_on_disconnect
+
+class SlowCompletions:
+    """Stands in for client.chat.completions: answers "Reply N" after a delay and records what it was sent."""
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+        self.cancelled = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs["messages"])
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        message = SimpleNamespace(content=f"Reply {len(self.calls)}", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def make_agent(delay):
+    agent = AIAgent(api_key="test")
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SlowCompletions(delay)))
+    agent.sessions, agent.session_state = {}, {}
+    temp_dir = tempfile.mkdtemp()
+    agent.session_file = os.path.join(temp_dir, 'sessions.json')
+    agent.session_state_file = os.path.join(temp_dir, 'session_state.json')
+    return agent
+
+def seed(agent, session_id):
+    """Give the session one committed turn and return a copy of its history."""
+    asyncio.run(agent.processUserInput("Hello", session_id, context={}))
+    return [dict(m) for m in agent.sessions[session_id]]
+
+def test_deadline_returns_504():
+    print("Testing the chat deadline...")
+    agent = make_agent(delay=0.01)
+    history = seed(agent, "s1")
+    agent.client.chat.completions.delay = 5
+
+    started = time.monotonic()
+    try:
+        asyncio.run(agent.processUserInput("Still there?", "s1", context={}, deadline=time.monotonic() + 0.1))
+        assert False, "Expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 2, "Deadline not enforced"
+    assert agent.sessions["s1"] == history, "Timed-out turn must leave the history untouched"
+
+    app.state.ai_agent = agent
+    try:
+        response = TestClient(app).post("/api/chat", json={"message": "Still there?", "sessionId": "s1"},
+                                        headers={"X-Request-Timeout": "0.1"})
+    finally:
+        del app.state.ai_agent
+    assert response.status_code == 504, response.status_code
+    assert agent.sessions["s1"] == history
+    print("PASS: 504 after the deadline, history untouched")
+
+def test_disconnect_cancels_turn():
+    print("\nTesting client disconnect...")
+    agent = make_agent(delay=0.01)
+    history = seed(agent, "s1")
+    agent.client.chat.completions.delay = 5
+
+    class GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    async def main():
+        await cancel_on_disconnect(GoneRequest(), agent.processUserInput("Still there?", "s1", context={}))
+
+    try:
+        asyncio.run(main())
+        assert False, "Expected ClientDisconnected"
+    except ClientDisconnected:
+        pass
+    assert agent.client.chat.completions.cancelled == 1, "Upstream call should be cancelled"
+    assert agent.sessions["s1"] == history, "Cancelled turn must leave the history untouched"
+    print("PASS: Upstream call cancelled, history untouched")
+
+def test_same_session_turns_serialize():
+    print("\nTesting concurrent turns on one session...")
+    agent = make_agent(delay=0.05)
+
+    async def main():
+        # A brand-new session: both turns would otherwise create it and the second would overwrite the first
+        await asyncio.gather(*(agent.processUserInput(text, "new", context={}) for text in ("First", "Second")))
+
+    asyncio.run(main())
+    history = agent.sessions["new"]
+    assert [m["role"] for m in history] == ["system", "user", "assistant", "user", "assistant"], history
+    assert [m["content"] for m in history[1:]] == ["First", "Reply 1", "Second", "Reply 2"]
+    second_call = agent.client.chat.completions.calls[1]
+    assert [m["content"] for m in second_call[1:]] == ["First", "Reply 1", "Second"], "Second turn must see the first"
+    assert not agent._session_locks and not agent._session_lock_users, "Locks must not outlive their turns"
+    print("PASS: Turns ran one after the other")
+
+def test_session_locks_are_dropped():
+    print("\nTesting that session locks don't pile up...")
+    agent = make_agent(delay=0.01)
+
+    async def main():
+        await asyncio.gather(*(agent.processUserInput("Hi", f"fresh-{i}", context={}) for i in range(20)))
+        # A turn that times out waiting behind another still gives up its share of the lock
+        agent.client.chat.completions.delay = 0.3
+        slow = asyncio.create_task(agent.processUserInput("Slow", "busy", context={}))
+        await asyncio.sleep(0.01)
+        try:
+            await agent.processUserInput("Waiting", "busy", context={}, deadline=time.monotonic() + 0.05)
+            assert False, "Expected DeadlineExceeded"
+        except DeadlineExceeded:
+            pass
+        assert "busy" in agent._session_locks and agent._session_lock_users["busy"] == 1, "Held lock must stay"
+        await slow
+
+    asyncio.run(main())
+    assert len(agent.sessions) == 21
+    assert agent._session_locks == {} and agent._session_lock_users == {}, agent._session_locks
+    print("PASS: No lock left once every turn is done")
+
+if __name__ == "__main__":
+    try:
+        test_deadline_returns_504()
+        test_disconnect_cancels_turn()
+        test_same_session_turns_serialize()
+        test_session_locks_are_dropped()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
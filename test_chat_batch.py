@@ -0,0 +1,62 @@
+import sys
+import os
+import asyncio
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.chat_batch import run_batch
+
+def collect(items, run_turn, concurrency):
+    async def main():
+        return [result async for result in run_batch(items, run_turn, concurrency)]
+    return asyncio.run(main())
+
+def test_order_and_concurrency():
+    print("Testing per-session order and the concurrency bound...")
+    seen, in_flight, peak = {}, [0], [0]
+
+    async def run_turn(index, item):
+        session_id, delay = item
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(delay)
+        in_flight[0] -= 1
+        seen.setdefault(session_id, []).append(index)
+        return {"index": index, "status": 200}
+
+    # Early turns of session a are slow, so results complete out of submission order
+    items = [(f"s{i % 4}", (f"s{i % 4}", 0.03 if i < 4 else 0.001)) for i in range(20)]
+    results = collect(items, run_turn, concurrency=3)
+    assert sorted(r["index"] for r in results) == list(range(20))
+    assert [r["index"] for r in results] != list(range(20)), "Results should stream as they complete"
+    for session_id, indices in seen.items():
+        assert indices == sorted(indices), f"{session_id} ran out of order: {indices}"
+    assert peak[0] <= 3, f"{peak[0]} turns in flight"
+    print(f"PASS: 20 turns, peak {peak[0]} in flight")
+
+def test_failures_are_reported_per_item():
+    print("\nTesting a failing turn...")
+
+    async def run_turn(index, item):
+        if index == 1:
+            raise RuntimeError("boom")
+        return {"index": index, "status": 200}
+
+    results = {r["index"]: r for r in collect([("s", None)] * 3, run_turn, concurrency=2)}
+    assert results[1] == {"index": 1, "status": 500, "error": "RuntimeError: boom"}
+    assert results[2]["status"] == 200, "Later turns of the session still run"
+    print("PASS: Failure isolated")
+
+if __name__ == "__main__":
+    try:
+        test_order_and_concurrency()
+        test_failures_are_reported_per_item()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,65 @@
+import sys
+import os
+import json
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api.agent_service import AgentResponse, ChatResponse, ORJSONResponse, ScenarioAction, app, chat_payload
+
+PARAMS = {'propertyPrice': 300000, 'depositAmount': 30000.5, 'purchaseDate': '2028-01-01'}
+
+def responses():
+    yield AgentResponse("I encountered an error: boom")
+    yield AgentResponse(
+        "A £300,000 home — I've opened the planner.", confidence=0.9, missingFields=['purchaseDate'],
+        intent='buy_home', params=PARAMS, customScenario={'schedule': [{'month': 1, 'balance': 512.25}]},
+        action=ScenarioAction(type="OPEN_CONFIG", scenarioId='buy_home', params=PARAMS),
+        knowledgeVersion='5d41402abc4b', serviceMode='full',
+    )
+
+def test_payload_matches_response_model():
+    print("Testing chat_payload against ChatResponse...")
+    for response_obj in responses():
+        payload = chat_payload(response_obj, "s1")
+        assert set(payload) == set(ChatResponse.model_fields), set(payload) ^ set(ChatResponse.model_fields)
+        validated = ChatResponse.model_validate(payload)
+        # The fast path must send exactly what response_model serialization would
+        body = json.loads(ORJSONResponse(payload).body)
+        assert body == validated.model_dump(mode='json'), body
+    print("PASS: Payloads validate and serialize like the model")
+
+def test_chat_endpoint_body():
+    print("\nTesting the /api/chat body...")
+
+    class StubAgent:
+        async def processUserInput(self, user_input, session_id, context, mode="goals", deadline=None):
+            return list(responses())[1]
+
+    app.state.ai_agent = StubAgent()
+    try:
+        response = TestClient(app).post("/api/chat", json={"message": "Buying a house", "sessionId": "s1"})
+    finally:
+        del app.state.ai_agent
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body == ChatResponse.model_validate(body).model_dump(mode='json')
+    assert body['action'] == {'type': 'OPEN_CONFIG', 'scenarioId': 'buy_home', 'params': PARAMS}
+    assert body['sessionId'] == "s1" and body['trace'] is None
+    print("PASS: Endpoint body is a valid ChatResponse")
+
+if __name__ == "__main__":
+    try:
+        test_payload_matches_response_model()
+        test_chat_endpoint_body()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import random
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.extraction import extract, extract_amount
+
+def test_amounts():
+    print("Testing amount extraction...")
+    cases = {
+        "I need £1.5m for a house": 1500000,
+        "budget is 300K": 300000,
+        "about £300,000": 300000,
+        "save 5000": 5000,
+        "target of £12,500": 12500,
+        "15 grand": 15000,
+        "£5k now and 2m later": 2000000,  # millions win, as before
+        "5 kids": None,
+        "in 3 years and 1 month": None,  # was misread as £1m
+        "£500": None,
+    }
+    for text, expected in cases.items():
+        assert extract_amount(text) == expected, f"{text!r}: {extract_amount(text)} != {expected}"
+
+    amounts = extract("save £500 a month and £2k per year, 50 pm").amounts
+    assert [(a.value, a.period) for a in amounts] == [(500, 'month'), (2000, 'year'), (50, 'month')], amounts
+    labels = [a.label for a in extract("Buying a house for 300k with a 30k deposit").amounts]
+    assert labels == [('a', 'house', 'for'), ('a', 'deposit')], labels
+    print("PASS: Amounts extracted")
+
+def test_durations_and_dates():
+    print("\nTesting durations and dates...")
+    result = extract("Wedding on 2027-06-01, or June 2028, saving for 18 months starting next year")
+    assert [d.text for d in result.dates] == ['2027-06-01', 'June 2028', 'next year'], result.dates
+    assert [d.months for d in result.durations] == [18], result.durations
+    assert extract("I may buy a car").dates == (), "'may' on its own is the verb"
+    assert [d.months for d in extract("in 2 years").durations] == [24]
+    print("PASS: Durations and dates extracted")
+
+def test_fuzz_pathological_inputs():
+    print("\nFuzzing pathological inputs...")
+    alphabet = ['1', '9', '0', ',', '.', '£', 'k', 'm', ' ', '/', '-', 'a', 'month', 'year', 'save ', 'in ', 'june ', '\n']
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        result = extract(text)
+        assert result.amount is None or isinstance(result.amount, int)
+        assert all(0 <= a.start < max(len(text), 1) for a in result.amounts)
+
+    # Long runs must stay linear (no catastrophic backtracking)
+    for text in ["1," * 20000, "£" * 40000, "9" * 40000 + "k", "save " * 10000, "1.1." * 10000, "in 1 " * 10000]:
+        started = time.perf_counter()
+        extract(text)
+        elapsed = time.perf_counter() - started
+        assert elapsed < 0.5, f"{text[:10]!r}... took {elapsed:.2f}s"
+    print("PASS: 3000 random and 6 pathological inputs handled")
+
+if __name__ == "__main__":
+    try:
+        test_amounts()
+        test_durations_and_dates()
+        test_fuzz_pathological_inputs()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.intent_schema import build_intent_tool, parse_intent_tool_call, split_param_hint
+
+def load_patterns():
+    with open('api/scenario_patterns.json', 'r') as f:
+        return json.load(f)
+
+def tool_message(name, arguments):
+    call = SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+    return SimpleNamespace(content=None, tool_calls=[call])
+
+def test_tool_schema():
+    print("Testing open_config tool schema...")
+    tool = build_intent_tool(load_patterns())
+    branches = {branch['properties']['scenarioId']['const']: branch
+                for branch in tool['function']['parameters']['oneOf']}
+    patterns = load_patterns()
+    assert set(branches) == {sid for theme in patterns.values() for sid in theme}, "One branch per scenario"
+
+    def params(scenario_id):
+        return branches[scenario_id]['properties']['params']
+
+    assert params('childbirth')['properties']['due_date']['format'] == 'date', params('childbirth')
+    assert params('apply_mortgage')['properties']['loan_amount']['type'] == 'number', params('apply_mortgage')
+    assert 'total_settlement_cost' in params('divorce')['properties'], "Param hint was not stripped from name"
+    assert 'direction' in params('custom_goal')['properties'], "custom_goal extras missing"
+    assert 'direction' not in params('buy_home')['properties'], "custom_goal extras leaked into other scenarios"
+    # Each branch lists only its own scenario's params and accepts nothing else
+    for scenario_id, config in ((sid, c) for theme in patterns.values() for sid, c in theme.items()):
+        own = {split_param_hint(raw)[0] for raw in config.get('params', [])}
+        listed = set(params(scenario_id)['properties'])
+        assert own <= listed and not (listed - own - {'direction', 'frequency', 'monthlyAmount'}), scenario_id
+        assert params(scenario_id)['additionalProperties'] is False
+        assert branches[scenario_id]['required'] == ['scenarioId', 'params']
+    print("PASS: One typed branch per scenario")
+
+def test_split_param_hint():
+    print("\nTesting param hint parsing...")
+    assert split_param_hint('monthly_income_lost (if annual divide by 12)') == ('monthly_income_lost', 'if annual divide by 12')
+    assert split_param_hint('amount') == ('amount', '')
+    print("PASS: Param hints split")
+
+def test_parse_tool_call():
+    print("\nTesting tool call parsing...")
+    message = tool_message('open_config', json.dumps({'scenarioId': 'buy_home', 'params': {'amount': 300000}}))
+    assert parse_intent_tool_call(message) == ('buy_home', {'amount': 300000})
+
+    assert parse_intent_tool_call(tool_message('open_config', '{not json')) is None, "Malformed arguments should be ignored"
+    assert parse_intent_tool_call(tool_message('other_tool', '{}')) is None, "Unknown tools should be ignored"
+    assert parse_intent_tool_call(SimpleNamespace(content="Hi", tool_calls=None)) is None
+    print("PASS: Tool calls parsed")
+
+if __name__ == "__main__":
+    try:
+        test_tool_schema()
+        test_split_param_hint()
+        test_parse_tool_call()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
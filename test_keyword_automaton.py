@@ -0,0 +1,70 @@
+import sys
+import os
+import re
+import json
+import random
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.keyword_automaton import KeywordAutomaton
+from api.pattern_matcher import ScenarioPatternMatcher
+
+def regex_hits(text, keywords):
+    """Reference semantics: the matcher's original per-keyword regex search."""
+    return {k for k in keywords if re.search(r'\b' + re.escape(k) + r'\b', text, re.IGNORECASE)}
+
+def test_word_boundaries():
+    print("Testing word boundaries...")
+    automaton = KeywordAutomaton(['isa', 's&s isa', 'car', '25% tax free', 'self-employed'])
+    assert automaton.find("My S&S ISA and a car.") == {'isa', 's&s isa', 'car'}
+    assert automaton.find("carpet in my isas") == set(), "Partial words must not match"
+    assert automaton.find("take 25% tax free") == {'25% tax free'}
+    assert automaton.find("I'm SELF-EMPLOYED") == {'self-employed'}
+    print("PASS: Boundaries match regex semantics")
+
+def test_fuzz_against_regex():
+    print("\nFuzzing against the regex reference...")
+    with open('api/scenario_patterns.json', 'r') as f:
+        patterns = json.load(f)
+    keywords = sorted({k for scenarios in patterns.values() for config in scenarios.values() for k in config['keywords']})
+    automaton = KeywordAutomaton(keywords)
+    fillers = [' ', '  ', '-', '_', '.', ',', '&', '%', 'x', '2', 'é', 'İ', '\n']
+    rng = random.Random(42)
+
+    for _ in range(2000):
+        parts = []
+        for _ in range(rng.randint(1, 5)):
+            keyword = rng.choice(keywords)
+            if rng.random() < 0.3:
+                keyword = keyword.upper()
+            if rng.random() < 0.3 and len(keyword) > 2:
+                keyword = keyword[:rng.randint(1, len(keyword) - 1)]
+            parts.append(keyword)
+            parts.append(''.join(rng.choice(fillers) for _ in range(rng.randint(0, 2))))
+        text = ''.join(parts)
+        assert automaton.find(text) == regex_hits(text, keywords), f"Mismatch on {text!r}"
+    print("PASS: 2000 random texts agree")
+
+def test_duplicate_keywords_still_count_twice():
+    print("\nTesting duplicate keyword scoring...")
+    matcher = ScenarioPatternMatcher({'theme': {
+        'dup': {'keywords': ['boat', 'boat'], 'params': []},
+        'single': {'keywords': ['boat'], 'params': []},
+    }})
+    assert matcher.match_scenario("buy a boat") == ('dup', 0.7), "Duplicate keywords count as two matches"
+    print("PASS: Scores unchanged")
+
+if __name__ == "__main__":
+    try:
+        test_word_boundaries()
+        test_fuzz_against_regex()
+        test_duplicate_keywords_still_count_twice()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
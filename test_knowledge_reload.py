@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import knowledge
+from api.pattern_matcher import get_matcher
+
+ORIGINAL_FILES = (knowledge.SCENARIO_PATTERNS_FILE, knowledge.FINANCIAL_KB_FILE)
+
+def use_temp_copies():
+    """Point the store at copies of the KB files so the test can edit them."""
+    temp_dir = Path(tempfile.mkdtemp())
+    shutil.copy(ORIGINAL_FILES[0], temp_dir / 'scenario_patterns.json')
+    shutil.copy(ORIGINAL_FILES[1], temp_dir / 'financial_knowledge.json')
+    knowledge.SCENARIO_PATTERNS_FILE = temp_dir / 'scenario_patterns.json'
+    knowledge.FINANCIAL_KB_FILE = temp_dir / 'financial_knowledge.json'
+    return temp_dir
+
+def test_reload_swaps_snapshot():
+    print("Testing knowledge reload...")
+    temp_dir = use_temp_copies()
+    store = knowledge.KnowledgeStore()
+    old = store.current
+    assert old.matcher.match_scenario("I want to buy a yacht") is None
+
+    with open(temp_dir / 'scenario_patterns.json', 'r') as f:
+        patterns = json.load(f)
+    patterns[next(iter(patterns))]['buy_yacht'] = {'keywords': ['yacht'], 'params': ['amount']}
+    with open(temp_dir / 'scenario_patterns.json', 'w') as f:
+        json.dump(patterns, f)
+    os.utime(temp_dir / 'scenario_patterns.json', ns=(0, 0))  # mtime changes even on coarse clocks
+    assert store.changed(), "Edit not detected"
+
+    snapshot = store.reload()
+    assert snapshot.version != old.version
+    assert store.current is snapshot and not store.changed()
+    assert snapshot.matcher.match_scenario("I want to buy a yacht")[0] == 'buy_yacht'
+    assert "buy_yacht" in snapshot.knowledge_base_prompt
+    assert get_matcher() is snapshot.matcher, "Global matcher not swapped"
+    assert old.matcher.match_scenario("I want to buy a yacht") is None, "Old snapshot must stay untouched"
+    assert knowledge.KnowledgeStore().current.version == snapshot.version, "Same files must give the same version"
+    print("PASS: New snapshot swapped in")
+    knowledge.SCENARIO_PATTERNS_FILE, knowledge.FINANCIAL_KB_FILE = ORIGINAL_FILES
+
+def test_broken_file_keeps_current():
+    print("\nTesting reload of a broken file...")
+    temp_dir = use_temp_copies()
+    store = knowledge.KnowledgeStore()
+    current = store.current
+    with open(temp_dir / 'financial_knowledge.json', 'w') as f:
+        f.write('{broken')
+
+    try:
+        store.reload()
+        assert False, "Reload of invalid JSON should raise"
+    except ValueError:
+        pass
+    assert store.current is current, "Broken reload must keep the live snapshot"
+    assert not store.changed(), "Broken edit should not be retried until the next change"
+    print("PASS: Live snapshot kept")
+    knowledge.SCENARIO_PATTERNS_FILE, knowledge.FINANCIAL_KB_FILE = ORIGINAL_FILES
+
+if __name__ == "__main__":
+    try:
+        test_reload_swaps_snapshot()
+        test_broken_file_keeps_current()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import queue
+import asyncio
+import logging
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import metrics
+from api.logs import ContextFilter, JsonFormatter, NonBlockingQueueHandler, bind, sampled
+
+def make_logger(name, sample_rate=1.0, size=100):
+    handler = NonBlockingQueueHandler(queue.Queue(size))
+    handler.addFilter(ContextFilter(sample_rate))
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger, handler.queue
+
+def drain(records):
+    out = []
+    while not records.empty():
+        out.append(records.get_nowait())
+    return out
+
+def test_ids_per_task():
+    print("Testing request/session ids on records...")
+    logger, records = make_logger("test_logs.ids")
+
+    async def turn(request, session):
+        bind(request, session)
+        await asyncio.sleep(0)
+        logger.info("turn done")
+
+    async def main():
+        await asyncio.gather(turn("r1", "s1"), turn("r2", "s2"))
+    asyncio.run(main())
+    stamped = sorted((r.request_id, r.session_id) for r in drain(records))
+    assert stamped == [("r1", "s1"), ("r2", "s2")], stamped
+    print("PASS: Each task logs its own ids")
+
+def test_debug_sampling():
+    print("\nTesting debug sampling...")
+    assert sampled("abc", 0.5) == sampled("abc", 0.5), "Sampling must be stable per request"
+    kept = sum(sampled(f"req-{i}", 0.1) for i in range(10000))
+    assert 700 < kept < 1300, kept
+    logger, records = make_logger("test_logs.sampling", sample_rate=0.0)
+
+    async def turn():
+        bind("r-debug")
+        logger.debug("per-turn detail")
+        logger.warning("always kept")
+    asyncio.run(turn())
+    assert [r.levelname for r in drain(records)] == ["WARNING"]
+    print("PASS: Debug records sampled, warnings kept")
+
+def test_full_queue_drops():
+    print("\nTesting that a full queue drops instead of blocking...")
+    metrics.reset()
+    logger, records = make_logger("test_logs.full", size=2)
+    for i in range(5):
+        logger.info("record %s", i)
+    assert records.qsize() == 2
+    assert metrics.get('log_records_dropped_total') == 3
+    print("PASS: Records dropped and counted")
+
+def test_json_format():
+    print("\nTesting JSON lines...")
+    logger, records = make_logger("test_logs.json")
+
+    async def turn():
+        bind("r9", "s9")
+        logger.info("Intent %s", "buy_home", extra={"scenario": "buy_home"})
+    asyncio.run(turn())
+    entry = json.loads(JsonFormatter().format(drain(records)[0]))
+    assert entry["message"] == "Intent buy_home" and entry["level"] == "INFO"
+    assert entry["requestId"] == "r9" and entry["sessionId"] == "s9" and entry["scenario"] == "buy_home", entry
+    print("PASS: JSON lines")
+
+if __name__ == "__main__":
+    try:
+        test_ids_per_task()
+        test_debug_sampling()
+        test_full_queue_drops()
+        test_json_format()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
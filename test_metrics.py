@@ -0,0 +1,68 @@
+import sys
+import os
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import metrics
+
+def test_histogram_buckets():
+    print("Testing histogram buckets...")
+    metrics.reset()
+    for value in (0.0005, 0.001, 0.3, 120.0):
+        metrics.observe('stage_seconds', value, stage='upstream')
+    text = metrics.render_prometheus()
+    assert '# TYPE stage_seconds histogram' in text
+    # Buckets are cumulative and inclusive of their upper bound
+    assert 'stage_seconds_bucket{stage="upstream",le="0.001"} 2' in text
+    assert 'stage_seconds_bucket{stage="upstream",le="0.5"} 3' in text
+    assert 'stage_seconds_bucket{stage="upstream",le="60"} 3' in text
+    assert 'stage_seconds_bucket{stage="upstream",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="upstream"} 4' in text
+    snapshot = metrics.snapshot()
+    assert snapshot['stage_seconds_count{stage="upstream"}'] == 4
+    assert abs(snapshot['stage_seconds_sum{stage="upstream"}'] - 120.3015) < 1e-9
+    print("PASS: Histogram buckets")
+
+def test_stage_timer():
+    print("\nTesting per-request stage timing...")
+    metrics.reset()
+    stages = metrics.StageTimer('chat_stage_seconds')
+    with stages.stage('matching'):
+        pass
+    with stages.stage('matching'):
+        pass
+    stages.add('upstream', 1.5)
+    stages.observe()
+    snapshot = metrics.snapshot()
+    # A stage that runs twice in one request is still one observation
+    assert snapshot['chat_stage_seconds_count{stage="matching"}'] == 1
+    assert snapshot['chat_stage_seconds_sum{stage="upstream"}'] == 1.5
+    print("PASS: Stage timing")
+
+def test_exposition_format():
+    print("\nTesting the text exposition format...")
+    metrics.reset()
+    metrics.inc('chat_requests_total', status=200)
+    metrics.inc('rate_limited_total', limit='say "hi"\n')
+    metrics.register_collector(lambda: [('chat_sessions', 'gauge', {}, 3)])
+    lines = metrics.render_prometheus().splitlines()
+    assert lines.count('# TYPE chat_requests_total counter') == 1
+    assert 'chat_requests_total{status="200"} 1' in lines
+    assert 'rate_limited_total{limit="say \\"hi\\"\\n"} 1' in lines, lines
+    assert '# TYPE chat_sessions gauge' in lines and 'chat_sessions 3' in lines
+    print("PASS: Exposition format")
+
+if __name__ == "__main__":
+    try:
+        test_histogram_buckets()
+        test_stage_timer()
+        test_exposition_format()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
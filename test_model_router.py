@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.model_router import (
+    TIER_FAST, TIER_FULL, TURN_ADVICE, TURN_NEW_TOPIC, TURN_SLOT_ANSWER,
+    classify_turn, last_assistant_message, tier_for_turn
+)
+
+def test_slot_answers():
+    print("Testing slot answer classification...")
+    question = "Great choice! What's your budget for the wedding?"
+    assert classify_turn("150k", question, None, True) == TURN_SLOT_ANSWER
+    assert classify_turn("2 years", question, None, False) == TURN_SLOT_ANSWER
+    assert classify_turn("Yes", "Is that a monthly amount?", None, False) == TURN_SLOT_ANSWER
+    print("PASS: Short answers to a question are slot answers")
+
+def test_other_turns():
+    print("\nTesting new topic / advice classification...")
+    question = "What's your budget?"
+    assert classify_turn("I also want to buy a car", question, "buy_vehicle", False) == TURN_NEW_TOPIC
+    assert classify_turn("what about ISAs?", question, None, False) == TURN_ADVICE
+    assert classify_turn("150k", None, None, True) == TURN_ADVICE, "No previous question means no slot to fill"
+    assert classify_turn("150k", "Sounds good.", None, True) == TURN_ADVICE
+    print("PASS: New topics and advice stay on the full model")
+
+def test_tiers():
+    print("\nTesting tier selection...")
+    assert tier_for_turn(TURN_SLOT_ANSWER, True) == TIER_FAST
+    assert tier_for_turn(TURN_SLOT_ANSWER, False) == TIER_FULL
+    assert tier_for_turn(TURN_ADVICE, True) == TIER_FULL
+    history = [{"role": "system", "content": "x"}, {"role": "assistant", "content": "When?"}, {"role": "user", "content": "soon"}]
+    assert last_assistant_message(history) == "When?"
+    print("PASS: Tiers selected")
+
+if __name__ == "__main__":
+    try:
+        test_slot_answers()
+        test_other_turns()
+        test_tiers()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
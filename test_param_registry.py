@@ -0,0 +1,114 @@
+import sys
+import os
+import json
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import metrics
+from api.intent_schema import split_param_hint
+from api.param_registry import ParamRegistry, coerce, parse_scalar
+from api.slots import missing_fields
+
+with open('api/scenario_patterns.json', 'r') as f:
+    REGISTRY = ParamRegistry(json.load(f))
+
+def test_frontend_keys():
+    print("Testing frontend key mapping...")
+    assert REGISTRY.normalize('buy_home', {'amount': '300k', 'date': '2028-01-01'}) == \
+        {'propertyPrice': 300000, 'purchaseDate': '2028-01-01'}
+    assert REGISTRY.normalize('marriage', {'budget': '20k', 'weddingDate': '2027-06-01'}) == \
+        {'totalBudget': 20000, 'weddingDate': '2027-06-01'}
+    # String overrides: the single amount goes to the scenario's key
+    assert REGISTRY.normalize('buy_vehicle', {'targetAmount': 15000}) == {'totalCost': 15000}
+    assert REGISTRY.normalize('divorce', {'total_settlement_cost': '40k'}) == {'settlementCost': 40000}
+    # No override: generic names become targetAmount, pattern names are kept
+    assert REGISTRY.normalize('inheritance', {'cost': '5000', 'receipt_date': '2027-01-01'}) == \
+        {'targetAmount': 5000, 'receipt_date': '2027-01-01'}
+    # The pattern file's own names reach the override keys too
+    assert REGISTRY.normalize('tax_bill', {'tax_amount': '2,500'}) == {'billAmount': 2500}
+    print("PASS: Frontend keys")
+
+def test_collisions_keep_the_best_source():
+    print("\nTesting competing names for one key...")
+    # An explicit targetAmount beats a generic 'amount', which keeps its own name
+    assert REGISTRY.normalize('sell_asset', {'amount': 1, 'targetAmount': 2}) == {'amount': 1, 'saleProceeds': 2}
+    # Earlier generic names win over later ones
+    assert REGISTRY.normalize('custom_goal', {'total': 1, 'cost': 2}) == {'total': 1, 'targetAmount': 2}
+    print("PASS: Collisions")
+
+def test_types_and_units():
+    print("\nTesting type coercion...")
+    assert REGISTRY.normalize('apply_mortgage', {'loan_amount': '£250,000', 'interest_rate': '4.5%', 'term_years': '25 years'}) == \
+        {'loan_amount': 250000, 'interest_rate': 4.5, 'term_years': 25}
+    assert REGISTRY.normalize('sabbatical', {'duration_months': '1 year'}) == {'duration_months': 12}
+    assert REGISTRY.normalize('custom_goal', {'name': 'Car', 'type': 'debt', 'target_amount': '1.5m'}) == \
+        {'scenarioName': 'Car', 'direction': 'debt', 'targetAmount': 1500000}
+    assert coerce('purchaseDate', '2028-01-01', 'date') == '2028-01-01'
+    assert coerce('purchaseDate', 2028, 'date') == 2028, "A bare year is not a purchase date"
+    assert coerce('purchaseDate', 'someday', 'date') == 'someday', "Unresolvable values pass through"
+    assert parse_scalar('monthly') == 'monthly'
+    assert parse_scalar('12.5') == 12.5
+    print("PASS: Types and units")
+
+def test_validation_models():
+    print("\nTesting per-scenario validation...")
+    metrics.reset()
+    params, invalid = REGISTRY.validate('buy_home', {'propertyPrice': 300000, 'purchaseDate': '2028-01-01', 'note': 'x'})
+    assert params == {'propertyPrice': 300000, 'purchaseDate': '2028-01-01', 'note': 'x'}, params
+    assert invalid == []
+    params, invalid = REGISTRY.validate('marriage', REGISTRY.normalize('marriage', {'amount': '-5k', 'date': 'someday'}))
+    assert params == {} and invalid == ['totalBudget', 'weddingDate'], (params, invalid)
+    assert REGISTRY.model('marriage') is REGISTRY.model('marriage'), "Models are built once per scenario"
+    assert REGISTRY.validate('apply_mortgage', {'interest_rate': 450})[1] == ['interest_rate']
+    assert REGISTRY.validate('custom_goal', {'scenarioName': 2028}) == ({'scenarioName': '2028'}, []), "Numbers are valid text"
+    # Missing and invalid params are reported under the frontend's keys
+    slots = {'scenarioId': 'marriage', 'filled': {'date': '2027-06-01'}}
+    assert missing_fields(slots, {'marriage': ['amount', 'date']}, ['totalBudget', 'weddingDate'], REGISTRY) == \
+        ['totalBudget', 'weddingDate']
+    assert missing_fields(slots, {'marriage': ['amount', 'date']}, [], REGISTRY) == ['totalBudget']
+    assert REGISTRY.frontend_key('apply_mortgage', 'term_years') == 'termYears'
+    assert REGISTRY.frontend_key('refinance_mortgage', 'term_years') is None, "Not on that scenario's screen"
+    assert metrics.get('param_validations_total', outcome='invalid') == 2
+    assert metrics.get('param_validation_seconds_total') > 0
+    print("PASS: Validation models")
+
+def test_missing_fields_are_screen_fields():
+    print("\nTesting missingFields against every config screen...")
+    with open('api/scenario_patterns.json', 'r') as f:
+        patterns = json.load(f)
+    with open('api/scenario_labels.json', 'r', encoding='utf-8') as f:
+        screens = {sid: set(labels['fields']) for sid, labels in json.load(f).items()}
+    scenario_params = {sid: [split_param_hint(p)[0] for p in config.get('params', [])]
+                       for theme in patterns.values() for sid, config in theme.items()}
+    for scenario_id, params in scenario_params.items():
+        empty = {'scenarioId': scenario_id, 'filled': {}}
+        missing = missing_fields(empty, scenario_params, [], REGISTRY)
+        assert set(missing) <= screens[scenario_id], f"{scenario_id}: {set(missing) - screens[scenario_id]}"
+        # Invalid params are reported by screen field too, whatever name they arrived under
+        invalid = list(REGISTRY.normalize(scenario_id, {p: 'not a value' for p in params}))
+        missing = missing_fields(empty, scenario_params, invalid + ['made_up'], REGISTRY)
+        assert set(missing) <= screens[scenario_id], f"{scenario_id}: {set(missing) - screens[scenario_id]}"
+    empty = lambda sid: {'scenarioId': sid, 'filled': {}}
+    assert missing_fields(empty('childbirth'), scenario_params, [], REGISTRY) == ['dueDate', 'oneOffCosts']
+    assert missing_fields(empty('apply_mortgage'), scenario_params, [], REGISTRY) == ['loanAmount', 'interestRate', 'termYears']
+    assert missing_fields(empty('house_deposit_fund'), scenario_params, [], REGISTRY) == ['targetAmount', 'targetDate']
+    assert missing_fields(empty('buy_vehicle'), scenario_params, [], REGISTRY) == ['totalCost', 'purchaseDate']
+    assert missing_fields(empty('tax_bill'), scenario_params, [], REGISTRY) == ['billAmount', 'billDate']
+    print("PASS: Only fields the screens show")
+
+if __name__ == "__main__":
+    try:
+        test_frontend_keys()
+        test_collisions_keep_the_best_source()
+        test_types_and_units()
+        test_validation_models()
+        test_missing_fields_are_screen_fields()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,98 @@
+import sys
+import os
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api.agent_service import AIAgent, app
+from api.prompts import get_system_prompt
+from api.prompt_profiler import profile_session, profile_store, split_system_prompt
+
+def build_session():
+    prompt = get_system_prompt(
+        mode='health',
+        financial_kb="ISA: use your allowance",
+        scenario_kb="- buy_home: ['amount', 'date']",
+        profile={"age": 25, "savings": 1000},
+        current_date="2026-01-01"
+    )
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "system", "content": "CURRENT USER CONTEXT:\nAge: 25"},
+        {"role": "user", "content": "I want to buy a house"},
+        {"role": "assistant", "content": "What's the price?"},
+    ]
+
+def test_split_system_prompt():
+    print("Testing system prompt sections...")
+    prompt = build_session()[0]["content"]
+    sections = split_system_prompt(prompt)
+    names = [name for name, _ in sections]
+    assert names == ['base_instructions', 'action_instructions', 'date', 'coaching_tips', 'persona', 'financial_kb', 'scenario_list'], names
+    assert "".join(text for _, text in sections) == prompt, "Sections must cover the whole prompt"
+    assert dict(sections)['persona'].startswith("PERSONA: **HEALTH OPTIMIZER**")
+    print("PASS: System prompt split into sections")
+
+def test_profile_session():
+    print("\nTesting session profile...")
+    report = profile_session(build_session())
+    sections = {section['name']: section for section in report['sections']}
+    assert sections['context_blocks']['tokens'] > 0, "Context block not counted"
+    assert len(report['turns']) == 2, f"Expected 2 history turns. Got: {report['turns']}"
+    assert report['totalTokens'] == sum(section['tokens'] for section in report['sections'])
+    assert 'messages' not in report
+    print("PASS: Session profiled")
+
+def test_profile_store():
+    print("\nTesting store aggregate...")
+    report = profile_store({"a": build_session(), "b": build_session()[:1]})
+    assert report['sessions'] == 2
+    assert report['totalTokens']['count'] == 2
+    assert report['largestSessions'][0]['sessionId'] == "a"
+    print("PASS: Store aggregated")
+
+def test_profile_next_turn():
+    print("\nTesting the profile of a session's next request...")
+    agent = AIAgent(api_key="test", prompt_retrieval=True)
+    agent.sessions = {"s1": build_session()}
+    context = {"profile": {"name": "Sam", "age": 25}}
+    _, _, messages = agent.build_turn_messages(agent.knowledge.current, agent.sessions["s1"], "Buying a house for 300k", context)
+
+    stored = profile_session(agent.sessions["s1"])
+    os.environ["ADMIN_API_KEY"] = "secret"
+    app.state.ai_agent = agent
+    try:
+        response = TestClient(app).post("/api/admin/sessions/s1/prompt-profile?include_messages=true",
+                                        json={"message": "Buying a house for 300k", "context": context},
+                                        headers={"X-Admin-Key": "secret"})
+    finally:
+        del app.state.ai_agent
+        del os.environ["ADMIN_API_KEY"]
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report['messages'] == messages, "Profile must cover exactly the messages a turn sends"
+    assert report['totalTokens'] > stored['totalTokens']
+    sections = {section['name']: section for section in report['sections']}
+    stored_sections = {section['name']: section for section in stored['sections']}
+    assert sections['retrieved_context']['tokens'] > 0, "Retrieved block not counted"
+    assert sections['context_blocks']['tokens'] > stored_sections['context_blocks']['tokens'], "Turn's context block not counted"
+    assert report['turns'][-1]['role'] == 'user' and len(report['turns']) == 3, "New user message not counted"
+    assert agent.sessions["s1"] == build_session(), "Profiling must not touch the session"
+    print("PASS: Next request profiled with context, retrieval block and user message")
+
+if __name__ == "__main__":
+    try:
+        test_split_system_prompt()
+        test_profile_session()
+        test_profile_store()
+        test_profile_next_turn()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,70 @@
+import sys
+import os
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api import prompts
+from api.prompts import (ADVICE_EMERGENCY, ADVICE_ISA, ADVICE_LISA, ADVICE_TAX, CORE_INSTRUCTIONS, HEALTH_OPTIMIZER_PROMPT,
+                         INTENT_TAG_INSTRUCTIONS, PROMPT_MODES, TOOL_CALL_INSTRUCTIONS, get_contextual_advice,
+                         get_system_prompt, precompile_system_prompts)
+
+FINANCIAL_KB = "- ISA allowance: £20,000 per tax year"
+SCENARIO_KB = "- buy_home: [propertyPrice, deposit]"
+
+def test_precompiled_fragments_are_reused():
+    print("Testing precompiled system prompt fragments...")
+    prompts._static_fragments.cache_clear()
+    precompile_system_prompts(FINANCIAL_KB, SCENARIO_KB)
+    compiled = prompts._static_fragments.cache_info()
+    assert compiled.misses == len(PROMPT_MODES) and compiled.currsize == len(PROMPT_MODES)
+
+    for mode in PROMPT_MODES:
+        get_system_prompt(mode, FINANCIAL_KB, SCENARIO_KB, profile={'age': 30}, current_date="2026-01-01")
+    reused = prompts._static_fragments.cache_info()
+    assert reused.misses == compiled.misses, "Prompts for precompiled modes must not recompile fragments"
+    assert reused.hits == compiled.hits + len(PROMPT_MODES)
+
+    # A reload with a new KB compiles fresh fragments; the old ones are not served for it
+    prompt = get_system_prompt('goals', FINANCIAL_KB, "- marriage: [totalBudget]")
+    assert prompts._static_fragments.cache_info().misses == compiled.misses + 1
+    assert "- marriage: [totalBudget]" in prompt and SCENARIO_KB not in prompt
+    print("PASS: Fragments compiled once per mode and KB")
+
+def test_assembled_prompt():
+    print("\nTesting the assembled prompt...")
+    profile = {'age': 30, 'income': 60000, 'savings': 1000}
+    prompt = get_system_prompt('health', FINANCIAL_KB, SCENARIO_KB, profile=profile, current_date="2026-01-01")
+    assert prompt.startswith(CORE_INSTRUCTIONS + INTENT_TAG_INSTRUCTIONS)
+    for part in ("CURRENT DATE: 2026-01-01", ADVICE_LISA, ADVICE_TAX, ADVICE_EMERGENCY, HEALTH_OPTIMIZER_PROMPT,
+                 FINANCIAL_KB, SCENARIO_KB):
+        assert part in prompt, f"Missing {part[:40]!r}"
+    assert prompt.index("CURRENT DATE") < prompt.index(ADVICE_LISA) < prompt.index(HEALTH_OPTIMIZER_PROMPT)
+
+    structured = get_system_prompt('health', FINANCIAL_KB, SCENARIO_KB, structured_intents=True)
+    assert TOOL_CALL_INSTRUCTIONS in structured and INTENT_TAG_INSTRUCTIONS not in structured
+    assert "CURRENT DATE" not in structured and "COACHING TIPS" not in structured
+    print("PASS: Head, date, tips and tail in order")
+
+def test_advice_per_profile_bucket():
+    print("\nTesting coaching tips per profile bucket...")
+    assert get_contextual_advice({'age': 25, 'savings': 5000}) == get_contextual_advice({'age': 39, 'savings': 19000})
+    assert ADVICE_LISA not in get_contextual_advice({'age': 40, 'savings': 5000})
+    assert ADVICE_ISA in get_contextual_advice({'age': 45, 'savings': 25000})
+    assert get_contextual_advice({'age': 45, 'savings': 5000}) == ""
+    assert get_contextual_advice({}) == ""
+    print("PASS: Same bucket, same tips; thresholds respected")
+
+if __name__ == "__main__":
+    try:
+        test_precompiled_fragments_are_reused()
+        test_assembled_prompt()
+        test_advice_per_profile_bucket()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,55 @@
+import sys
+import os
+import json
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.pattern_matcher import ScenarioPatternMatcher
+
+def test_top_candidate_is_match():
+    print("Testing rank_scenarios against match_scenario...")
+    matcher = ScenarioPatternMatcher()
+    with open('sessions.json', 'r') as f:
+        sessions = json.load(f)
+    texts = [m['content'] for messages in sessions.values() for m in messages if m['role'] == 'user']
+
+    for text in texts:
+        ranked = matcher.rank_scenarios(text, k=5)
+        match = matcher.match_scenario(text)
+        assert [c.score for c in ranked] == sorted((c.score for c in ranked), reverse=True)
+        if match:
+            assert (ranked[0].scenario_id, ranked[0].score) == match, f"{text!r}: {ranked[0]} != {match}"
+        for candidate in ranked:
+            assert candidate.keywords, "Every candidate needs keyword evidence"
+    print(f"PASS: {len(texts)} messages agree")
+
+def test_evidence_and_cache():
+    print("\nTesting evidence and cache...")
+    matcher = ScenarioPatternMatcher({'life': {
+        'marriage': {'keywords': ['wedding', 'getting married'], 'params': []},
+        'honeymoon': {'keywords': ['honeymoon', 'wedding'], 'params': []},
+        'childbirth': {'keywords': ['baby'], 'params': []},
+    }})
+    ranked = matcher.rank_scenarios("Getting married, then the honeymoon after the WEDDING", k=2)
+    assert [c.scenario_id for c in ranked] == ['marriage', 'honeymoon'], ranked
+    assert ranked[0].score == 1.0 and ranked[0].keywords == ('wedding', 'getting married'), ranked[0]
+
+    matcher.rank_scenarios("  getting married, then the honeymoon after the wedding ")
+    assert matcher.cache_info().hits == 1, "Normalized repeat should be served from cache"
+
+    assert matcher.suggest_related_scenarios('childbirth', text="honeymoon plans") == ['honeymoon', 'marriage']
+    print("PASS: Evidence returned, repeats cached")
+
+if __name__ == "__main__":
+    try:
+        test_top_candidate_is_match()
+        test_evidence_and_cache()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
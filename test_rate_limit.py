@@ -0,0 +1,172 @@
+import sys
+import os
+import json
+import asyncio
+import time
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api import metrics
+from api.agent_service import AgentResponse, app
+from api.rate_limit import Limit, MemoryBuckets, RateLimitMiddleware, client_ip
+
+async def echo_app(scope, receive, send):
+    message = await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": message.get("body", b"")})
+
+def call(middleware, body=None, path="/api/chat", ip="1.2.3.4", headers=()):
+    """Run one request through the middleware; returns (status, headers, body)."""
+    scope = {"type": "http", "path": path, "client": (ip, 1234), "headers": list(headers)}
+    messages = [{"type": "http.request", "body": json.dumps(body or {}).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+def limiter(app=echo_app, **kwargs):
+    limits = (Limit('session', 60, 2), Limit('ip', 60, 5), Limit('api_key', 60, 3))
+    return RateLimitMiddleware(app, backend=MemoryBuckets(), limits=limits, enabled=True, **kwargs)
+
+def test_session_bucket():
+    print("Testing the per-session burst...")
+    metrics.reset()
+    middleware = limiter()
+    assert call(middleware, {"sessionId": "a"})[0] == 200
+    status, _, body = call(middleware, {"sessionId": "a", "message": "hi"})
+    assert status == 200 and json.loads(body)["message"] == "hi", "The app must still see the request body"
+    status, headers, body = call(middleware, {"sessionId": "a"})
+    assert status == 429 and json.loads(body)["limit"] == "session"
+    assert headers[b"retry-after"] == b"1", headers
+    assert call(middleware, {"sessionId": "b"})[0] == 200, "Other sessions are unaffected"
+    assert metrics.get('rate_limited_total', limit='session') == 1
+    print("PASS: Session burst enforced")
+
+def test_ip_and_api_key_buckets():
+    print("\nTesting IP and API key buckets...")
+    middleware = limiter()
+    statuses = [call(middleware, {"sessionId": f"s{i}"}, ip="9.9.9.9")[0] for i in range(6)]
+    assert statuses == [200] * 5 + [429], statuses
+    key = [(b"x-api-key", b"tenant-1")]
+    statuses = [call(middleware, {}, ip=f"10.0.0.{i}", headers=key)[0] for i in range(4)]
+    assert statuses == [200] * 3 + [429], statuses
+    # A rejected request takes no tokens: the denied API key didn't drain 10.0.0.4's bucket
+    assert call(middleware, {}, ip="10.0.0.3")[0] == 200
+    assert call(middleware, {}, path="/health", ip="9.9.9.9")[0] == 200, "Only chat paths are limited"
+    print("PASS: IP and API key buckets")
+
+def test_concurrency_cap():
+    print("\nTesting the in-flight cap...")
+    release = None
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await echo_app(scope, receive, send)
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        middleware = limiter(app=slow_app, max_concurrent=1)
+        sent = []
+
+        async def run(ip):
+            messages = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+            async def receive():
+                return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    sent.append((ip, message["status"]))
+            await middleware({"type": "http", "path": "/api/chat", "client": (ip, 1), "headers": []}, receive, send)
+
+        first = asyncio.create_task(run("1.1.1.1"))
+        await asyncio.sleep(0.01)
+        await run("2.2.2.2")  # rejected straight away, no waiting
+        release.set()
+        await first
+        return sent
+
+    assert asyncio.run(main()) == [("2.2.2.2", 429), ("1.1.1.1", 200)]
+    print("PASS: Concurrency cap rejects early")
+
+def app_limiter():
+    """The RateLimitMiddleware instance in the app's middleware stack."""
+    if app.middleware_stack is None:
+        app.middleware_stack = app.build_middleware_stack()
+    layer = app.middleware_stack
+    while not isinstance(layer, RateLimitMiddleware):
+        layer = layer.app
+    return layer
+
+def test_batch_bigger_than_burst_is_throttled():
+    print("\nTesting a batch bigger than the session burst...")
+
+    class StubAgent:
+        def __init__(self):
+            self.seen = []
+
+        async def processUserInput(self, user_input, session_id, context, mode="goals", deadline=None):
+            self.seen.append(user_input)
+            return AgentResponse(f"Reply to {user_input}")
+
+    agent = StubAgent()
+    middleware = app_limiter()
+    saved = middleware.session_limit
+    # Burst 2, then one token every 50 ms
+    middleware.session_limit = Limit('session', 1200, 2)
+    items = [{"message": f"Turn {i}", "sessionId": "batch-limited"} for i in range(6)]
+    app.state.ai_agent = agent
+    throttled = metrics.get('chat_batch_throttled_seconds_total', limit='session')
+    started = time.monotonic()
+    try:
+        # Own client address, so the IP bucket other tests draw from is untouched
+        response = TestClient(app, client=("198.51.100.7", 1)).post("/api/chat/batch", json={"items": items})
+    finally:
+        middleware.session_limit = saved
+        del app.state.ai_agent
+    elapsed = time.monotonic() - started
+    assert response.status_code == 200, response.text
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["status"] for r in results] == [200] * 6, results
+    # Every turn ran, in order, so each one saw the history the previous one left
+    assert agent.seen == [f"Turn {i}" for i in range(6)], agent.seen
+    assert [r["index"] for r in results] == list(range(6))
+    # Four turns past the burst had to wait for a token each
+    assert elapsed >= 4 * 0.05 * 0.9, elapsed
+    assert metrics.get('chat_batch_throttled_seconds_total', limit='session') > throttled
+    assert middleware.in_flight == 0, "Every admitted turn must give its slot back"
+    print("PASS: Turns past the burst waited for tokens; none dropped")
+
+def test_forwarded_ip():
+    print("\nTesting X-Forwarded-For handling...")
+    scope = {"client": ("10.0.0.1", 1), "headers": [(b"x-forwarded-for", b"203.0.113.7, 10.0.0.1")]}
+    assert client_ip(scope, trust_forwarded=False) == "10.0.0.1"
+    assert client_ip(scope, trust_forwarded=True) == "203.0.113.7"
+    print("PASS: Forwarded IP only when trusted")
+
+if __name__ == "__main__":
+    try:
+        test_session_bucket()
+        test_ip_and_api_key_buckets()
+        test_concurrency_cap()
+        test_batch_bigger_than_burst_is_throttled()
+        test_forwarded_ip()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
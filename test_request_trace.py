@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api import metrics, request_trace
+from api.agent_service import AgentResponse, app
+
+def test_server_timing():
+    print("Testing the Server-Timing header...")
+    trace = request_trace.RequestTrace()
+    trace.stages.update({'matching': 0.0002, 'upstream': 1.23456})
+    assert trace.server_timing() == "matching;dur=0.2, upstream;dur=1234.6"
+    assert trace.server_timing(total=1.3).endswith(", total;dur=1300.0")
+    print("PASS: Server-Timing")
+
+def test_trace_follows_tasks():
+    print("\nTesting that turn code running in other tasks adds to the request's trace...")
+
+    async def turn():
+        # What processUserInput does, inside the task cancel_on_disconnect creates
+        stages = metrics.StageTimer('test_stage_seconds', request_trace.stages())
+        with stages.stage('matching'):
+            request_trace.note('match', scenario='buy_home')
+            request_trace.note('match', amount=300000)
+        stages.add('upstream', 0.5)
+
+    async def request():
+        trace = request_trace.start()
+        await asyncio.ensure_future(turn())
+        return trace
+
+    trace = asyncio.run(request())
+    assert set(trace.stages) == {'matching', 'upstream'}
+    body = trace.to_dict(total=0.6)
+    assert body["stagesMs"]["upstream"] == 500.0 and body["totalMs"] == 600.0
+    assert body["match"] == {'scenario': 'buy_home', 'amount': 300000}, body
+    print("PASS: Trace shared with the turn's task")
+
+def test_no_trace_is_noop():
+    print("\nTesting code paths without a trace...")
+
+    async def outside():
+        assert request_trace.stages() is None
+        request_trace.note('cache', extraction='hit')
+    asyncio.run(outside())
+    print("PASS: No trace, no effect")
+
+def test_debug_trace_needs_admin_key():
+    print("\nTesting who gets the trace in the body...")
+
+    class StubAgent:
+        async def processUserInput(self, user_input, session_id, context, mode="goals", deadline=None):
+            return AgentResponse("Hello")
+
+    def trace(enabled, headers=None):
+        request_trace.DEBUG_TRACE_ENABLED = enabled
+        response = TestClient(app).post("/api/chat?debug=true", json={"message": "Hi"}, headers=headers)
+        assert response.status_code == 200, response.text
+        assert "Server-Timing" in response.headers
+        return response.json()["trace"]
+
+    saved = (request_trace.DEBUG_TRACE_ENABLED, os.environ.get("ADMIN_API_KEY"))
+    os.environ["ADMIN_API_KEY"] = "secret"
+    app.state.ai_agent = StubAgent()
+    try:
+        assert trace(True) is None, "Anonymous ?debug=true must not expose the trace"
+        assert trace(True, {"X-Admin-Key": "wrong"}) is None
+        assert trace(False, {"X-Admin-Key": "secret"}) is None, "CHAT_DEBUG_TRACE off must win"
+        body = trace(True, {"X-Admin-Key": "secret"})
+        assert body is not None and "requestId" in body and "stagesMs" in body, body
+    finally:
+        del app.state.ai_agent
+        request_trace.DEBUG_TRACE_ENABLED = saved[0]
+        os.environ.pop("ADMIN_API_KEY")
+        if saved[1] is not None:
+            os.environ["ADMIN_API_KEY"] = saved[1]
+    print("PASS: Trace only for admins with CHAT_DEBUG_TRACE on")
+
+if __name__ == "__main__":
+    try:
+        test_server_timing()
+        test_trace_follows_tasks()
+        test_no_trace_is_noop()
+        test_debug_trace_needs_admin_key()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
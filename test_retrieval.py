@@ -0,0 +1,56 @@
+import sys
+import os
+import json
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.retrieval import KnowledgeRetriever, tokenize
+
+def build_retriever():
+    with open('api/scenario_patterns.json', 'r') as f:
+        patterns = json.load(f)
+    with open('api/financial_knowledge.json', 'r') as f:
+        kb_data = json.load(f)
+    return KnowledgeRetriever(patterns, kb_data)
+
+def test_tokenize():
+    print("Testing tokenizer...")
+    assert tokenize("My ISAs and the house_deposit") == ['isa', 'house', 'deposit']
+    print("PASS: Tokens normalized")
+
+def test_scenario_retrieval():
+    print("\nTesting scenario retrieval...")
+    retriever = build_retriever()
+    scenario_ids, _ = retriever.select("I want to save for a house deposit")
+    assert scenario_ids[0] == 'house_deposit_fund', f"Expected house_deposit_fund first. Got: {scenario_ids}"
+    assert 'custom_goal' in scenario_ids, "custom_goal must always be offered"
+
+    scenario_ids, _ = retriever.select("xyzzy")
+    assert scenario_ids == ['custom_goal'], f"Unmatched queries should only offer custom_goal. Got: {scenario_ids}"
+    print("PASS: Relevant scenarios retrieved")
+
+def test_fact_retrieval():
+    print("\nTesting KB fact retrieval...")
+    retriever = build_retriever()
+    _, topics = retriever.select("What is the ISA limit?")
+    assert 'ISA (Individual Savings Account)' in topics, f"Expected ISA topic. Got: {topics}"
+
+    block = retriever.render("pension tax relief")
+    assert block.startswith("RELEVANT SCENARIOS"), "Rendered block missing header"
+    assert "Pension:" in block, f"Expected Pension fact in block. Got: {block}"
+    print("PASS: Relevant facts retrieved")
+
+if __name__ == "__main__":
+    try:
+        test_tokenize()
+        test_scenario_retrieval()
+        test_fact_retrieval()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
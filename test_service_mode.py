@@ -0,0 +1,109 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.service_mode import MODE_DETERMINISTIC, MODE_FULL, MODE_OFF, SCENARIO_LABELS, ServiceMode, template_reply
+
+def run_upstream(service_mode, seconds, n=1):
+    async def call():
+        async with service_mode.upstream():
+            await asyncio.sleep(seconds)
+
+    async def main():
+        await asyncio.gather(*[call() for _ in range(n)])
+    asyncio.run(main())
+
+def test_manual_switch():
+    print("Testing manual mode switches...")
+    service_mode = ServiceMode(path=None)
+    assert service_mode.mode == MODE_FULL
+    service_mode.set(MODE_OFF, 'admin', 'incident')
+    assert service_mode.mode == MODE_OFF and service_mode.status()["reason"] == 'incident'
+    try:
+        service_mode.set('fast')
+        assert False, "Unknown modes must be rejected"
+    except ValueError:
+        pass
+    assert service_mode.mode == MODE_OFF
+    print("PASS: Manual switches")
+
+def test_auto_degrade():
+    print("\nTesting auto-degrade and recovery...")
+    service_mode = ServiceMode(path=None, latency_threshold=0, queue_threshold=3, cooldown=0.1)
+    run_upstream(service_mode, 0.01, n=2)
+    assert service_mode.mode == MODE_FULL
+    run_upstream(service_mode, 0.01, n=3)
+    assert service_mode.mode == MODE_DETERMINISTIC, "Queue depth should trip the fallback"
+    assert service_mode.in_flight == 0
+    time.sleep(0.15)
+    assert service_mode.mode == MODE_FULL, "Should try full again after the cooldown"
+
+    service_mode = ServiceMode(path=None, latency_threshold=0.05, queue_threshold=0, cooldown=60)
+    run_upstream(service_mode, 0.01)
+    assert service_mode.mode == MODE_FULL
+    run_upstream(service_mode, 0.2)
+    assert service_mode.mode == MODE_DETERMINISTIC, "Slow upstream should trip the fallback"
+    # A configured mode always wins over the automatic one
+    service_mode.set(MODE_OFF)
+    assert service_mode.mode == MODE_OFF
+    service_mode.set(MODE_FULL)
+    assert service_mode.mode == MODE_FULL, "An explicit switch to full clears the fallback"
+    print("PASS: Auto-degrade")
+
+def test_mode_file():
+    print("\nTesting the watched mode file...")
+    path = os.path.join(tempfile.mkdtemp(), 'service_mode.json')
+    with open(path, 'w') as f:
+        json.dump({"mode": "deterministic", "reason": "upstream incident"}, f)
+    service_mode = ServiceMode(mode=MODE_FULL, path=path)
+    assert service_mode.mode == MODE_DETERMINISTIC and service_mode.source == 'file'
+    assert not service_mode.changed()
+
+    time.sleep(0.01)
+    with open(path, 'w') as f:
+        f.write('{"mode": ')
+    assert service_mode.changed()
+    service_mode.load_file()
+    assert service_mode.mode == MODE_DETERMINISTIC, "A broken file is ignored"
+
+    os.remove(path)
+    service_mode.load_file()
+    assert service_mode.mode == MODE_FULL, "Removing the file restores SERVICE_MODE"
+    print("PASS: Mode file")
+
+def test_template_reply():
+    print("\nTesting templated replies...")
+    assert "planner" in template_reply(None, None, [])
+    reply = template_reply('marriage', None, ['totalBudget', 'weddingDate'])
+    assert reply == "That sounds like the Marriage / Civil Partnership scenario. What's the total wedding budget?", reply
+    reply = template_reply('buy_home', {'propertyPrice': 300000}, ['purchaseDate'])
+    assert "opened the Buy First Home planner" in reply and "target purchase date" in reply, reply
+    # Units in labels are dropped; AI param names find the screen's camelCase key
+    assert template_reply('refinance_mortgage', None, ['current_rate']).endswith("What's the current rate?")
+    assert "buy_home" not in reply and "marriage" not in template_reply('marriage', None, [])
+    # Every scenario the matcher can pick has a display name
+    with open(os.path.join('api', 'scenario_patterns.json'), 'r', encoding='utf-8') as f:
+        scenario_ids = {sid for category in json.load(f).values() for sid in category}
+    assert set(SCENARIO_LABELS) == scenario_ids, "scenario_labels.json out of step with scenario_patterns.json"
+    print("PASS: Templated replies use the config screens' names")
+
+if __name__ == "__main__":
+    try:
+        test_manual_switch()
+        test_auto_degrade()
+        test_mode_file()
+        test_template_reply()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
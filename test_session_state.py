@@ -0,0 +1,85 @@
+import sys
+import os
+import json
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.extraction import extract_amount
+from api.pattern_matcher import ScenarioPatternMatcher
+from api.session_state import advance, build_state, is_current, window_hits
+
+def test_incremental_matches_full_rescan():
+    print("Testing incremental state against full rescans of sessions.json...")
+    matcher = ScenarioPatternMatcher()
+    with open('sessions.json', 'r') as f:
+        sessions = json.load(f)
+
+    turns = 0
+    for messages in sessions.values():
+        state = build_state([], matcher)
+        history = []
+        for message in messages:
+            if message['role'] == 'user':
+                text = message['content']
+                turn_hits = matcher.message_hits(text.lower())
+                history_user = [m['content'].lower() for m in history if m['role'] == 'user'] + [text.lower()]
+
+                expected = matcher.match_scenario(text, history_user)
+                actual = matcher.match_hits(window_hits(state, turn_hits))
+                assert actual == expected, f"{text!r}: {actual} != {expected}"
+
+                state = advance(state, turn_hits, extract_amount(text))
+                turns += 1
+            history.append(message)
+            assert is_current(state, history, matcher.fingerprint)
+        assert state == build_state(history, matcher), "Incremental state drifted from a rebuild"
+    print(f"PASS: {turns} turns agree")
+
+def test_stale_state_detected():
+    print("\nTesting stale state detection...")
+    matcher = ScenarioPatternMatcher()
+    history = [{"role": "system", "content": "x"}, {"role": "user", "content": "Buying a house for 300k"}]
+    state = build_state(history, matcher)
+    assert state['lastAmount'] == 300000
+    assert is_current(state, history, matcher.fingerprint)
+    assert not is_current(state, history, "other"), "A different keyword set must invalidate cached hits"
+    assert not is_current(state, history + [{"role": "user", "content": "hi"}], matcher.fingerprint), "Unseen messages must invalidate"
+    assert not is_current(None, history, matcher.fingerprint)
+    print("PASS: Stale state detected")
+
+def test_restart_with_edited_patterns():
+    print("\nTesting persisted state after a restart with an edited pattern file...")
+    with open('api/scenario_patterns.json', 'r', encoding='utf-8') as f:
+        patterns = json.load(f)
+    theme = next(iter(patterns))
+    patterns[theme]['buy_yacht'] = {'keywords': ['yacht'], 'params': ['amount']}
+    before = ScenarioPatternMatcher(json.loads(json.dumps(patterns)))
+    history = [{"role": "system", "content": "x"}, {"role": "user", "content": "I want a yacht"}]
+    # Saved to session_state.json by the first process
+    saved = json.loads(json.dumps(build_state(history, before)))
+    assert saved['recentHits'] == [['yacht']]
+    assert ScenarioPatternMatcher(json.loads(json.dumps(patterns))).fingerprint == before.fingerprint, \
+        "Same keywords must give the same fingerprint in a new process"
+
+    del patterns[theme]['buy_yacht']
+    after = ScenarioPatternMatcher(patterns)
+    assert not is_current(saved, history, after.fingerprint), "Hits for removed keywords must be rebuilt"
+    assert after.match_hits(window_hits(saved, frozenset())) is None, "Unknown cached keywords must not raise"
+    rebuilt = build_state(history, after)
+    assert rebuilt['recentHits'] == [[]] and is_current(rebuilt, history, after.fingerprint)
+    print("PASS: Stale hits rebuilt, unknown keywords ignored")
+
+if __name__ == "__main__":
+    try:
+        test_incremental_matches_full_rescan()
+        test_stale_state_detected()
+        test_restart_with_edited_patterns()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
@@ -0,0 +1,90 @@
+import sys
+import os
+from datetime import date
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from api.extraction import extract
+from api.knowledge import KnowledgeStore
+from api.slots import fill_from_intent, missing_fields, slot_kind, update_slots
+
+NOW = date(2026, 1, 15)
+SCENARIO_PARAMS = KnowledgeStore().current.scenario_params
+
+def turn(slots, scenario_id, text, intent_params=None):
+    return update_slots(slots, scenario_id, SCENARIO_PARAMS, extract(text), intent_params, now=NOW)
+
+def test_slot_kinds():
+    print("Testing slot kinds from param names...")
+    assert slot_kind('target_date') == 'date'
+    assert slot_kind('monthly_contribution') == 'monthly'
+    assert slot_kind('initial_amount') == 'money'
+    assert slot_kind('interest_rate') == 'rate'
+    assert slot_kind('duration_months') == 'count'
+    assert slot_kind('scenarioName') == 'text'
+    print("PASS: Slot kinds")
+
+def test_fills_incrementally_across_turns():
+    print("\nTesting slots fill turn by turn...")
+    slots = turn(None, 'start_investing_isa', "I want to open an ISA")
+    assert missing_fields(slots, SCENARIO_PARAMS) == ['initial_amount', 'monthly_contribution']
+    slots = turn(slots, None, "I can put in 5k to start")
+    assert slots['filled'] == {'initial_amount': 5000}
+    slots = turn(slots, None, "and 200 a month after that")
+    assert slots['filled'] == {'initial_amount': 5000, 'monthly_contribution': 200}
+    assert missing_fields(slots, SCENARIO_PARAMS) == []
+    print("PASS: Slots filled incrementally")
+
+def test_dates_and_durations():
+    print("\nTesting dates and durations...")
+    slots = turn(None, 'sabbatical', "Taking 6 months off starting next year")
+    assert slots['filled'] == {'duration_months': 6, 'start_date': '2027-01-15'}, slots
+    slots = turn(None, 'apply_mortgage', "A 250k mortgage over 25 years")
+    assert slots['filled'] == {'loan_amount': 250000, 'term_years': 25}, slots
+    # "in 2 years" is when, not how long
+    slots = turn(None, 'sabbatical', "I want a break in 2 years")
+    assert slots['filled'] == {'start_date': '2028-01-15'}, slots
+    print("PASS: Dates and durations")
+
+def test_amounts_fill_the_slot_they_name():
+    print("\nTesting which slot an amount fills...")
+    # job_loss has two money params: last_salary and severance_pay
+    slots = turn(None, 'job_loss', "I was made redundant and got 10k")
+    assert slots['filled'] == {}, "An amount that could be either param must not be guessed"
+    slots = turn(slots, None, "They paid me 10k severance")
+    assert slots['filled'] == {'severance_pay': 10000}, slots
+    slots = turn(slots, None, "My salary was £45,000")
+    assert slots['filled'] == {'severance_pay': 10000, 'last_salary': 45000}, slots
+    slots = turn(None, 'family_illness', "Treatment will cost 20k")
+    assert slots['filled'] == {'treatment_cost': 20000}, slots
+    # One money param: the amount can only be for it
+    assert turn(None, 'marriage', "We're getting married, 20k")['filled'] == {'amount': 20000}
+    print("PASS: Amounts fill only the slot their label names")
+
+def test_intent_params_and_scenario_switch():
+    print("\nTesting intent params and scenario changes...")
+    slots = turn(None, 'marriage', "Getting married", {'totalBudget': 20000, 'weddingDate': '2027-06-01'})
+    assert slots['filled'] == {'amount': 20000, 'date': '2027-06-01'}
+    assert fill_from_intent(['target_amount'], {}, {'targetAmount': 1}) == {'target_amount': 1}
+    assert fill_from_intent(['amount'], {'amount': 5}, {'totalBudget': 7}) == {'amount': 7}, "The action's values win"
+    slots = turn(slots, 'buy_vehicle', "Actually a car instead")
+    assert slots == {'scenarioId': 'buy_vehicle', 'filled': {}}, "A new scenario starts with empty slots"
+    assert turn(None, None, "hello") is None
+    print("PASS: Intent params and scenario switch")
+
+if __name__ == "__main__":
+    try:
+        test_slot_kinds()
+        test_fills_incrementally_across_turns()
+        test_dates_and_durations()
+        test_amounts_fill_the_slot_they_name()
+        test_intent_params_and_scenario_switch()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
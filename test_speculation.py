@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+import json
+import tempfile
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api import metrics
+from api.agent_service import AIAgent, app
+from api.speculation import SpeculativeIntent, reconcile, speculation_mode
+
+class FakeCompletions:
+    """Stands in for client.chat.completions; answers with the given replies in order, after a delay."""
+    def __init__(self, replies, delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=self.replies.pop(0), tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def make_agent(replies, **kwargs):
+    agent = AIAgent(api_key="test", **kwargs)
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(replies)))
+    agent.sessions, agent.session_state = {}, {}
+    temp_dir = tempfile.mkdtemp()
+    agent.session_file = os.path.join(temp_dir, 'sessions.json')
+    agent.session_state_file = os.path.join(temp_dir, 'session_state.json')
+    return agent
+
+def speculative(scenario_id):
+    return SpeculativeIntent(scenario_id=scenario_id, confidence=0.8, amount=None, source='local', latency=0.001)
+
+def test_reconcile_outcomes():
+    print("Testing reconcile outcomes...")
+    cases = [
+        (('buy_home', speculative('buy_home'), False), 'agree'),
+        (('marriage', speculative('buy_home'), False), 'disagree'),
+        (('marriage', speculative(None), False), 'main_only'),
+        ((None, speculative('buy_home'), True), 'speculative_only'),
+        ((None, speculative('buy_home'), False), 'none'),
+        ((None, speculative(None), False), 'none'),
+    ]
+    for args, expected in cases:
+        before = metrics.get('speculation_total', source='local', outcome=expected)
+        assert reconcile(*args) == expected, f"{args[0]} vs {args[1].scenario_id}"
+        assert metrics.get('speculation_total', source='local', outcome=expected) == before + 1
+    print("PASS: Outcomes labelled and counted")
+
+def test_unknown_mode_is_off():
+    print("\nTesting AI_SPECULATIVE_INTENTS validation...")
+    assert speculation_mode("LLM") == 'llm'
+    assert speculation_mode("locl") == 'off'
+    assert speculation_mode("") == 'off'
+    assert make_agent([], speculative_intents="sometimes").speculative_intents == 'off'
+    print("PASS: Unknown values fall back to off")
+
+def test_main_reply_wins_disagreement():
+    print("\nTesting a speculative result the main reply disagrees with...")
+    agent = make_agent(["Congratulations! [INTENT:marriage|amount:20000]"], speculative_intents="local")
+    before = metrics.get('speculation_total', source='local', outcome='disagree')
+    # The matcher reads this as buy_home; the main reply says marriage
+    response = asyncio.run(agent.processUserInput("I am buying a house for 300k", "s1", context={}))
+    assert response.action and response.action.scenarioId == 'marriage', response.action
+    assert response.intent == 'marriage'
+    assert metrics.get('speculation_total', source='local', outcome='disagree') == before + 1
+    assert agent.sessions["s1"][-1] == {"role": "assistant", "content": "Congratulations!"}
+    print("PASS: Main reply's action returned, disagreement counted")
+
+def test_early_action_is_streamed():
+    print("\nTesting the early action on /api/chat/stream...")
+    agent = make_agent(["Lovely! [INTENT:buy_home|amount:300000]"], speculative_intents="local")
+    agent.client.chat.completions.delay = 0.2
+    saved_before = metrics.snapshot().get('speculation_latency_saved_seconds_count{source="local"}', 0)
+    app.state.ai_agent = agent
+    try:
+        response = TestClient(app).post("/api/chat/stream", json={"message": "I am buying a house for 300k", "sessionId": "s1"})
+    finally:
+        del app.state.ai_agent
+    assert response.status_code == 200, response.text
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["action", "response"], lines
+    assert lines[0]["speculative"] and lines[0]["action"]["scenarioId"] == 'buy_home', lines[0]
+    assert lines[1]["action"]["scenarioId"] == 'buy_home' and lines[1]["sessionId"] == "s1"
+    stats = metrics.snapshot()
+    assert stats['speculation_latency_saved_seconds_count{source="local"}'] == saved_before + 1
+    assert stats['speculation_latency_saved_seconds_sum{source="local"}'] >= 0.1, "The action went out before the reply"
+    print("PASS: Action streamed ahead of the reply, time saved recorded")
+
+def test_replaced_early_action_saves_nothing():
+    print("\nTesting an early action the main reply overrides...")
+    agent = make_agent(["Congratulations! [INTENT:marriage|amount:20000]"], speculative_intents="local")
+    early = []
+
+    async def on_action(action):
+        early.append(action)
+
+    before = metrics.get('speculation_early_actions_total', source='local', outcome='replaced')
+    saved = metrics.snapshot().get('speculation_latency_saved_seconds_count{source="local"}', 0)
+    response = asyncio.run(agent.processUserInput("I am buying a house for 300k", "s1", context={}, on_action=on_action))
+    assert [a.scenarioId for a in early] == ['buy_home'] and response.action.scenarioId == 'marriage'
+    assert metrics.get('speculation_early_actions_total', source='local', outcome='replaced') == before + 1
+    assert metrics.snapshot().get('speculation_latency_saved_seconds_count{source="local"}', 0) == saved
+    print("PASS: Final action wins, no time counted as saved")
+
+if __name__ == "__main__":
+    try:
+        test_reconcile_outcomes()
+        test_unknown_mode_is_off()
+        test_main_reply_wins_disagreement()
+        test_early_action_is_streamed()
+        test_replaced_early_action_saves_nothing()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)
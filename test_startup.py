@@ -0,0 +1,131 @@
+import sys
+import os
+import threading
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import api modules
+sys.path.append(os.path.join(os.getcwd(), 'api'))
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+
+from api import agent_service
+from api.agent_service import app
+
+CREDENTIAL_VARS = ("OPENAI_API_KEY", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT")
+
+class FakeModels:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def list(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+
+def start(api_key=None, warmup_upstream=False, upstream_error=None):
+    """
+    Run the app's lifespan with the given credentials and return (client, build info).
+
+    The agent is built by the real get_ai_agent; its OpenAI client is swapped for
+    a stub so nothing goes over the network.
+    """
+    saved = {name: os.environ.pop(name, None) for name in CREDENTIAL_VARS}
+    if api_key:
+        os.environ["OPENAI_API_KEY"] = api_key
+    if hasattr(app.state, 'ai_agent'):
+        del app.state.ai_agent
+    build = {"models": FakeModels(upstream_error), "closed": False}
+    original = agent_service.get_ai_agent
+
+    def get_ai_agent():
+        build["thread"] = threading.current_thread()
+        agent = original()
+        async def close():
+            build["closed"] = True
+        agent.client = SimpleNamespace(models=build["models"], close=close)
+        return agent
+
+    agent_service.get_ai_agent = get_ai_agent
+    agent_service.WARMUP_UPSTREAM = warmup_upstream
+
+    def restore():
+        agent_service.get_ai_agent = original
+        agent_service.WARMUP_UPSTREAM = False
+        if hasattr(app.state, 'ai_agent'):
+            del app.state.ai_agent
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+    build["restore"] = restore
+    return TestClient(app), build
+
+def test_not_ready_before_warmup():
+    print("Testing /ready before startup has run...")
+    app.state.ready = False
+    app.state.warmup = {}
+    response = TestClient(app).get("/ready")  # no lifespan without the with-block
+    assert response.status_code == 503 and response.json() == {"status": "starting"}, response.text
+    print("PASS: 503 before warm-up")
+
+def test_ready_after_warmup():
+    print("\nTesting startup warm-up...")
+    client, build = start(api_key="test", warmup_upstream=True)
+    try:
+        with client:
+            response = client.get("/ready")
+            agent = app.state.ai_agent
+            assert response.status_code == 200, response.text
+            body = response.json()
+            assert body["status"] == "ready" and body["upstream"] == "ok" and body["seconds"] >= 0, body
+            assert body["knowledgeVersion"] == agent.knowledge.current.version
+            assert build["thread"] is not threading.main_thread(), "The agent must be built off the event loop"
+            assert build["models"].calls == 1, "Upstream connection not warmed"
+            knowledge = agent.knowledge.current
+            assert all(sid in knowledge.params._models for sid in knowledge.scenario_ids), "Param models not compiled"
+        assert not app.state.ready, "Shutdown must clear readiness"
+        assert build["closed"], "Upstream client not closed on shutdown"
+    finally:
+        build["restore"]()
+    print("PASS: Ready after the agent was built in a worker thread")
+
+def test_upstream_warmup_failure_is_not_fatal():
+    print("\nTesting a failed upstream warm-up...")
+    client, build = start(api_key="test", warmup_upstream=True, upstream_error=RuntimeError("unreachable"))
+    try:
+        with client:
+            response = client.get("/ready")
+            assert response.status_code == 200 and response.json()["upstream"] == "failed: RuntimeError", response.text
+    finally:
+        build["restore"]()
+    print("PASS: Still ready, failure reported")
+
+def test_missing_credentials_never_ready():
+    print("\nTesting startup without credentials...")
+    client, build = start(api_key=None)
+    try:
+        with client:
+            response = client.get("/ready")
+            assert response.status_code == 503, response.text
+            assert response.json()["status"] == "starting" and "No API Key" in response.json()["error"]
+            assert client.get("/health").status_code == 200, "Liveness must not depend on the agent"
+    finally:
+        build["restore"]()
+    print("PASS: 503 with the startup error")
+
+if __name__ == "__main__":
+    try:
+        test_not_ready_before_warmup()
+        test_ready_after_warmup()
+        test_upstream_warmup_failure_is_not_fatal()
+        test_missing_credentials_never_ready()
+        print("\nALL TESTS PASSED ✅")
+    except AssertionError as e:
+        print(f"\nTEST FAILED ❌: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        exit(1)